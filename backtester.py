@@ -0,0 +1,435 @@
+"""
+backtester.py | V13 仓位规则的全历史回测 (data_cache 行情，无网络、无 LLM)
+
+实盘每天只对当日 K 线跑一次 TechnicalAnalyzer + calculate_position_v13，无法评估历史表现。
+本引擎把同一套规则改写成整段历史的数组运算:
+    1. 信号 (无状态): TechnicalAnalyzer.score_components 指标分量与 ValuationEngine.percentile_series
+       估值分位只算一次 (面板)，再按参数合成评分/VETO/估值乘数/目标倍数 (日期 × 标的 矩阵)
+    2. 账本 (有状态): 只对交易日循环一次，每步对全部标的做向量运算 —— 持有天数滚动、
+       7 日锁仓、买入/卖出金额与 PortfolioTracker._apply_trade 相同的摊薄成本逻辑
+AI 投委会不参与回测 (等价于 decision=PASS / adjustment=0)。
+
+用法:
+    python backtester.py                                    # 全部标的、全部缓存历史
+    python backtester.py --start 2022-01-01 --set score_up=65 --trades trades.csv --equity equity.csv
+    python backtester.py --funds 510300 --funds 159915 --by-fund
+    python backtester.py --set adx_trend_threshold=30 --set pct_high=0.9   # 指标阈值与估值切点同样可覆盖
+    python backtester.py --check-parity                     # 仓位倍数与 calculate_position_v13 逐格对拍 (含 VETO)
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from main import SIZING_PARAMS
+from technical_analyzer import TechnicalAnalyzer
+from valuation_engine import ValuationEngine
+from utils import logger
+
+LEFT_SIDE_TYPES = ('core', 'dividend')
+
+# 可回测/扫描的全部参数: 仓位阈值 + 评分的趋势强度阈值 + 估值分位切点
+PARAM_SPACE = {
+    **SIZING_PARAMS,
+    "adx_trend_threshold": TechnicalAnalyzer.ETF_PARAMS['adx_trend_threshold'],
+    **ValuationEngine.PERCENTILE_CUTS,
+}
+# 与参数无关、只需计算一次的逐日面板字段 (日期 × 标的)
+PANEL_FIELDS = ['close', 'base_score', 'trend_dir', 'adx', 'veto', 'warn', 'caution', 'warmup', 'percentile']
+
+
+def parse_params(pairs):
+    """['score_up=65', ...] -> {'score_up': 65}；未知参数直接报错"""
+    params = {}
+    for pair in pairs or []:
+        key, sep, raw = pair.partition("=")
+        key = key.strip()
+        if not sep or key not in PARAM_SPACE:
+            raise ValueError(f"未知参数: {pair} (可选: {', '.join(PARAM_SPACE)})")
+        params[key] = yaml.safe_load(raw)
+    return params
+
+
+def split_params(params):
+    """-> (仓位参数, adx 阈值, 估值切点)"""
+    params = params or {}
+    sizing = {k: v for k, v in params.items() if k in SIZING_PARAMS}
+    cuts = {k: v for k, v in params.items() if k in ValuationEngine.PERCENTILE_CUTS}
+    return sizing, params.get("adx_trend_threshold", PARAM_SPACE["adx_trend_threshold"]), cuts
+
+
+def sizing_multiplier(score, val_mult, veto, left_side, params=None):
+    """
+    calculate_position_v13 的无状态部分 (锁仓前的最终倍数)，输入为同形状数组
+    left_side: 标的是否允许左侧定投 (strategy_type in core/dividend)
+    VETO 与实盘一致：闸门/熔断给出 REJECT，战术分归 0 -> 破位卖出 (仍受底部锁仓/高估止损/7 日锁仓约束)
+    """
+    p = SIZING_PARAMS if params is None else {**SIZING_PARAMS, **params}
+    score = np.where(veto, 0, score)
+    tactical = np.select(
+        [score >= p['score_strong'], score >= p['score_up'], score >= p['score_stable'], score <= p['score_break']],
+        [p['mult_strong'], p['mult_up'], p['mult_stable'], p['mult_break']], 0.0
+    )
+    buy = np.where(val_mult < p['val_brake'], 0.0, np.where(val_mult > p['val_boost'], tactical * val_mult, tactical))
+    sell = np.where(val_mult > p['val_bottom_lock'], 0.0, np.where(val_mult < p['val_stop'], tactical * p['stop_mult'], tactical))
+    idle = np.where((val_mult >= p['val_left_side']) & left_side, p['mult_left_side'], 0.0)
+    final = np.where(tactical > 0, buy, np.where(tactical < 0, sell, idle))
+    return np.where(veto & (final > 0), 0.0, final)
+
+
+class Backtester:
+    def __init__(self, funds, price_dir="data_cache", base_amt=1000, max_daily=5000, params=None, valuation_method="minmax"):
+        self.funds = funds
+        self.valuation_method = valuation_method
+        self.price_dir = price_dir
+        self.base_amt = base_amt
+        self.max_daily = max_daily
+        self.params = params or {}
+        self.analyzer = TechnicalAnalyzer(asset_type='ETF')
+
+    # --- 信号 ---
+    def load_history(self, code):
+        path = os.path.join(self.price_dir, f"{code}.csv")
+        if not os.path.exists(path): return None
+        try:
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+            return df[~df.index.duplicated(keep='last')].sort_index()
+        except Exception as e:
+            logger.error(f"回测读取行情失败 {code}: {e}")
+            return None
+
+    def panel(self, cache_path=None):
+        """
+        参数无关的逐日面板 (指标分量 + 估值分位)，对齐到统一交易日索引
+        cache_path: .npz 缓存，行情文件 (大小/修改时间) 与字段未变时直接读取
+        Returns: (dict{字段: ndarray(日期 × 标的)}, dates, codes)；无可用行情时返回 None
+        """
+        if cache_path:
+            sig = self._panel_signature()
+            cached = self._load_panel(cache_path, sig)
+            if cached is not None: return cached
+        panel = self._build_panel()
+        if cache_path and panel is not None: self._save_panel(cache_path, sig, panel)
+        return panel
+
+    def _panel_signature(self):
+        parts = [",".join(PANEL_FIELDS), self.valuation_method]
+        for fund in self.funds:
+            path = os.path.join(self.price_dir, f"{fund['code']}.csv")
+            if os.path.exists(path):
+                st = os.stat(path)
+                parts.append(f"{fund['code']}:{st.st_size}:{st.st_mtime_ns}")
+        return "|".join(parts)
+
+    @staticmethod
+    def _load_panel(path, signature):
+        if not os.path.exists(path): return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                if str(z['signature']) != signature: return None
+                arrays = {f: z[f] for f in PANEL_FIELDS}
+                return arrays, pd.DatetimeIndex(z['dates']), [str(c) for c in z['codes']]
+        except Exception as e:
+            logger.warning(f"⚠️ 面板缓存读取失败，重新计算: {e}")
+            return None
+
+    @staticmethod
+    def _save_panel(path, signature, panel):
+        arrays, dates, codes = panel
+        tmp = f"{path}.tmp.npz"
+        try:
+            np.savez(tmp, signature=np.array(signature), dates=dates.values.astype('datetime64[ns]'), codes=np.array(codes), **arrays)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.error(f"面板缓存写入失败: {e}")
+            if os.path.exists(tmp): os.remove(tmp)
+
+    def _build_panel(self):
+        frames = {}
+        for fund in self.funds:
+            df = self.load_history(fund['code'])
+            if df is None or df.empty: continue
+            comp = self.analyzer.score_components(df)
+            # 按标的自身的 K 线滚动 (与实盘逐日 tail(window) 同口径，不受其他标的交易日差异影响)
+            comp['percentile'] = ValuationEngine.percentile_series(df['close'], method=self.valuation_method)
+            frames[fund['code']] = comp[PANEL_FIELDS].astype(float)
+        if not frames: return None
+
+        wide = pd.concat(frames, axis=1).sort_index()
+        codes = list(frames)
+        arrays = {}
+        for field in PANEL_FIELDS:
+            a = wide.xs(field, axis=1, level=1)[codes].values
+            # 当日无行情 (停牌/未上市) 视为否决、不交易
+            if field in ('veto', 'warmup'): a = np.where(np.isnan(a), 1.0, a)
+            elif field in ('base_score', 'trend_dir', 'adx'): a = np.nan_to_num(a)
+            arrays[field] = np.ascontiguousarray(a)
+        return arrays, wide.index, codes
+
+    def left_side_mask(self, codes):
+        types = {f['code']: f.get('strategy_type') for f in self.funds}
+        return np.array([types.get(c) in LEFT_SIDE_TYPES for c in codes])
+
+    @staticmethod
+    def signal_arrays(panel, left_side, params=None):
+        """面板 + 参数 -> 评分 / 否决 / 估值乘数 / 目标倍数 (均为 日期 × 标的 数组，无行情处倍数为 NaN)"""
+        sizing, adx_threshold, cuts = split_params(params)
+        out = TechnicalAnalyzer.combine_scores(panel, adx_threshold)
+        val_mult = ValuationEngine.multiplier_from_percentile(panel['percentile'], cuts)
+        mult = sizing_multiplier(out['score'], val_mult, out['veto'], left_side[None, :], sizing)
+        mult = np.where(np.isnan(panel['close']), np.nan, mult)
+        return {"score": out['score'], "veto": out['veto'], "val_mult": val_mult, "mult": mult}
+
+    def signals(self, panel=None, cache_path=None):
+        """
+        全部标的逐日信号
+        Returns: dict of DataFrame (日期 × 标的): close, score, veto, val_mult, mult
+        """
+        panel = panel or self.panel(cache_path)
+        if panel is None: return None
+        arrays, dates, codes = panel
+        sig = self.signal_arrays(arrays, self.left_side_mask(codes), self.params)
+        frame = lambda a: pd.DataFrame(a, index=dates, columns=codes)
+        return {"close": frame(arrays['close']), **{k: frame(v) for k, v in sig.items()}}
+
+    # --- 账本模拟 ---
+    def simulate(self, sig, start=None, end=None):
+        """逐交易日推进持仓，返回成交明细、个基市值与现金流"""
+        idx = sig['close'].index
+        mask = date_mask(idx, start, end)
+        codes = list(sig['close'].columns)
+        names = {f['code']: f['name'] for f in self.funds}
+        lock_days = {**SIZING_PARAMS, **self.params}['lock_days']
+        closes = sig['close'].values[mask]
+        shares, flows, trades = run_ledger(closes, sig['mult'].values[mask], self.base_amt, self.max_daily, lock_days, record=True)
+
+        dates = idx[mask]
+        trades = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+        trades.insert(0, 'date', dates[trades.pop('day').values.astype(int)])
+        trades.insert(1, 'code', [codes[j] for j in trades.pop('fund')])
+        trades.insert(2, 'name', [names.get(c, c) for c in trades['code']])
+        px = pd.DataFrame(closes, index=dates, columns=codes).ffill().fillna(0.0)
+        shares_df = pd.DataFrame(shares, index=dates, columns=codes)
+        return {"trades": trades, "mv_by_code": shares_df * px, "shares": shares_df,
+                "flows": pd.DataFrame(flows, index=dates, columns=codes)}
+
+    @staticmethod
+    def equity_curve(sim):
+        """
+        组合权益曲线: 市值、累计投入/回收、累计盈亏，及与 portfolio_nav 同口径的时间加权净值与回撤
+        """
+        eq = equity_arrays(sim['mv_by_code'].values, sim['flows'].values)
+        return pd.DataFrame(eq, index=sim['mv_by_code'].index)
+
+    @staticmethod
+    def fund_stats(sim):
+        """个基汇总：交易次数、投入、期末市值、已实现/总盈亏"""
+        trades = sim['trades']
+        mv = sim['mv_by_code'].iloc[-1]
+        if trades.empty:
+            return pd.DataFrame(index=mv.index, data={"trades": 0, "invested": 0.0, "market_value": mv, "realized": 0.0, "pnl": mv})
+        g = trades.groupby('code')
+        out = pd.DataFrame({
+            "name": g['name'].first(),
+            "trades": g.size(),
+            "invested": g['amount'].apply(lambda a: a[a > 0].sum()),
+            "withdrawn": g['amount'].apply(lambda a: -a[a < 0].sum()),
+            "realized": g['realized_pnl'].sum(),
+        }).reindex(mv.index).fillna({"trades": 0, "invested": 0.0, "withdrawn": 0.0, "realized": 0.0})
+        out['market_value'] = mv
+        out['pnl'] = out['market_value'] + out['withdrawn'] - out['invested']
+        return out.sort_values('pnl', ascending=False)
+
+    def run(self, start=None, end=None, panel=None, cache_path=None):
+        t0 = time.perf_counter()
+        sig = self.signals(panel, cache_path)
+        if sig is None:
+            logger.warning("⚠️ 回测无可用行情 (data_cache 为空?)")
+            return None
+        t1 = time.perf_counter()
+        sim = self.simulate(sig, start, end)
+        t2 = time.perf_counter()
+        sim['equity'] = self.equity_curve(sim)
+        sim['timing'] = {"signals": t1 - t0, "simulate": t2 - t1}
+        return sim
+
+
+TRADE_COLUMNS = ["day", "fund", "side", "price", "amount", "shares", "shares_before", "cost_before",
+                 "shares_after", "cost_after", "mult", "realized_pnl"]
+
+
+def date_mask(index, start=None, end=None):
+    mask = np.ones(len(index), dtype=bool)
+    if start is not None: mask &= index >= pd.Timestamp(start)
+    if end is not None: mask &= index <= pd.Timestamp(end)
+    return mask
+
+
+def run_ledger(closes, mults, base_amt, max_daily, lock_days, record=False):
+    """
+    账本状态循环 (每个交易日对全部标的做一次向量运算)，规则与 main + PortfolioTracker 一致:
+    开盘前 confirm_trades 持有天数 +1 -> 锁仓期内禁止卖出 -> 收盘价成交并更新摊薄成本
+    closes / mults: ndarray(日期 × 标的)，mults 为 NaN 表示当日不交易
+    Returns: (逐日收盘后份额, 逐日净申购额, 成交行列表 (record=True 时，列见 TRADE_COLUMNS))
+    """
+    n_days, n_funds = closes.shape
+    shares = np.zeros(n_funds)
+    cost = np.zeros(n_funds)
+    held = np.zeros(n_funds, dtype=int)
+    shares_hist = np.zeros((n_days, n_funds))
+    flow_hist = np.zeros((n_days, n_funds))
+    trades = []
+    max_daily = int(max_daily)
+
+    for i in range(n_days):
+        held[shares > 0] += 1
+        price = closes[i]
+        m = np.nan_to_num(mults[i], nan=0.0)
+        m = np.where((m < 0) & (shares > 0) & (held < lock_days), 0.0, m)
+
+        buy_amt = np.maximum(0, np.minimum(np.trunc(base_amt * m), max_daily))
+        buy = (m > 0) & (buy_amt > 0)
+        sell = (m < 0) & (shares > 0)
+        if buy.any() or sell.any():
+            before, cost_before = shares.copy(), cost.copy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                add = np.where(buy, buy_amt / price, 0.0)
+                sell_shares = np.where(sell, np.minimum(shares, shares * np.minimum(np.abs(m), 1.0)), 0.0)
+                total = shares + add
+                new_cost = np.round((shares * cost + add * price) / total, 4)
+            cost = np.where(buy & (total > 0), new_cost, cost)
+            held = np.where(buy & (held == 0), 1, held)
+            shares = np.maximum(0, total - sell_shares)
+            closed = sell & (shares == 0)
+            cost = np.where(closed, 0.0, cost)
+            held = np.where(closed, 0, held)
+            flow_hist[i] = np.where(buy | sell, (shares - before) * np.nan_to_num(price), 0.0)
+
+            if record:
+                for j in np.flatnonzero(buy | sell):
+                    trades.append((i, j, "B" if buy[j] else "S", price[j], round(flow_hist[i, j], 2),
+                                   shares[j] - before[j], before[j], cost_before[j], shares[j], cost[j], m[j],
+                                   round(sell_shares[j] * (price[j] - cost_before[j]), 2) if sell[j] else 0.0))
+        shares_hist[i] = shares
+    return shares_hist, flow_hist, trades
+
+
+def equity_arrays(mv_by_code, flows):
+    """
+    个基市值 / 现金流 (日期 × 标的) -> 逐日组合指标数组
+    时间加权收益与 portfolio_nav 同口径: r_t = (MV_t - MV_{t-1} - Flow_t) / MV_{t-1}
+    """
+    mv = mv_by_code.sum(axis=1)
+    flow = flows.sum(axis=1)
+    prev_mv = np.concatenate([[0.0], mv[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret = np.where(prev_mv > 0, (mv - prev_mv - flow) / prev_mv, 0.0)
+    nav = np.cumprod(1 + ret)
+    invested = np.cumsum(np.clip(flows, 0, None).sum(axis=1))
+    withdrawn = np.cumsum(np.clip(-flows, 0, None).sum(axis=1))
+    return {
+        "market_value": mv, "invested": invested, "withdrawn": withdrawn, "pnl": mv + withdrawn - invested,
+        "ret": ret, "nav": nav, "drawdown": nav / np.maximum.accumulate(nav) - 1
+    }
+
+
+def summarize(sim):
+    eq = sim['equity']
+    trades = sim['trades']
+    last = eq.iloc[-1]
+    return {
+        "start": eq.index[0].strftime("%Y-%m-%d"), "end": eq.index[-1].strftime("%Y-%m-%d"), "days": len(eq),
+        "funds": sim['mv_by_code'].shape[1], "trades": len(trades),
+        "buys": int((trades['side'] == 'B').sum()) if len(trades) else 0,
+        "sells": int((trades['side'] == 'S').sum()) if len(trades) else 0,
+        "invested": float(last['invested']), "withdrawn": float(last['withdrawn']),
+        "market_value": float(last['market_value']), "pnl": float(last['pnl']),
+        "nav": float(last['nav']), "max_drawdown": float(eq['drawdown'].min())
+    }
+
+
+def check_parity(params=None):
+    """
+    sizing_multiplier 与实盘 calculate_position_v13 逐格对拍 (评分 × 估值乘数 × VETO × 左侧定投)
+    VETO 按实盘输入: decision=REJECT / adjustment=-100 / tech_cro_signal=VETO；否则 PASS / 0
+    持仓 1 份、价格 1、已过锁仓期，比较 (买入额, 卖出额)。Returns: 不一致项列表
+    """
+    from main import calculate_position_v13
+    p = SIZING_PARAMS if params is None else {**SIZING_PARAMS, **params}
+    base_amt, max_daily = 1000, 1e12
+    issues = []
+    for score in range(0, 101):
+        for val_mult in (0.0, 0.3, 0.5, 0.7, 0.8, 1.0, 1.1, 1.2, 1.5, 2.0):
+            for veto in (False, True):
+                for strategy_type in ('core', 'growth'):
+                    tech = {'quant_score': score, 'price': 1.0, 'tech_cro_signal': 'VETO' if veto else 'PASS'}
+                    pos = {'shares': 1.0, 'held_days': 999}
+                    decision, adj = ('REJECT', -100) if veto else ('PASS', 0)
+                    amt, _, is_sell, s_val = calculate_position_v13(tech, adj, decision, val_mult, '', base_amt, max_daily, pos, strategy_type, '', params)
+                    m = float(sizing_multiplier(np.array([score]), np.array([val_mult]), np.array([veto]),
+                                                np.array([strategy_type in LEFT_SIDE_TYPES]), params)[0])
+                    expect = (int(base_amt * m) if m > 0 else 0, round(min(abs(m), 1.0), 6) if m < 0 else 0)
+                    live = (amt, round(s_val, 6) if is_sell else 0)
+                    if live != expect:
+                        issues.append({"score": score, "val_mult": val_mult, "veto": veto, "strategy_type": strategy_type,
+                                       "live": live, "backtest": expect})
+    return issues
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="V13 仓位规则全历史回测")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--funds", action="append", metavar="CODE", help="只回测指定标的，可重复 (默认 config 全部)")
+    parser.add_argument("--start", help="回测起始日 YYYY-MM-DD (指标仍用之前的历史预热)")
+    parser.add_argument("--end", help="回测结束日 YYYY-MM-DD")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="覆盖仓位参数，可重复")
+    parser.add_argument("--base-amt", type=float, help="覆盖单笔基准金额")
+    parser.add_argument("--max-daily", type=float, help="覆盖单日上限")
+    parser.add_argument("--price-dir", default="data_cache")
+    parser.add_argument("--panel-cache", help="指标面板缓存文件 (.npz)，行情未变时跳过指标计算")
+    parser.add_argument("--valuation", choices=["minmax", "rank"], help="估值分位算法 (默认取 config global.valuation_method)")
+    parser.add_argument("--trades", help="成交明细输出 CSV")
+    parser.add_argument("--equity", help="权益曲线输出 CSV")
+    parser.add_argument("--by-fund", action="store_true", help="打印个基汇总")
+    parser.add_argument("--check-parity", action="store_true", help="与 calculate_position_v13 逐格对拍仓位倍数 (含 VETO) 后退出")
+    args = parser.parse_args()
+
+    try:
+        overrides = parse_params(args.set)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if args.check_parity:
+        issues = check_parity(overrides)
+        for it in issues[:20]: print(f"   ❌ {it}")
+        print(f"{'✅' if not issues else '❌'} 仓位规则对拍: {len(issues)} 处不一致")
+        sys.exit(1 if issues else 0)
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    funds = [f for f in config.get('funds', []) if not args.funds or f['code'] in args.funds]
+    g = config.get('global', {})
+    bt = Backtester(funds, args.price_dir,
+                    g.get('base_invest_amount', 1000) if args.base_amt is None else args.base_amt,
+                    g.get('max_daily_invest', 5000) if args.max_daily is None else args.max_daily,
+                    overrides, args.valuation or g.get('valuation_method', 'minmax'))
+    sim = bt.run(args.start, args.end, cache_path=args.panel_cache)
+    if sim is None: sys.exit(1)
+
+    s = summarize(sim)
+    print(f"📈 回测 {s['start']} ~ {s['end']} ({s['days']} 个交易日, {s['funds']} 个标的) | 覆盖参数: {overrides or '无'}")
+    print(f"   成交 {s['trades']} 笔 (买 {s['buys']} / 卖 {s['sells']}) | 投入 ¥{s['invested']:,.0f} | 回收 ¥{s['withdrawn']:,.0f} | 期末市值 ¥{s['market_value']:,.0f}")
+    print(f"   累计盈亏 ¥{s['pnl']:,.0f} | 时间加权净值 {s['nav']:.4f} | 最大回撤 {s['max_drawdown']:.2%}")
+    if args.by_fund:
+        print(Backtester.fund_stats(sim).round(2).to_string())
+    print(f"⏱️ 信号 {sim['timing']['signals']:.2f}s | 账本模拟 {sim['timing']['simulate']:.2f}s")
+
+    if args.trades:
+        sim['trades'].to_csv(args.trades, index=False)
+        print(f"📝 成交明细已写入 {args.trades}")
+    if args.equity:
+        sim['equity'].to_csv(args.equity)
+        print(f"📝 权益曲线已写入 {args.equity}")
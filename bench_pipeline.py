@@ -0,0 +1,145 @@
+"""
+bench_pipeline.py | 离线全链路压测：用 mock_llm_server 驱动 main() 完整流程
+
+- 在临时目录复制 config / data_cache / data_news / portfolio.json，真实账本不受影响
+- 自动把最近一天的新闻复制为"今日"新闻 (时间整体平移到当前)，保证舆情上下文非空
+- 邮件配置被清空，send_email 会自动跳过
+- 输出端到端耗时 + 替身服务统计 (请求数/缓存命中/注入错误)
+
+用法:
+    python bench_pipeline.py --latency lognormal:0.8:0.4 --rate-limit 0.05 --runs 2
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+from mock_llm_server import MockLLMConfig, start_mock_server, get_stats
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def prepare_workdir(workdir, funds_limit=None):
+    """复制运行所需的本地数据到临时目录，关闭请求抖动与同日自动续跑"""
+    for name in ["data_cache", "data_news"]:
+        src = os.path.join(REPO_DIR, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(workdir, name))
+    for name in ["portfolio.json", "logo.png"]:
+        src = os.path.join(REPO_DIR, name)
+        if os.path.exists(src):
+            shutil.copy(src, workdir)
+
+    with open(os.path.join(REPO_DIR, "config.yaml"), "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    cfg.setdefault("global", {})["request_jitter"] = [0, 0]
+    # 多轮压测每轮都完整跑一遍：关闭同日自动续跑 (断点日志照常写入，仍计入耗时)
+    cfg["global"].setdefault("checkpoint", {})["auto_resume"] = False
+    if funds_limit:
+        cfg["funds"] = cfg.get("funds", [])[:funds_limit]
+    with open(os.path.join(workdir, "config.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True)
+
+    # 最近一天的新闻 -> 今日新闻
+    news_files = sorted(glob.glob(os.path.join(workdir, "data_news", "news_*.jsonl")))
+    if news_files:
+        from utils import get_beijing_time
+        today = get_beijing_time().strftime("%Y-%m-%d")
+        today_file = os.path.join(workdir, "data_news", f"news_{today}.jsonl")
+        if not os.path.exists(today_file):
+            restamp_news(news_files[-1], today_file, get_beijing_time())
+
+
+def restamp_news(src, dst, now):
+    """
+    复制归档新闻并整体平移时间，使最新一条落在 now (保持相对先后)
+    新闻库按时间窗口查询，原样复制的旧时间会落在窗口之外；id 由 time+title 生成，平移后去掉旧 id 重新生成
+    """
+    from datetime import datetime
+    items = []
+    with open(src, "r", encoding="utf-8") as f:
+        for line in f:
+            try: items.append(json.loads(line))
+            except Exception: continue
+    fmt = "%Y-%m-%d %H:%M:%S"
+
+    def parse(t):
+        try: return datetime.strptime(str(t)[:19], fmt)
+        except ValueError: return None
+
+    stamps = [parse(it.get("time")) for it in items]
+    newest = max((t for t in stamps if t), default=None)
+    shift = now.replace(tzinfo=None) - newest if newest else None
+    with open(dst, "w", encoding="utf-8") as f:
+        for it, t in zip(items, stamps):
+            if t and shift is not None:
+                it["time"] = (t + shift).strftime(fmt)
+            it.pop("id", None)
+            f.write(json.dumps(it, ensure_ascii=False) + "\n")
+
+
+def run_bench(args):
+    cfg = MockLLMConfig(args.latency, args.chunk_delay, args.error_rate, args.rate_limit, args.seed)
+    server, base_url = start_mock_server(cfg)
+
+    for key in ["EMAIL_USER", "EMAIL_PASS", "EMAIL_TO"]:
+        os.environ.pop(key, None)
+    os.environ["LLM_BASE_URL"] = base_url
+    os.environ["LLM_API_KEY"] = "mock-key"
+
+    workdir = tempfile.mkdtemp(prefix="fund_bench_")
+    origin = os.getcwd()
+    runs = []
+    try:
+        # 先切换目录再导入 utils/main，日志文件 latest_run.log 落在临时目录
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_DIR)
+        prepare_workdir(workdir, args.funds)
+        import main
+
+        for i in range(args.runs):
+            before = get_stats(server)
+            t0 = time.perf_counter()
+            main.main()
+            elapsed = time.perf_counter() - t0
+            after = get_stats(server)
+            delta = {k: after[k] - before[k] for k in after}
+            delta["wall_seconds"] = round(elapsed, 3)
+            delta["cache_ratio"] = round(delta["cached_tokens"] / delta["prompt_tokens"], 4) if delta["prompt_tokens"] else 0.0
+            runs.append(delta)
+            print(f"🏁 Run {i + 1}/{args.runs}: {elapsed:.2f}s | 请求 {delta['requests']} | 429 {delta['rate_limited']} | 错误 {delta['errors_injected']} | 缓存 {delta['cache_ratio']:.0%}")
+    finally:
+        os.chdir(origin)
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"📁 工作目录保留: {workdir}")
+
+    report = {"config": vars(args), "runs": runs}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线全链路压测 (Mock LLM)")
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:s | uniform:a:b | lognormal:median:sigma")
+    parser.add_argument("--chunk-delay", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--funds", type=int, default=None, help="仅压测前 N 个标的")
+    parser.add_argument("--out", default=None, help="结果 JSON 输出路径")
+    parser.add_argument("--keep", action="store_true", help="保留临时工作目录")
+    result = run_bench(parser.parse_args())
+    if not any(r["ok"] for r in result["runs"]):
+        sys.exit(1)
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+from utils import logger, atomic_write_json
+
+class RunCheckpoint:
+    """
+    [V19.6] 单日运行断点日志 (checkpoints/run_YYYY-MM-DD.json)
+
+    每个标的完成即原子落盘：技术面结果、AI 结果、决策与成交记录。
+    进程中途退出后，同一天再次运行会跳过已完成的标的，AI 费用不会重复产生；
+    成交通过 trade_id 与账本核对，保证每笔交易恰好记账一次。
+
+    标的状态:
+        pending_trade - 决策已算出，账本写入尚未确认
+        done          - 决策与记账均已完成
+    运行完整结束 (报告已发送) 后标记 completed，该日志不再被自动续跑。
+    """
+    def __init__(self, run_date, directory='checkpoints'):
+        self.run_date = run_date
+        self.path = os.path.join(directory, f"run_{run_date}.json")
+        self.lock = threading.Lock()
+        self.state = self._empty_state()
+
+    def _empty_state(self):
+        return {"run_date": self.run_date, "day_rolled": False, "completed": False, "market_context": None, "reviews": None, "funds": {}}
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+            logger.info(f"♻️ [断点] 已加载 {self.path}: 完成 {len(self.completed())} 个标的")
+        except Exception as e:
+            logger.error(f"断点文件读取失败: {e}, 从头开始")
+            self.state = self._empty_state()
+        return self
+
+    def start_new(self):
+        """丢弃当日断点从头开始；当日已做过的日切确认沿用，held_days 不会重复累加"""
+        day_rolled = False
+        if self.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    day_rolled = bool(json.load(f).get('day_rolled'))
+            except Exception: pass
+        with self.lock:
+            self.state = self._empty_state()
+            self.state['day_rolled'] = day_rolled
+            self._flush()
+        return self
+
+    def _flush(self):
+        try:
+            atomic_write_json(self.path, self.state)
+        except Exception as e:
+            logger.error(f"断点写入失败: {e}")
+
+    # --- 运行级状态 ---
+    def mark_day_rolled(self):
+        with self.lock:
+            self.state['day_rolled'] = True
+            self._flush()
+
+    def set_market_context(self, context):
+        with self.lock:
+            self.state['market_context'] = context
+            self._flush()
+
+    def mark_completed(self):
+        with self.lock:
+            self.state['completed'] = True
+            self._flush()
+
+    def is_completed(self):
+        return bool(self.state.get('completed'))
+
+    def set_reviews(self, cio_html, advisor_html):
+        with self.lock:
+            self.state['reviews'] = {"cio": cio_html, "advisor": advisor_html}
+            self._flush()
+
+    # --- 标的级状态 ---
+    def save_fund(self, code, status, result, cio_log, trade=None, snapshot=None):
+        """
+        trade: {"trade_id", "name", "amount", "price", "is_sell"} 或 None (无成交)
+        snapshot: RunSnapshot.fund_record，续跑时恢复到当日快照
+        """
+        with self.lock:
+            self.state['funds'][code] = {"status": status, "result": result, "cio_log": cio_log, "trade": trade, "snapshot": snapshot}
+            self._flush()
+
+    def mark_done(self, code):
+        with self.lock:
+            if code in self.state['funds']:
+                self.state['funds'][code]['status'] = 'done'
+                self._flush()
+
+    def completed(self):
+        """所有已产出决策的标的 (含待确认记账的)"""
+        with self.lock:
+            return dict(self.state['funds'])
@@ -1,4 +1,3 @@
-import akshare as ak
 import pandas as pd
 import time
 import random
@@ -109,6 +108,7 @@ class DataFetcher:
         [私有方法] 纯联网获取数据 (东财 -> 新浪 -> 腾讯)
         所有数据源统一返回标准字段结构
         """
+        import akshare as ak   # 仅联网时加载 (导入耗时约 1s，本地缓存路径无需)
         fetch_time = get_beijing_time().strftime("%Y-%m-%d %H:%M:%S")
         
         # 1. 东财 (EastMoney) - 优先数据源，字段最全
@@ -0,0 +1,81 @@
+"""
+import_budget.py | 启动导入预算检查 (python -X importtime)
+
+main.py 的本地流水线只读本地缓存与新闻文件，联网依赖必须留在抓取函数内按需导入。
+本脚本在子进程中冷启动导入目标模块，检查:
+    1. 禁止项: akshare / selenium / webdriver_manager 等网络栈不得在导入期加载
+    2. 预算: 累计导入耗时 (取多次冷启动的最小值，降低抖动) 不超过 --budget-ms
+
+用法:
+    python import_budget.py                      # 检查 main 与 replay
+    python import_budget.py --module main --budget-ms 800 --top 15
+退出码: 0 通过 / 1 超预算或出现禁止项
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各入口导入期禁止加载的顶层包
+FORBIDDEN = {
+    "main": ["akshare", "selenium", "webdriver_manager", "ta", "requests", "bs4"],
+    "replay": ["akshare", "selenium", "webdriver_manager", "ta", "requests", "bs4"],
+}
+
+
+def measure(module):
+    """冷启动导入一次，返回 [(self_us, cumulative_us, depth, name)]"""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    # 在临时目录运行：utils 导入时会创建日志文件
+    with tempfile.TemporaryDirectory() as cwd:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=cwd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} 失败:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cum_us), depth, name.strip()))
+    return rows
+
+
+def check(module, budget_ms, runs=3, top=10):
+    best = None
+    for _ in range(runs):
+        rows = measure(module)
+        total = next((r[1] for r in rows if r[3] == module and r[2] == 0), sum(r[0] for r in rows))
+        if best is None or total < best[0]:
+            best = (total, rows)
+    total_us, rows = best
+
+    loaded = {r[3].split(".")[0] for r in rows}
+    violations = [m for m in FORBIDDEN.get(module, []) if m in loaded]
+
+    print(f"📦 import {module}: {total_us / 1000:.0f}ms (预算 {budget_ms}ms, {runs} 次冷启动取最小)")
+    for self_us, cum_us, depth, name in sorted((r for r in rows if r[2] == 1), key=lambda r: -r[1])[:top]:
+        print(f"    {cum_us / 1000:8.1f}ms  {name}")
+    ok = True
+    if violations:
+        ok = False
+        print(f"❌ 导入期加载了禁止的网络依赖: {', '.join(violations)}")
+    if total_us / 1000 > budget_ms:
+        ok = False
+        print(f"❌ 超出导入预算: {total_us / 1000:.0f}ms > {budget_ms}ms")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导入耗时预算检查")
+    parser.add_argument("--module", action="append", help="目标模块，可重复 (默认 main, replay)")
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    results = [check(m, args.budget_ms, args.runs, args.top) for m in (args.module or ["main", "replay"])]
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,223 @@
+"""
+keyword_matcher.py | 多关键词匹配 (Aho-Corasick 自动机)
+
+宏观新闻筛选 (约 60 个天网关键词 + 垃圾词)、基金 sector_keyword、prompts_config.TREND_KEYWORDS
+都是 "一段文本 × 一组关键词" 的匹配。逐个 `k in text` 的代价是 O(关键词数 × 文本长度)；
+自动机构建一次后，每段文本只扫描一遍即可得到全部命中 (含位置、允许重叠)，与关键词数量无关。
+
+    m = KeywordMatcher(["降准", "降息", "LPR"])
+    m.find_all("央行宣布降准降息")      # [(4, 6, "降准"), (6, 8, "降息")]
+    m.mask(df["title"])                # 批量：bool 数组
+    g = KeywordMatcher.from_groups(TREND_KEYWORDS)
+    g.groups_in("放量上攻后高位放量滞涨")  # {"trend_up_confirm", "strength_weak"}
+
+基准测试 (与朴素 any/in 对比并校验结果一致):
+    python keyword_matcher.py --headlines 10000 --patterns 1000
+"""
+from collections import deque
+from functools import lru_cache
+
+# sector_keyword 含英文 (Nvidia / OpenAI / CPO / SPX)，统一忽略大小写；
+# matcher_for 与 MarketScanner 板块索引共用此默认，同一组关键词在两处命中一致
+SECTOR_IGNORE_CASE = True
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 自动机：goto 为每个状态的 {字符: 下一状态}，fail 为失配跳转，
+    out 为在该状态结束的关键词 (已沿 fail 链合并，匹配时无需再回溯输出)
+    ignore_case=True 时按小写匹配 (英文关键词如 LPR / MLF)
+    """
+    def __init__(self, patterns, ignore_case=False, groups=None):
+        self.ignore_case = ignore_case
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))   # 去重保序
+        self.groups = groups or {}      # 关键词 -> 所属分组集合 (from_groups 使用)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for p in self.patterns:
+            self._insert(p)
+        self._build()
+
+    @classmethod
+    def from_groups(cls, group_map, ignore_case=False):
+        """{分组: [关键词]} -> 匹配器；同一关键词可属于多个分组"""
+        groups = {}
+        for name, words in group_map.items():
+            for w in words:
+                groups.setdefault(w, set()).add(name)
+        return cls(list(groups), ignore_case=ignore_case, groups=groups)
+
+    def _norm(self, text):
+        text = str(text) if text is not None else ""
+        return text.lower() if self.ignore_case else text
+
+    def _insert(self, pattern):
+        state = 0
+        for ch in self._norm(pattern):
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (pattern,)
+
+    def _build(self):
+        """BFS 计算 fail 链，并把 fail 目标的输出并入当前状态"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _scan(self, text):
+        """逐字符推进自动机，产出 (结束位置, 关键词)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(self._norm(text)):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for p in out[state]:
+                    yield i + 1, p
+
+    # --- 单条文本 ---
+    def find_all(self, text):
+        """全部命中 (允许重叠)：[(start, end, 关键词)]，按结束位置排序"""
+        return [(end - len(p), end, p) for end, p in self._scan(text)]
+
+    def matched(self, text):
+        """命中的关键词集合"""
+        return {p for _, p in self._scan(text)}
+
+    def contains_any(self, text):
+        """是否命中任一关键词 (首个命中即返回；热路径，内联扫描循环)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in self._norm(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+    def groups_in(self, text):
+        """命中的分组集合 (from_groups 构建时有效)"""
+        return {g for _, p in self._scan(text) for g in self.groups.get(p, ())}
+
+    # --- 批量 ---
+    def find_many(self, texts):
+        """文本列表 / Series -> 每条的命中列表"""
+        return [self.find_all(t) for t in texts]
+
+    def mask(self, texts):
+        """文本列表 / Series -> bool 数组 (是否命中任一关键词)，可直接用于 DataFrame 过滤"""
+        import numpy as np
+        return np.fromiter((self.contains_any(t) for t in texts), dtype=bool, count=len(texts))
+
+    def __len__(self):
+        return len(self.patterns)
+
+@lru_cache(maxsize=256)
+def _cached_matcher(patterns, ignore_case):
+    return KeywordMatcher(patterns, ignore_case=ignore_case)
+
+def matcher_for(keywords, ignore_case=SECTOR_IGNORE_CASE):
+    """
+    按关键词组缓存的匹配器 (同一组关键词只构建一次)
+    keywords: 关键词列表，或空格分隔的字符串 (如 config.yaml 中的 sector_keyword)
+    ignore_case: 默认与板块索引一致 (SECTOR_IGNORE_CASE)
+    """
+    if isinstance(keywords, str):
+        keywords = keywords.split()
+    return _cached_matcher(tuple(keywords), ignore_case)
+
+# ==========================================
+# 基准测试
+# ==========================================
+def _load_headlines(n, seed):
+    """取 data_news 归档标题作语料，不足时随机拼接扩充到 n 条"""
+    import glob
+    import json
+    import random
+    rng = random.Random(seed)
+    titles = []
+    for path in sorted(glob.glob("data_news/news_*.jsonl")):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: titles.append(json.loads(line)['title'])
+                except Exception: pass
+    if not titles:
+        titles = ["央行开展逆回购操作 净投放资金", "北向资金午后加速流入 半导体板块拉升", "证监会发布市值管理指引"]
+    out = list(titles)
+    while len(out) < n:
+        a, b = rng.choice(titles), rng.choice(titles)
+        out.append(a[: len(a) // 2] + b[len(b) // 2:])
+    rng.shuffle(out)
+    return out[:n]
+
+def _sample_patterns(headlines, n, seed):
+    """从语料中随机截取 2~5 字片段作关键词 (部分必然命中)，再混入不会命中的片段"""
+    import random
+    rng = random.Random(seed)
+    patterns = set()
+    while len(patterns) < n * 0.8:
+        t = rng.choice(headlines)
+        if len(t) < 2: continue
+        k = rng.randint(2, min(5, len(t)))
+        i = rng.randint(0, len(t) - k)
+        patterns.add(t[i:i + k])
+    while len(patterns) < n:
+        patterns.add("".join(rng.choice("甲乙丙丁戊己庚辛壬癸") for _ in range(rng.randint(3, 5))))
+    return sorted(patterns)
+
+def benchmark(n_headlines=10000, n_patterns=1000, seed=42):
+    import time
+    headlines = _load_headlines(n_headlines, seed)
+    patterns = _sample_patterns(headlines, n_patterns, seed)
+
+    t0 = time.perf_counter()
+    matcher = KeywordMatcher(patterns)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    naive_any = [any(k in t for k in patterns) for t in headlines]
+    t_naive_any = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ac_any = matcher.mask(headlines)
+    t_ac_any = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    naive_all = [{k for k in patterns if k in t} for t in headlines]
+    t_naive_all = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ac_all = [matcher.matched(t) for t in headlines]
+    t_ac_all = time.perf_counter() - t0
+
+    assert list(ac_any) == naive_any, "contains_any 与朴素匹配结果不一致"
+    assert ac_all == naive_all, "matched 与朴素匹配结果不一致"
+    chars = sum(len(t) for t in headlines)
+    print(f"📏 {len(headlines)} 条标题 ({chars} 字) × {len(patterns)} 个关键词 | 自动机 {len(matcher._goto)} 个状态, 构建 {t_build*1000:.1f}ms")
+    print(f"   任一命中 : 朴素 {t_naive_any*1000:8.1f}ms | Aho-Corasick {t_ac_any*1000:8.1f}ms | {t_naive_any/t_ac_any:5.1f}x")
+    print(f"   全部命中 : 朴素 {t_naive_all*1000:8.1f}ms | Aho-Corasick {t_ac_all*1000:8.1f}ms | {t_naive_all/t_ac_all:5.1f}x")
+    print(f"   ✅ 结果一致: 命中 {int(ac_any.sum())} 条, 共 {sum(len(s) for s in ac_all)} 个关键词命中")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Aho-Corasick 多关键词匹配基准")
+    parser.add_argument("--headlines", type=int, default=10000)
+    parser.add_argument("--patterns", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    benchmark(args.headlines, args.patterns, args.seed)
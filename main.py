@@ -1,23 +1,26 @@
 import yaml
 import os
-import threading
+import sys
 import time
 import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from data_fetcher import DataFetcher
+from market_scanner import MarketScanner
 from news_analyst import NewsAnalyst
 from technical_analyzer import TechnicalAnalyzer
 from valuation_engine import ValuationEngine
 from portfolio_tracker import PortfolioTracker
-from utils import send_email, logger, LOG_FILENAME
+from utils import send_email, logger, LOG_FILENAME, get_beijing_time
+from checkpoint import RunCheckpoint
+from snapshot import RunSnapshot
+from metrics import metrics
 
 # 【🔥关键】导入 V19 渲染器
 from ui_renderer import render_html_report_v19
 
 # --- 全局配置 ---
 TEST_MODE = False
-tracker_lock = threading.Lock()
 
 def load_config():
     try:
@@ -27,7 +30,25 @@ def load_config():
         logger.error(f"配置文件读取失败: {e}")
         return {"funds": [], "global": {"base_invest_amount": 1000, "max_daily_invest": 5000}}
 
-def calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_amt, max_daily, pos, strategy_type, fund_name):
+# [V19.7] 仓位算法阈值 (replay.py 可逐项覆盖做 what-if)
+SIZING_PARAMS = {
+    "hold_cap": 59,                 # AI 给 HOLD 时战术分封顶
+    "score_strong": 85,  "mult_strong": 2.0,    # 战术:极强
+    "score_up": 70,      "mult_up": 1.0,        # 战术:走强
+    "score_stable": 60,  "mult_stable": 0.5,    # 战术:企稳
+    "score_break": 25,   "mult_break": -1.0,    # 战术:破位
+    "val_brake": 0.5,               # 买入时估值乘数 < 此值 -> 高估刹车
+    "val_boost": 1.0,               # 买入时估值乘数 > 此值 -> 按估值加倍
+    "val_bottom_lock": 1.2,         # 卖出时估值乘数 > 此值 -> 底部锁仓
+    "val_stop": 0.8,                # 卖出时估值乘数 < 此值 -> 高估止损
+    "stop_mult": 1.5,               # 高估止损放大倍数
+    "val_left_side": 1.5,           # 观望时估值乘数 >= 此值 -> 左侧定投
+    "mult_left_side": 0.5,
+    "lock_days": 7                  # 持仓不足 N 天禁止卖出
+}
+
+def calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_amt, max_daily, pos, strategy_type, fund_name, params=None):
+    p = SIZING_PARAMS if params is None else {**SIZING_PARAMS, **params}
     # 核心算分逻辑
     base_score = tech.get('quant_score', 50)
     try: ai_adj_int = int(ai_adj)
@@ -36,7 +57,7 @@ def calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_a
     tactical_score = max(0, min(100, base_score + ai_adj_int))
     
     if ai_decision == "REJECT": tactical_score = 0 
-    elif ai_decision == "HOLD" and tactical_score >= 60: tactical_score = 59
+    elif ai_decision == "HOLD" and tactical_score > p['hold_cap']: tactical_score = p['hold_cap']
             
     tech['final_score'] = tactical_score
     tech['ai_adjustment'] = ai_adj_int
@@ -46,27 +67,27 @@ def calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_a
     tactical_mult = 0
     reasons = []
 
-    if tactical_score >= 85: tactical_mult = 2.0; reasons.append("战术:极强")
-    elif tactical_score >= 70: tactical_mult = 1.0; reasons.append("战术:走强")
-    elif tactical_score >= 60: tactical_mult = 0.5; reasons.append("战术:企稳")
-    elif tactical_score <= 25: tactical_mult = -1.0; reasons.append("战术:破位")
+    if tactical_score >= p['score_strong']: tactical_mult = p['mult_strong']; reasons.append("战术:极强")
+    elif tactical_score >= p['score_up']: tactical_mult = p['mult_up']; reasons.append("战术:走强")
+    elif tactical_score >= p['score_stable']: tactical_mult = p['mult_stable']; reasons.append("战术:企稳")
+    elif tactical_score <= p['score_break']: tactical_mult = p['mult_break']; reasons.append("战术:破位")
 
     final_mult = tactical_mult
     if tactical_mult > 0:
-        if val_mult < 0.5: final_mult = 0; reasons.append(f"战略:高估刹车")
-        elif val_mult > 1.0: final_mult *= val_mult; reasons.append(f"战略:低估加倍")
+        if val_mult < p['val_brake']: final_mult = 0; reasons.append(f"战略:高估刹车")
+        elif val_mult > p['val_boost']: final_mult *= val_mult; reasons.append(f"战略:低估加倍")
     elif tactical_mult < 0:
-        if val_mult > 1.2: final_mult = 0; reasons.append(f"战略:底部锁仓")
-        elif val_mult < 0.8: final_mult *= 1.5; reasons.append("战略:高估止损")
+        if val_mult > p['val_bottom_lock']: final_mult = 0; reasons.append(f"战略:底部锁仓")
+        elif val_mult < p['val_stop']: final_mult *= p['stop_mult']; reasons.append("战略:高估止损")
     else:
-        if val_mult >= 1.5 and strategy_type in ['core', 'dividend']:
-            final_mult = 0.5; reasons.append(f"战略:左侧定投")
+        if val_mult >= p['val_left_side'] and strategy_type in ['core', 'dividend']:
+            final_mult = p['mult_left_side']; reasons.append(f"战略:左侧定投")
 
     if cro_signal == "VETO" and final_mult > 0:
         final_mult = 0; reasons.append(f"🛡️风控:否决")
     
     held_days = pos.get('held_days', 999)
-    if final_mult < 0 and pos['shares'] > 0 and held_days < 7:
+    if final_mult < 0 and pos['shares'] > 0 and held_days < p['lock_days']:
         final_mult = 0; reasons.append(f"规则:锁仓({held_days}天)")
 
     final_amt = 0; is_sell = False; sell_val = 0; label = "观望"
@@ -81,9 +102,55 @@ def calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_a
     if reasons: tech['quant_reasons'] = reasons
     return final_amt, label, is_sell, sell_val
 
-def process_single_fund(fund, config, fetcher, tracker, val_engine, analyst, market_context, base_amt, max_daily):
-    time.sleep(random.uniform(1.5, 3.0))
-    
+def _ai_stub_result(decision, adjustment, reason):
+    """闸门跳过时的确定性 AI 结果 (结构与 _get_fallback_result 一致)"""
+    return {
+        "decision": decision, "adjustment": adjustment,
+        "trend_analysis": {"stage": "UNCLEAR"},
+        "chairman_conclusion": f"[量化闸门] {reason}",
+        "ai_gated": reason
+    }
+
+# calculate_position_v13 中把 final_mult 置 0 的理由前缀
+_GATE_BINDING_REASONS = ("战略:高估刹车", "战略:底部锁仓", "🛡️风控:否决", "规则:锁仓")
+
+def plan_ai_gate(tech, val_mult, val_desc, base_amt, max_daily, pos, strategy_type, fund_name, adj_range=(-100, 100)):
+    """
+    [V19.3] 量化闸门：调用 AI 前判断其输出能否改变最终仓位决策
+    枚举 AI 可达的全部战术分 (EXECUTE: base+adj / HOLD: 封顶59 / REJECT: 0)，
+    若 calculate_position_v13 对所有分数给出同一结果，则 AI 调用毫无意义。
+    默认 adj_range=(-100, 100) 覆盖 0~100 全部分数，此时只有锁仓期、估值刹车/锁仓等
+    使仓位与战术分无关的情形会被跳过；收窄 adj_range 才会按分数区间跳过更多调用。
+    Returns: None (需要调用 AI) 或 确定性的 AI 结果字典
+    """
+    # 1. VETO: analyze_fund_v5 对 fuse_level>=2 强制 REJECT/-100，结果与模型输出无关
+    if tech.get('tech_cro_signal', 'PASS') == 'VETO':
+        return _ai_stub_result('REJECT', -100, f"VETO熔断: {tech.get('tech_cro_comment', '-')}")
+
+    # 2. 枚举可达战术分
+    base_score = tech.get('quant_score', 50)
+    lo = max(0, min(100, base_score + adj_range[0]))
+    hi = max(0, min(100, base_score + adj_range[1]))
+    scores = set(range(lo, hi + 1))
+    scores |= {min(sc, SIZING_PARAMS['hold_cap']) for sc in scores}
+    scores.add(0)
+
+    # 仓位结果只看 (买入额, 卖出额)：空仓时的"卖出¥0"与观望对账本等价
+    # 同时收集各分数下把仓位压为 0 的规则 (高估刹车/底部锁仓/风控否决/锁仓期)，即 "使 AI 无法改变决策" 的实际原因
+    outcomes, binding = set(), []
+    for sc in sorted(scores):
+        sim = dict(tech)
+        amt, lbl, is_sell, s_val = calculate_position_v13(sim, sc - base_score, 'EXECUTE', val_mult, val_desc, base_amt, max_daily, pos, strategy_type, fund_name)
+        outcomes.add((amt, round(s_val, 6) if is_sell else 0))
+        if len(outcomes) > 1: return None
+        for r in sim.get('quant_reasons', []):
+            if r.startswith(_GATE_BINDING_REASONS) and r not in binding: binding.append(r)
+
+    reason = f"{'/'.join(binding)}: AI无法改变决策" if binding else "AI调整范围内决策不变"
+    # 中性结果 (PASS/0)：final_score 即量化分，战术理由照常生成；用 HOLD 会被封顶 59，报表排序与回放都会失真
+    return _ai_stub_result('PASS', 0, reason)
+
+def process_single_fund(fund, config, fetcher, tracker, val_engine, analyst, market_context, base_amt, max_daily, checkpoint=None, snapshot=None, scanner=None):
     fund_name = fund['name']
     fund_code = fund['code']
     
@@ -91,49 +158,65 @@ def process_single_fund(fund, config, fetcher, tracker, val_engine, analyst, mar
 
     try:
         # 1. 获取数据
-        data = fetcher.get_fund_history(fund_code)
+        with metrics.span("load", fund_code):
+            data = fetcher.get_fund_history(fund_code)
         if data is None or data.empty: 
             logger.warning(f"❌ [1/6] 数据获取失败: {fund_name}")
             return None, "", []
         
         # 2. 技术分析
-        analyzer_instance = TechnicalAnalyzer(asset_type='ETF') 
-        tech = analyzer_instance.calculate_indicators(data)
+        with metrics.span("indicators", fund_code):
+            analyzer_instance = TechnicalAnalyzer(asset_type='ETF') 
+            tech = analyzer_instance.calculate_indicators(data)
         if not tech: 
             logger.warning(f"❌ [2/6] 技术指标计算失败: {fund_name}")
             return None, "", []
         
         # 3. 估值分析 【🔥修复点：使用新的参数格式】
         # 你的 valuation_engine.py 是零网络版，只需要 code 和 data
-        val_mult, val_desc = val_engine.get_valuation_status(fund_code, data)
+        with metrics.span("valuation", fund_code):
+            val_mult, val_desc = val_engine.get_valuation_status(fund_code, data)
         
-        with tracker_lock: pos = tracker.get_position(fund_code)
+        with metrics.span("ledger_read", fund_code):
+            pos = tracker.get_position(fund_code)
 
         # 4. AI 分析
         ai_res = {}
-        if analyst:
+        gate_cfg = config.get('global', {}).get('ai_gate', {})
+        if analyst and gate_cfg.get('enabled', True):
+            with metrics.span("ai_gate", fund_code):
+                gated = plan_ai_gate(tech, val_mult, val_desc, base_amt, max_daily, pos, fund.get('strategy_type'), fund_name, tuple(gate_cfg.get('adj_range', (-100, 100))))
+            if gated:
+                ai_res = gated
+                metrics.incr("llm_calls_skipped")
+                logger.info(f"🚦 [4/6] 量化闸门跳过 AI: {gated['ai_gated']}")
+
+        if analyst and not ai_res:
+            # 随机间隔只用于平滑 LLM 请求，放在调用前：本地加载/计算与被闸门跳过的标的不再空等
+            jitter = config.get('global', {}).get('request_jitter', [1.5, 3.0])
+            time.sleep(random.uniform(*jitter))
             logger.info(f"🤖 [4/6] 呼叫 AI 投委会...")
             cro_signal = tech.get('tech_cro_signal', 'PASS')
             risk_payload = {"fuse_level": 3 if cro_signal == 'VETO' else 0, "risk_msg": tech.get('tech_cro_comment', '监控')}
             
-            ai_res = analyst.analyze_fund_v5(fund_name, tech, None, market_context, risk_payload, fund.get('strategy_type', 'core'))
+            with metrics.span("llm", fund_code):
+                sector_news = scanner.get_sector_news(fund.get('sector_keyword', '')) if scanner else None
+                ai_res = analyst.analyze_fund_v5(fund_name, tech, None, market_context, risk_payload, fund.get('strategy_type', 'core'), sector_news=sector_news)
             logger.info(f"🗣️ [投委会] {ai_res.get('decision')} | 阶段:{ai_res.get('trend_analysis',{}).get('stage')}")
 
         ai_adj = ai_res.get('adjustment', 0)
         ai_decision = ai_res.get('decision', 'PASS') 
         
-        # 5. 决策计算
-        amt, lbl, is_sell, s_val = calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_amt, max_daily, pos, fund.get('strategy_type'), fund_name)
+        # 5. 决策计算 (输入先留快照，calculate_position_v13 会就地改写 tech)
+        inputs = RunSnapshot.fund_inputs(fund, tech, ai_res, val_mult, val_desc, pos, base_amt, max_daily) if snapshot else None
+        with metrics.span("sizing", fund_code):
+            amt, lbl, is_sell, s_val = calculate_position_v13(tech, ai_adj, ai_decision, val_mult, val_desc, base_amt, max_daily, pos, fund.get('strategy_type'), fund_name)
+        if ai_res.get('ai_gated'): tech.setdefault('quant_reasons', []).append("闸门:免AI")
+        snap_record = RunSnapshot.fund_record(inputs, amt, lbl, is_sell, s_val) if snapshot else None
+        if snapshot: snapshot.add_fund(snap_record)
         
-        with tracker_lock:
-            tracker.record_signal(fund_code, lbl)
-            if amt > 0: 
-                tracker.add_trade(fund_code, fund_name, amt, tech['price'])
-            elif is_sell: 
-                tracker.add_trade(fund_code, fund_name, s_val, tech['price'], True)
-
         cio_log = f"标的:{fund_name} | 阶段:{ai_res.get('trend_analysis',{}).get('stage','-')} | 决策:{lbl}"
-        return {
+        result = {
             "name": fund_name, 
             "code": fund_code, 
             "index_name": fund.get('index_name'), 
@@ -142,25 +225,78 @@ def process_single_fund(fund, config, fetcher, tracker, val_engine, analyst, mar
             "is_sell": is_sell, 
             "tech": tech, 
             "ai_analysis": ai_res
-        }, cio_log, []
+        }
+
+        trade = None
+        if amt > 0 or is_sell:
+            trade = {"trade_id": f"{checkpoint.run_date}:{fund_code}" if checkpoint else None, "name": fund_name,
+                     "amount": s_val if is_sell else amt, "price": tech['price'], "is_sell": is_sell}
+        # 先落盘决策再记账：中途退出时续跑可凭 trade_id 补记，不会重复或遗漏
+        if checkpoint: checkpoint.save_fund(fund_code, 'pending_trade', result, cio_log, trade, snap_record)
+
+        with metrics.span("ledger_write", fund_code):
+            tracker.record_signal(fund_code, lbl)
+            if trade:
+                tracker.add_trade(fund_code, fund_name, trade['amount'], trade['price'], is_sell, trade_id=trade['trade_id'])
+
+        if checkpoint: checkpoint.mark_done(fund_code)
+        return result, cio_log, []
     except Exception as e:
         logger.error(f"❌ Error {fund_name}: {e}", exc_info=True); return None, "", []
 
-def main():
+def open_checkpoint(config, argv=None):
+    """
+    断点续跑: 默认同一天再次运行自动续跑 (global.checkpoint.auto_resume)
+    --resume 强制续跑，--fresh 丢弃当日断点从头开始
+    已完整结束的日志不自动续跑 (否则当日第二次运行什么也不做)，仅 --resume 时复用
+    """
+    argv = sys.argv if argv is None else argv
+    ck_cfg = config.get('global', {}).get('checkpoint', {})
+    if not ck_cfg.get('enabled', True): return None
+    ck = RunCheckpoint(get_beijing_time().strftime("%Y-%m-%d"), ck_cfg.get('directory', 'checkpoints'))
+    resume = "--resume" in argv or (ck_cfg.get('auto_resume', True) and "--fresh" not in argv)
+    if resume and ck.exists():
+        ck.load()
+        if not ck.is_completed() or "--resume" in argv:
+            return ck
+        logger.info("♻️ [断点] 当日运行已完整结束，重新开始 (沿用日切状态)")
+    return ck.start_new()
+
+def main(profiler=None):
+    """profiler: 可选的 profiler.ProfileSession，仅剖析模式下传入"""
+    metrics.reset()
     config = load_config()
-    fetcher, tracker, val_engine = DataFetcher(), PortfolioTracker(), ValuationEngine()
+    fetcher, tracker, val_engine = DataFetcher(), PortfolioTracker(), ValuationEngine(config.get('global', {}).get('valuation_method', 'minmax'))
+    checkpoint = open_checkpoint(config)
+    snapshot = RunSnapshot(get_beijing_time().strftime("%Y-%m-%d")) if config.get('global', {}).get('snapshot', True) else None
     
-    tracker.confirm_trades()
+    # 日切确认只做一次，续跑时不能重复累加 held_days
+    if not (checkpoint and checkpoint.state.get('day_rolled')):
+        tracker.confirm_trades()
+        if checkpoint: checkpoint.mark_day_rolled()
     
     try: analyst = NewsAnalyst()
     except: analyst = None
 
-    # 1. 强制读取本地新闻文件
-    market_context = analyst.get_market_context() if analyst else "无数据"
+    # 1. 强制读取本地新闻文件 (续跑时沿用断点中的舆情上下文，保证前后一致)
+    with metrics.span("news_context"):
+        market_context = checkpoint.state.get('market_context') if checkpoint else None
+        if not market_context:
+            daemon_url = config.get('global', {}).get('news_daemon_url') or None
+            market_context = analyst.get_market_context(daemon_url=daemon_url) if analyst else "无数据"
+            if checkpoint: checkpoint.set_market_context(market_context)
     # 2. 清洗新闻用于UI
     all_news_seen = [line.strip() for line in market_context.split('\n') if line.strip().startswith('[')]
 
     funds = config.get('funds', [])
+
+    # 3. 板块舆情：全部标的的 sector_keyword 一次取数、单遍匹配 (TTL 内复用缓存)，各标的只查表
+    scanner = None
+    sector_cfg = config.get('global', {}).get('sector_news', {})
+    if analyst and sector_cfg.get('enabled', True):
+        with metrics.span("sector_news"):
+            scanner = MarketScanner(ttl=sector_cfg.get('ttl', 600), daemon_url=config.get('global', {}).get('news_daemon_url') or None)
+            scanner.prime_sectors([f.get('sector_keyword', '') for f in funds], per_sector=sector_cfg.get('per_sector', 5))
     
     if TEST_MODE:
         if funds:
@@ -171,31 +307,117 @@ def main():
             return
 
     results, cio_lines = [], []
-    
-    logger.info("🚀 启动处理 (本地模式: 新闻+数据)...")
-    
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        futures = {executor.submit(process_single_fund, f, config, fetcher, tracker, val_engine, analyst, market_context, config['global']['base_invest_amount'], config['global']['max_daily_invest']): f for f in funds}
-        for f in as_completed(futures):
-            res, log, _ = f.result()
-            if res: 
-                results.append(res); cio_lines.append(log)
-                print(f"✅ 完成处理: {res['name']}") 
+
+    # 批量写回：本次运行的成交只改内存，全部标的处理完后一次原子提交；中途异常则整批回滚
+    # (断点续跑按 trade_id 与账本核对，未提交的成交会在续跑时补记)
+    ledger_batch = config.get('global', {}).get('ledger_batch', True)
+    if ledger_batch: tracker.begin_batch()
+    try:
+        # 断点中已完成的标的直接复用；其成交按 trade_id 与账本核对，缺失则补记
+        done = checkpoint.completed() if checkpoint else {}
+        for code, entry in done.items():
+            trade = entry.get('trade')
+            if trade and not tracker.has_trade(code, trade['trade_id']):
+                logger.info(f"♻️ [断点] 补记成交: {trade['name']} {trade['trade_id']}")
+                tracker.add_trade(code, trade['name'], trade['amount'], trade['price'], trade['is_sell'], trade_id=trade['trade_id'])
+            checkpoint.mark_done(code)
+            results.append(entry['result']); cio_lines.append(entry['cio_log'])
+            if snapshot and entry.get('snapshot'): snapshot.add_fund(entry['snapshot'])
+        pending_funds = [f for f in funds if f['code'] not in done]
+        if done:
+            logger.info(f"♻️ [断点] 跳过已完成 {len(done)} 个标的，剩余 {len(pending_funds)} 个")
+        
+        logger.info("🚀 启动处理 (本地模式: 新闻+数据)...")
+        
+        fund_worker = profiler.wrap_fund(process_single_fund) if profiler else process_single_fund
+        with metrics.span("funds_total"), ThreadPoolExecutor(max_workers=1) as executor:
+            futures = {executor.submit(fund_worker, f, config, fetcher, tracker, val_engine, analyst, market_context, config['global']['base_invest_amount'], config['global']['max_daily_invest'], checkpoint, snapshot, scanner): f for f in pending_funds}
+            for f in as_completed(futures):
+                res, log, _ = f.result()
+                if res: 
+                    results.append(res); cio_lines.append(log)
+                    print(f"✅ 完成处理: {res['name']}") 
+    except BaseException:
+        if ledger_batch:
+            tracker.rollback()
+        raise
+
+    # 一次性提交本次运行的全部成交 (非批量模式下合并追加日志)
+    tracker.commit()
+    tracker.compact()
+    stats = tracker.lock_stats()
+    if stats['contended']:
+        logger.info(f"🔒 [账本锁] 获取 {stats['acquired']} 次，竞争 {stats['contended']} 次，累计等待 {stats['wait_seconds'] * 1000:.1f}ms")
+
+    # 组合净值 / 暴露 / 回撤 (基于成交历史 + 本地行情，一次向量化计算)
+    nav_html = ""
+    if config.get('global', {}).get('report_nav', True):
+        with metrics.span("nav"):
+            try:
+                strategy_map = {f['code']: f.get('strategy_type', 'core') for f in config.get('funds', [])}
+                nav = tracker.valuation(strategy_map)
+                nav_summary = nav.summary()
+                nav_html = nav.render_html(nav_summary, {f['code']: f['name'] for f in config.get('funds', [])})
+                if nav_summary:
+                    logger.info(f"📈 [组合] 市值 ¥{nav_summary['market_value']:,.0f} | 当日 {nav_summary['day_return']:+.2%} | 回撤 {nav_summary['current_drawdown']:.2%}")
+            except Exception as e:
+                logger.error(f"组合净值计算失败: {e}")
+
+    gated_count = sum(1 for r in results if r['ai_analysis'].get('ai_gated'))
+    if results:
+        logger.info(f"🚦 [AI闸门] 跳过 {gated_count}/{len(results)} 次 AI 调用")
+
+    if analyst:
+        cache = analyst.get_cache_summary()
+        logger.info(f"🧊 [Prompt Cache] 调用 {cache['calls']} 次 | 命中 {cache['cached_tokens']}/{cache['prompt_tokens']} tokens ({cache['hit_ratio']:.0%})")
 
     if results:
         results.sort(key=lambda x: -x['tech'].get('final_score', 0))
         full_report = "\n".join(cio_lines)
-        cio_html = analyst.review_report(full_report, market_context) if analyst else ""
-        advisor_html = analyst.advisor_review(full_report, market_context) if analyst else ""
+        cio_html, advisor_html = "", ""
+        reviews = checkpoint.state.get('reviews') if checkpoint else None
+        if reviews:
+            cio_html, advisor_html = reviews.get('cio', ""), reviews.get('advisor', "")
+        elif analyst:
+            # CIO 复盘与红队审计互不依赖，并发执行，总耗时取两者较慢者
+            with metrics.span("review"), ThreadPoolExecutor(max_workers=2) as review_pool:
+                cio_future = review_pool.submit(analyst.review_report, full_report, market_context)
+                advisor_future = review_pool.submit(analyst.advisor_review, full_report, market_context)
+                cio_html, advisor_html = cio_future.result(), advisor_future.result()
+            if checkpoint: checkpoint.set_reviews(cio_html, advisor_html)
+
+        if snapshot:
+            snapshot.set_news(all_news_seen)
+            snapshot.set_reviews(cio_html, advisor_html)
+            snapshot.save()
         
+        # 运行指标落盘 (JSON + Prometheus)，可选附到邮件
+        run_summary = metrics.export()
+        timing_html = metrics.render_html(run_summary) if config.get('global', {}).get('report_timing', False) else ""
+
         # 调用 V19 渲染器
-        html = render_html_report_v19(all_news_seen, results, cio_html, advisor_html) 
+        html = render_html_report_v19(all_news_seen, results, cio_html, advisor_html, timing_html, nav_html) 
         
+        # 剖析模式：报告作为邮件附件
+        attachment = profiler.finish() if profiler else None
+
         subject_prefix = "🚧 [测试] " if TEST_MODE else "🕊️ "
-        send_email(f"{subject_prefix}鹊知风 V19.0 全量化仪表盘", html) 
+        send_email(f"{subject_prefix}鹊知风 V19.0 全量化仪表盘", html, attachment_path=attachment) 
         
         logger.info("✅ 运行结束，邮件已发送。")
+        if checkpoint: checkpoint.mark_completed()
     else:
+        metrics.export()
         logger.warning("⚠️ 没有生成任何结果，请检查日志报错。")
 
-if __name__ == "__main__": main()
+if __name__ == "__main__":
+    # 剖析模式 (--profile 或 FUND_PROFILE=1)；关闭时不导入 profiler
+    if "--profile" in sys.argv or os.getenv("FUND_PROFILE"):
+        from profiler import ProfileSession, profiling_requested
+        session = ProfileSession.from_env() if profiling_requested() else None
+        if session: session.start()
+        try: main(session)
+        finally:
+            if session: session.finish()
+    else:
+        main()
@@ -1,12 +1,47 @@
-import akshare as ak
-import requests
+import hashlib
+import json
+import os
 import re
+import threading
+import time
 from datetime import datetime
-from utils import logger, retry
+from utils import logger, retry, atomic_write_json
+from keyword_matcher import KeywordMatcher, SECTOR_IGNORE_CASE
+
+# 天网关键词 (OR 关系: 只要命中一个就被捕获)
+MACRO_KEYWORDS = [
+    "中共中央", "政治局", "国务院", "发改委", "财政部", "国资委", "证监会", "央行", "外管局", "新华社",
+    "加息", "降息", "降准", "LPR", "MLF", "逆回购", "社融", "M2", "信贷", "特别国债", "赤字率", "流动性",
+    "GDP", "CPI", "PPI", "PMI", "非农", "失业率", "通胀", "零售", "出口", "汇率", "人民币",
+    "印花税", "T+0", "停牌", "注册制", "退市", "做空", "融券", "量化限制", "市值管理", "分红", "回购",
+    "汇金", "证金", "社保基金", "大基金", "北向", "外资", "增持", "举牌", "平准基金",
+    "突发", "重磅", "立案", "调查", "违约", "破产", "战争", "制裁", "地缘", "暴雷"
+]
+
+JUNK_WORDS = ["汇总", "集锦", "回顾", "收评", "早报", "晚报", "盘前", "要闻精选", "公告一览", "涨停分析", "复盘"]
+
+# [V19.20] 关键词自动机只构建一次，每条标题单遍扫描 (替代逐条 iterrows + any(k in title))
+MACRO_MATCHER = KeywordMatcher(MACRO_KEYWORDS)
+JUNK_MATCHER = KeywordMatcher(JUNK_WORDS)
+
+# [V19.22] 板块舆情索引：全部标的的 sector_keyword 一次取数、单遍匹配，按 TTL 缓存在内存与磁盘
+SECTOR_CACHE_PATH = os.path.join("data_news", "sector_news_cache.json")
+SECTOR_TTL = 600             # 秒；prime_sectors 时同一批关键词在 TTL 内复用已有索引 (含断点续跑/重复运行)
+SECTOR_LOOKBACK_HOURS = 24
+SECTOR_CANDIDATES = 500      # 参与匹配的最近新闻条数
+SECTOR_PER_SECTOR = 5
+
+def _sector_key(keyword):
+    """sector_keyword 字符串归一化 (合并空白)，作为板块索引的键"""
+    return " ".join(str(keyword or "").split())
 
 class MarketScanner:
-    def __init__(self):
-        pass
+    def __init__(self, cache_path=SECTOR_CACHE_PATH, ttl=SECTOR_TTL, daemon_url=None):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.daemon_url = daemon_url     # 常驻采集服务地址 (news_daemon.py)；为空读本地新闻库
+        self._sector_index = None    # {"built_at", "signature", "sectors": {板块键: [新闻]}}
+        self._sector_lock = threading.Lock()
 
     def _format_time(self, time_str):
         """统一时间格式为 MM-DD HH:MM"""
@@ -26,6 +61,7 @@ class MarketScanner:
         """
         news_list = []
         try:
+            import akshare as ak   # 仅联网扫描时加载
             df = ak.stock_news_em(symbol="要闻")
             
             title_col = 'title'
@@ -38,54 +74,31 @@ class MarketScanner:
                 if '发布时间' in df.columns: time_col = '发布时间'
                 elif 'time' in df.columns: time_col = 'time'
 
-            # 天网关键词 (OR 关系: 只要命中一个就被捕获)
-            keywords = [
-                "中共中央", "政治局", "国务院", "发改委", "财政部", "国资委", "证监会", "央行", "外管局", "新华社",
-                "加息", "降息", "降准", "LPR", "MLF", "逆回购", "社融", "M2", "信贷", "特别国债", "赤字率", "流动性",
-                "GDP", "CPI", "PPI", "PMI", "非农", "失业率", "通胀", "零售", "出口", "汇率", "人民币",
-                "印花税", "T+0", "停牌", "注册制", "退市", "做空", "融券", "量化限制", "市值管理", "分红", "回购",
-                "汇金", "证金", "社保基金", "大基金", "北向", "外资", "增持", "举牌", "平准基金",
-                "突发", "重磅", "立案", "调查", "违约", "破产", "战争", "制裁", "地缘", "暴雷"
-            ]
-            
-            junk_words = ["汇总", "集锦", "回顾", "收评", "早报", "晚报", "盘前", "要闻精选", "公告一览", "涨停分析", "复盘"]
+            titles = df[title_col].astype(str).str.strip()
+            times = df[time_col].astype(str) if time_col in df.columns else titles.map(lambda _: "")
+            valid = ((titles != '') & (titles != 'nan')).values & ~JUNK_MATCHER.mask(titles)
 
             # --- 第一轮：关键词精准检索 (Priority) ---
-            for _, row in df.iterrows():
-                title = str(row.get(title_col, ''))
-                raw_time = str(row.get(time_col, ''))
-                
-                if not title or title == 'nan': continue
-                if any(jw in title for jw in junk_words): continue
-                
-                clean_time = self._format_time(raw_time)
-                
-                # OR 关系：只要包含任意一个关键词
-                if any(k in title for k in keywords):
-                    news_list.append({
-                        "title": title.strip(),
-                        "source": "全球快讯",
-                        "time": clean_time
-                    })
+            # OR 关系：只要包含任意一个关键词
+            hits = valid & MACRO_MATCHER.mask(titles)
+            for title, raw_time in zip(titles[hits], times[hits]):
+                news_list.append({
+                    "title": title,
+                    "source": "全球快讯",
+                    "time": self._format_time(raw_time)
+                })
 
             # --- 第二轮：备选兜底 (Fallback) ---
             # 如果关键词一个都没查出来 (len == 0)，则启动备选方案
             if len(news_list) == 0:
                 logger.info("📡 天网关键词未命中，启动备选兜底模式...")
-                for _, row in df.iterrows():
-                    title = str(row.get(title_col, ''))
-                    raw_time = str(row.get(time_col, ''))
-                    
-                    if not title or title == 'nan': continue
-                    if any(jw in title for jw in junk_words): continue
-                    
-                    # 备选：不管有没有关键词，只要不是垃圾词，都抓进来
+                # 备选：不管有没有关键词，只要不是垃圾词，都抓进来 (抓5条就够了)
+                for title, raw_time in list(zip(titles[valid], times[valid]))[:5]:
                     news_list.append({
-                        "title": title.strip(), 
+                        "title": title, 
                         "source": "市场资讯", 
                         "time": self._format_time(raw_time)
                     })
-                    if len(news_list) >= 5: break # 备选抓5条就够了
 
             return news_list
             
@@ -93,5 +106,100 @@ class MarketScanner:
             logger.warning(f"宏观新闻获取微瑕: {e}")
             return [{"title": "数据源波动，关注盘面资金。", "source": "系统", "time": datetime.now().strftime("%m-%d %H:%M")}]
 
-    def get_sector_news(self, keyword):
-        return []
+    # --- 板块舆情 ---
+    def prime_sectors(self, keywords, lookback_hours=SECTOR_LOOKBACK_HOURS,
+                      candidates=SECTOR_CANDIDATES, per_sector=SECTOR_PER_SECTOR):
+        """
+        为一批 sector_keyword 建立板块舆情索引 (主流程启动时传入全部标的的关键词)
+        最近 lookback_hours 小时的新闻只取一次 (采集服务或本地新闻库)，近似重复折叠后，
+        用全部板块关键词合成的一个自动机逐条扫描一遍，命中哪些关键词即归入哪些板块。
+        内存/磁盘缓存按关键词集合签名 + TTL 复用，之后 get_sector_news 只是查表。
+        TTL 只在 prime 时判断：索引一经建立即在本实例 (一次运行) 内固定，
+        运行途中过期也不重建，保证先后处理的标的看到同一批板块舆情。
+        Returns: {板块键: [{"time", "source", "title", "hits"}]}
+        """
+        sectors = sorted({_sector_key(k) for k in keywords if _sector_key(k)})
+        signature = hashlib.md5(json.dumps([sectors, lookback_hours, per_sector], ensure_ascii=False).encode('utf-8')).hexdigest()
+        with self._sector_lock:
+            for index in (self._sector_index, self._load_sector_cache()):
+                if index and index.get('signature') == signature and time.time() - index.get('built_at', 0) < self.ttl:
+                    self._sector_index = index
+                    return index['sectors']
+            index = {"built_at": time.time(), "signature": signature,
+                     "sectors": self._build_sector_index(sectors, lookback_hours, candidates, per_sector)}
+            self._sector_index = index
+            try:
+                atomic_write_json(self.cache_path, index)
+            except Exception as e:
+                logger.warning(f"⚠️ [板块舆情] 缓存写入失败: {e}")
+            return index['sectors']
+
+    def _load_sector_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ [板块舆情] 缓存读取失败 ({e})，重新构建")
+            return None
+
+    def _load_recent_news(self, lookback_hours, candidates):
+        """最近新闻 (按时间倒序)：优先采集服务，不可用时读本地新闻库"""
+        from news_store import NewsStore, since_hours, fetch_daemon_latest
+        if self.daemon_url:
+            try:
+                return fetch_daemon_latest(self.daemon_url, lookback_hours, candidates)
+            except Exception as e:
+                logger.warning(f"⚠️ [板块舆情] 采集服务不可用 ({e})，回退本地新闻库")
+        store = None
+        try:
+            store = NewsStore()
+            return store.latest(candidates, since=since_hours(lookback_hours))
+        except Exception as e:
+            logger.warning(f"⚠️ [板块舆情] 读取新闻库出错: {e}")
+            return []
+        finally:
+            if store: store.close()
+
+    def _build_sector_index(self, sectors, lookback_hours, candidates, per_sector):
+        from news_dedup import cluster_news
+        rows = self._load_recent_news(lookback_hours, candidates)
+        matcher = KeywordMatcher.from_groups({s: s.split() for s in sectors}, ignore_case=SECTOR_IGNORE_CASE)
+        index = {s: [] for s in sectors}
+        full = set()
+        for cluster in cluster_news(rows):
+            item = cluster['item']
+            title = str(item.get('title') or '').strip()
+            if len(title) < 2: continue
+            hits_by_sector = {}
+            for p in matcher.matched(f"{title}\n{item.get('content') or ''}"):
+                for s in matcher.groups.get(p, ()):
+                    if s not in full: hits_by_sector.setdefault(s, []).append(p)
+            for s, hits in hits_by_sector.items():
+                source = "/".join(cluster['sources'])
+                if cluster['count'] > 1: source += f" ×{cluster['count']}"
+                index[s].append({"time": self._format_time(item.get('time')), "source": source,
+                                 "title": title, "hits": sorted(hits)})
+                if len(index[s]) >= per_sector: full.add(s)
+            if len(full) == len(sectors): break
+        covered = sum(1 for v in index.values() if v)
+        logger.info(f"🧭 [板块舆情] {len(rows)} 条新闻单遍匹配 {len(sectors)} 组板块关键词: {covered} 组有命中")
+        return index
+
+    def get_sector_news(self, keyword, limit=SECTOR_PER_SECTOR):
+        """
+        单个标的 sector_keyword 的相关新闻 (按时间倒序)
+        只查 prime_sectors 固定下来的索引，不按 TTL 重建；尚未 prime 时以该关键词单独建立一次。
+        未收录的关键词返回空列表 (调用方应在运行开始时传入全部关键词)
+        """
+        key = _sector_key(keyword)
+        if not key:
+            return []
+        index = self._sector_index
+        if index is None:
+            return self.prime_sectors([key]).get(key, [])[:limit]
+        if key not in index['sectors']:
+            logger.warning(f"⚠️ [板块舆情] 关键词未在本次索引中: {key[:20]}...")
+            return []
+        return index['sectors'][key][:limit]
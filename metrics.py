@@ -0,0 +1,149 @@
+"""
+metrics.py | 轻量级运行指标 (阶段耗时 / 计数器 / 峰值内存)
+
+用法:
+    from metrics import metrics
+    with metrics.span("indicators", fund=fund_code):
+        ...
+    metrics.incr("llm_prompt_tokens", 1200)
+    metrics.export("run_stats")
+"""
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from utils import logger
+
+try:
+    import resource   # Windows 无此模块
+except ImportError:
+    resource = None
+
+
+def _percentile(sorted_vals, q):
+    """最近秩百分位 (输入须已排序)"""
+    if not sorted_vals: return 0.0
+    idx = max(0, min(len(sorted_vals) - 1, math.ceil(q * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+
+def _stage_stats(vals):
+    """单阶段耗时列表 -> 次数/合计/p50/p95/max (全局与单标的同一口径)"""
+    s = sorted(vals)
+    return {
+        "count": len(s), "total": round(sum(s), 6),
+        "p50": round(_percentile(s, 0.50), 6), "p95": round(_percentile(s, 0.95), 6),
+        "max": round(s[-1], 6) if s else 0.0
+    }
+
+
+def get_peak_rss_bytes():
+    if resource is None: return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位 KB，macOS 单位 Byte
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.durations = defaultdict(list)                        # stage -> [秒]
+            self.fund_durations = defaultdict(lambda: defaultdict(list))   # fund -> stage -> [秒]
+            self.counters = defaultdict(float)
+            self.started_at = time.time()
+
+    @contextmanager
+    def span(self, stage, fund=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self.lock:
+                self.durations[stage].append(elapsed)
+                if fund is not None:
+                    self.fund_durations[fund][stage].append(elapsed)
+
+    def incr(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def summary(self):
+        with self.lock:
+            stages = {stage: _stage_stats(vals) for stage, vals in self.durations.items()}
+            # 单标的也记录次数与分位：区分 "单次慢" 与 "调用次数多" (如 LLM 重试)
+            per_fund = {}
+            for f, st in self.fund_durations.items():
+                per_fund[f] = {"stages": {stage: _stage_stats(vals) for stage, vals in st.items()},
+                               "total": round(sum(sum(vals) for vals in st.values()), 6)}
+            counters = dict(self.counters)
+            wall = time.time() - self.started_at
+        return {
+            "wall_seconds": round(wall, 3),
+            "peak_rss_bytes": get_peak_rss_bytes(),
+            "stages": stages,
+            "per_fund": per_fund,
+            "counters": counters
+        }
+
+    def to_prometheus(self, summary=None):
+        """Prometheus 文本格式 (textfile collector 可直接采集)"""
+        summary = summary or self.summary()
+        lines = [
+            "# HELP fund_stage_duration_seconds Per-stage duration of the fund pipeline.",
+            "# TYPE fund_stage_duration_seconds summary"
+        ]
+        for stage, st in sorted(summary["stages"].items()):
+            lines.append(f'fund_stage_duration_seconds{{stage="{stage}",quantile="0.5"}} {st["p50"]}')
+            lines.append(f'fund_stage_duration_seconds{{stage="{stage}",quantile="0.95"}} {st["p95"]}')
+            lines.append(f'fund_stage_duration_seconds_sum{{stage="{stage}"}} {st["total"]}')
+            lines.append(f'fund_stage_duration_seconds_count{{stage="{stage}"}} {st["count"]}')
+        lines += ["# HELP fund_run_counter Run-level counters (tokens, bytes, calls).", "# TYPE fund_run_counter counter"]
+        for name, val in sorted(summary["counters"].items()):
+            lines.append(f'fund_run_counter{{name="{name}"}} {val:g}')
+        lines += [
+            "# TYPE fund_run_wall_seconds gauge", f"fund_run_wall_seconds {summary['wall_seconds']}",
+            "# TYPE fund_peak_rss_bytes gauge", f"fund_peak_rss_bytes {summary['peak_rss_bytes']}"
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, out_dir="run_stats"):
+        """写出 run_metrics.json 与 run_metrics.prom，返回汇总字典"""
+        summary = self.summary()
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            with open(os.path.join(out_dir, "run_metrics.json"), "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+            with open(os.path.join(out_dir, "run_metrics.prom"), "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus(summary))
+        except Exception as e:
+            logger.error(f"指标导出失败: {e}")
+        return summary
+
+    def render_html(self, summary=None):
+        """邮件报告用的耗时摘要表"""
+        summary = summary or self.summary()
+        rows = "".join(
+            f"<tr><td>{stage}</td><td>{st['count']}</td><td>{st['p50']:.3f}</td><td>{st['p95']:.3f}</td><td>{st['max']:.3f}</td><td>{st['total']:.2f}</td></tr>"
+            for stage, st in sorted(summary["stages"].items(), key=lambda kv: -kv[1]["total"])
+        )
+        c = summary["counters"]
+        return (
+            "<table><tr><th>阶段</th><th>次数</th><th>p50(s)</th><th>p95(s)</th><th>max(s)</th><th>合计(s)</th></tr>"
+            f"{rows}</table>"
+            f"<div style='margin-top:4px; color:#888; font-size:11px;'>总耗时 {summary['wall_seconds']:.1f}s | "
+            f"峰值内存 {summary['peak_rss_bytes'] / 1048576:.0f}MB | "
+            f"LLM tokens {int(c.get('llm_prompt_tokens', 0))}+{int(c.get('llm_completion_tokens', 0))} | "
+            f"LLM 流量 {int(c.get('llm_bytes_in', 0)) / 1024:.0f}KB</div>"
+        )
+
+
+metrics = RunMetrics()
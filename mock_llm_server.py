@@ -0,0 +1,275 @@
+"""
+mock_llm_server.py | 本地 OpenAI 兼容 LLM 替身 (离线压测/回归专用)
+
+- POST /chat/completions: 支持普通 JSON 与 SSE 流式 (stream=true)
+- 可配置延迟分布 (fixed / uniform / lognormal)、错误注入、429 限流注入
+- Token 计数 + 前缀缓存模拟 (usage.prompt_tokens_details.cached_tokens)
+- 战术层请求返回满足 TACTICAL_IC 输出协议的 JSON，内容按 (seed, 请求内容) 确定性生成
+- GET /stats: 返回累计统计；POST /reset: 清零
+
+用法:
+    python mock_llm_server.py --port 8765 --latency lognormal:0.8:0.4 --error-rate 0.02 --rate-limit 0.05
+    LLM_BASE_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockLLMConfig:
+    def __init__(self, latency="fixed:0.05", stream_chunk_delay=0.005, error_rate=0.0, rate_limit_rate=0.0, seed=42):
+        self.latency = latency                       # 首 token 前的延迟分布
+        self.stream_chunk_delay = stream_chunk_delay # 流式每块间隔 (秒)
+        self.error_rate = error_rate                 # 返回 500 的概率
+        self.rate_limit_rate = rate_limit_rate       # 返回 429 的概率
+        self.seed = seed
+
+    def sample_latency(self, rng):
+        """解析 'fixed:s' | 'uniform:a:b' | 'lognormal:median:sigma'"""
+        kind, *args = self.latency.split(":")
+        args = [float(a) for a in args]
+        if kind == "uniform":
+            return rng.uniform(args[0], args[1])
+        if kind == "lognormal":
+            return rng.lognormvariate(math.log(args[0]), args[1])
+        return args[0] if args else 0.0
+
+
+def count_tokens(text):
+    """粗略计数：CJK 字符约 1 token/字，其余约 4 字符/token"""
+    if not text: return 0
+    cjk = sum(1 for ch in text if '\u4e00' <= ch <= '\u9fff')
+    return cjk + max(0, len(text) - cjk) // 4
+
+
+class MockLLMState:
+    """服务端共享状态：统计计数与前缀缓存"""
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+        self.seen_prefixes = set()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {
+                "requests": 0, "ok": 0, "errors_injected": 0, "rate_limited": 0, "streamed": 0,
+                "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "bytes_out": 0
+            }
+            self.seen_prefixes.clear()
+
+    def bump(self, **kwargs):
+        with self.lock:
+            for k, v in kwargs.items():
+                self.stats[k] += v
+
+    def roll(self):
+        """决定本次请求的命运：('error'|'429'|'ok', latency)"""
+        with self.lock:
+            r = self.rng.random()
+            latency = self.config.sample_latency(self.rng)
+        if r < self.config.rate_limit_rate: return "429", latency
+        if r < self.config.rate_limit_rate + self.config.error_rate: return "error", latency
+        return "ok", latency
+
+    def prompt_usage(self, messages):
+        """按消息粒度模拟前缀缓存：与历史请求一致的前导消息视为命中"""
+        total, cached, prefix_hit = 0, 0, True
+        digest = hashlib.sha1()
+        with self.lock:
+            for m in messages:
+                tokens = count_tokens(m.get("content", ""))
+                total += tokens
+                digest.update(json.dumps(m, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+                key = digest.hexdigest()
+                if prefix_hit and key in self.seen_prefixes:
+                    cached += tokens
+                else:
+                    prefix_hit = False
+                    self.seen_prefixes.add(key)
+        return total, cached
+
+
+def build_tactical_json(seed, prompt_text):
+    """生成满足 TACTICAL_IC 协议的确定性 JSON (同一 seed + 同一请求 -> 同一结果)"""
+    h = int(hashlib.md5(f"{seed}:{prompt_text}".encode("utf-8")).hexdigest(), 16)
+    rng = random.Random(h)
+    stage = rng.choice(["START", "ACCELERATING", "EXHAUSTION", "REVERSAL"])
+    decision = rng.choices(["EXECUTE", "HOLD", "REJECT"], weights=[4, 5, 1])[0]
+    return {
+        "trend_analysis": {
+            "direction": rng.choice(["UP", "DOWN", "RANGE", "UNCLEAR"]),
+            "stage": stage,
+            "confidence": rng.choice(["HIGH", "MEDIUM", "LOW"]),
+            "ma_alignment": rng.choice(["BULLISH", "BEARISH", "MIXED"]),
+            "key_levels": {"support_1": "MA20", "support_2": "MA60", "resistance_1": "前高", "stop_loss": "MA20", "invalidation": "MA60"},
+            "divergence": {"type": "NONE", "severity": "LOW", "triggered": False},
+            "expectation_gap": {"type": "NONE", "description": "mock"},
+            "volume_status": "CONFIRMED"
+        },
+        "cro_audit": {
+            "max_drawdown_scenario": "[mock] 跌破MA60触发止损", "drawdown_estimate": "-5%", "bias_rate": "3%",
+            "bias_alert": False, "liquidity_stress": "PASS", "divergence_veto": False, "hedge_proposal": "无"
+        },
+        "cgo_proposal": {
+            "catalyst": "[mock] 无明确催化剂", "catalyst_strength": "WEAK", "stage_assessment": stage,
+            "expectation_analysis": "mock", "price_in_status": "PARTIAL"
+        },
+        "debate_summary": "mock",
+        "chairman_conclusion": f"[mock] {decision} @ {stage}",
+        "decision": decision,
+        "adjustment": rng.randint(-30, 30),
+        "position_size": f"{rng.randint(0, 60)}%",
+        "execution_notes": "mock"
+    }
+
+
+def build_review_html(seed, prompt_text):
+    h = hashlib.md5(f"{seed}:{prompt_text}".encode("utf-8")).hexdigest()[:8]
+    paragraphs = [f"<p>[mock-{h}] 第{i + 1}段审计结论：趋势与仓位匹配度正常。</p>" for i in range(12)]
+    return "<h3>Mock 复盘</h3>" + "".join(paragraphs)
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None   # 由 start_mock_server 绑定
+
+    def log_message(self, *args):
+        pass
+
+    def handle(self):
+        # 客户端读到 [DONE] 即关闭连接属于正常行为，不打印堆栈
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+
+    def _send_json(self, code, obj):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.state.bump(bytes_out=len(body))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+        self.state.bump(bytes_out=len(data))
+
+    def do_GET(self):
+        if self.path.startswith("/stats"):
+            with self.state.lock:
+                stats = dict(self.state.stats)
+            return self._send_json(200, stats)
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        if self.path.startswith("/reset"):
+            self.state.reset()
+            return self._send_json(200, {"ok": True})
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": "not found"})
+
+        try:
+            req = json.loads(raw)
+        except ValueError:
+            return self._send_json(400, {"error": "bad json"})
+
+        self.state.bump(requests=1)
+        fate, latency = self.state.roll()
+        time.sleep(latency)
+        if fate == "429":
+            self.state.bump(rate_limited=1)
+            return self._send_json(429, {"error": {"message": "rate limited (mock)", "type": "rate_limit"}})
+        if fate == "error":
+            self.state.bump(errors_injected=1)
+            return self._send_json(500, {"error": {"message": "injected failure (mock)"}})
+
+        messages = req.get("messages", [])
+        prompt_text = "".join(m.get("content", "") for m in messages)
+        prompt_tokens, cached_tokens = self.state.prompt_usage(messages)
+        if req.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps(build_tactical_json(self.state.config.seed, prompt_text), ensure_ascii=False)
+        else:
+            content = build_review_html(self.state.config.seed, prompt_text)
+        completion_tokens = count_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+        self.state.bump(ok=1, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens, completion_tokens=completion_tokens)
+
+        model = req.get("model", "mock")
+        resp_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        if not req.get("stream"):
+            return self._send_json(200, {
+                "id": resp_id, "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        # SSE 流式：chunked 传输，逐块推送
+        self.state.bump(streamed=1)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = 40
+        for i in range(0, len(content), step):
+            delta = {"id": resp_id, "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode("utf-8"))
+            time.sleep(self.state.config.stream_chunk_delay)
+        final = {"id": resp_id, "object": "chat.completion.chunk", "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        self._write_chunk(f"data: {json.dumps(final, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def start_mock_server(config=None, host="127.0.0.1", port=0):
+    """后台线程启动替身服务，返回 (server, base_url)；用完调用 server.shutdown()"""
+    config = config or MockLLMConfig()
+    handler = type("BoundMockLLMHandler", (MockLLMHandler,), {"state": MockLLMState(config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+
+def get_stats(server):
+    with server.RequestHandlerClass.state.lock:
+        return dict(server.RequestHandlerClass.state.stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容 LLM 替身")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0.05", help="fixed:s | uniform:a:b | lognormal:median:sigma")
+    parser.add_argument("--chunk-delay", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    cfg = MockLLMConfig(args.latency, args.chunk_delay, args.error_rate, args.rate_limit, args.seed)
+    srv, url = start_mock_server(cfg, args.host, args.port)
+    print(f"🧪 Mock LLM 已启动: {url}  (Ctrl+C 退出)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -1,11 +1,29 @@
-import requests
 import json
 import os
 import re
 import time
+import threading
 from datetime import datetime
 from utils import logger, retry, get_beijing_time
-from prompts_config import TACTICAL_IC_PROMPT, STRATEGIC_CIO_REPORT_PROMPT, RED_TEAM_AUDIT_PROMPT
+from metrics import metrics
+from keyword_matcher import KeywordMatcher
+from prompts_config import (
+    TACTICAL_IC_SYSTEM_PROMPT, TACTICAL_IC_CONTEXT_PROMPT, TACTICAL_IC_FUND_PROMPT,
+    STRATEGIC_CIO_SYSTEM_PROMPT, RED_TEAM_SYSTEM_PROMPT, STRATEGIC_CONTEXT_PROMPT, STRATEGIC_REPORT_PROMPT,
+    TREND_KEYWORDS
+)
+
+# [V19.20] 趋势关键词库编译一次，用于校验 AI 输出措辞 (单遍扫描全部分组)
+TREND_MATCHER = KeywordMatcher.from_groups(TREND_KEYWORDS)
+
+def _iter_strings(obj):
+    """递归取出 AI 结果中的全部字符串字段"""
+    if isinstance(obj, str):
+        yield obj
+    elif isinstance(obj, dict):
+        for v in obj.values(): yield from _iter_strings(v)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj: yield from _iter_strings(v)
 
 class NewsAnalyst:
     def __init__(self):
@@ -19,71 +37,90 @@ class NewsAnalyst:
             "Content-Type": "application/json"
         }
 
-    def get_market_context(self, max_length=35000): 
+        # [V19.2] Prompt Cache 命中统计 (多线程累加)
+        self.cache_stats = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        self._stats_lock = threading.Lock()
+
+    def get_market_context(self, max_length=35000, lookback_hours=24, limit=80, daemon_url=None): 
         """
-        [核心逻辑 - 修改] 强制读取本地新闻文件
-        不再进行联网抓取，只读 news_crawler.py 生成的文件
-        修改点：倒序排列新闻，优先投喂最新消息，并增加条数上限以填满上下文
+        [核心逻辑 - 修改] 强制读取本地新闻库
+        不再进行联网抓取，只读 news_loader.py 生成的归档 (经 NewsStore 索引)
+        修改点：按新闻时间倒序，优先投喂最新消息，并增加条数上限以填满上下文
+        [V19.18] 由整份解析当日 JSONL 改为查询新闻库：取最近 lookback_hours 小时内最新 limit 条 (可跨日)
+        [V19.19] 组装前折叠近似重复 (东财/财联社同一事件)，每簇保留一条并标注来源数，同样的字符预算容纳更多独立信息
+        [V19.21] daemon_url: 常驻采集服务 (news_daemon.py) 地址，设置后直接查询其接口，不读归档文件；不可用时回退本地新闻库
         """
+        from news_store import NewsStore, since_hours
+        from news_dedup import cluster_news, cluster_stats
         today_str = get_beijing_time().strftime("%Y-%m-%d")
-        
-        # 1. 寻找本地文件 (兼容两种路径)
-        possible_paths = [
-            f"data_news/news_{today_str}.jsonl",
-            f"news_{today_str}.jsonl"
-        ]
-        
-        target_file = None
-        for p in possible_paths:
-            if os.path.exists(p):
-                target_file = p
-                break
-        
-        # 2. 如果没找到文件，返回警告
-        if not target_file:
-            logger.warning(f"⚠️ 未找到今日新闻文件: {possible_paths}")
-            return "【系统提示】本地新闻库缺失，请先运行 news_crawler.py。当前仅基于技术面分析。"
 
-        logger.info(f"📂 正在加载本地新闻: {target_file}")
-        
-        # 3. 读取并解析
+        # 1. 优先查询常驻采集服务；否则同步归档增量 (兼容两种路径)，再按时间窗口查询
+        # 多取一倍候选：折叠后仍能凑满 limit 条独立新闻
+        rows = self._fetch_daemon_news(daemon_url, lookback_hours, limit * 2) if daemon_url else None
+        if rows is None:
+            store = None
+            try:
+                store = NewsStore()
+                store.sync_dir("data_news")
+                store.sync_file(f"news_{today_str}.jsonl")
+                rows = store.latest(limit * 2, since=since_hours(lookback_hours))
+            except Exception as e:
+                logger.error(f"读取新闻库出错: {e}")
+                rows = []
+            finally:
+                if store: store.close()
+
+        # 2. 如果窗口内没有新闻，返回警告
+        if not rows:
+            logger.warning(f"⚠️ 新闻库中无最近 {lookback_hours} 小时的新闻")
+            return "【系统提示】本地新闻库缺失，请先运行 news_loader.py。当前仅基于技术面分析。"
+
+        logger.info(f"📂 已加载本地新闻: 最近 {lookback_hours} 小时 {len(rows)} 条")
+
+        # 3. 近似重复折叠 (SimHash + LSH)
+        clusters = cluster_news(rows)
+        stats = cluster_stats(clusters)
+        metrics.incr("news_near_duplicates", stats['merged'])
+        if stats['merged']:
+            logger.info(f"🧹 [新闻去重] {stats['items']} 条 -> {stats['clusters']} 簇 (折叠 {stats['merged']} 条，最大簇 {stats['largest']} 条)")
+
+        # 4. 格式化 (已按时间倒序：最新的新闻在列表最前面)
         news_candidates = []
-        try:
-            with open(target_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        item = json.loads(line)
-                        title = item.get('title', '').strip()
-                        content = item.get('content', '').strip()
-                        source = item.get('source', 'Local')
-                        # 截取时间字符串，只要 HH:MM
-                        time_str = str(item.get('time', ''))
-                        if len(time_str) > 16: time_str = time_str[5:16]
-                        
-                        if len(title) < 2: continue
-                        
-                        # 格式化
-                        entry = f"[{time_str}] [{source}] {title}"
-                        # 如果有摘要且不重复，加上摘要
-                        if len(content) > 30 and content != title:
-                            entry += f"\n   (摘要: {content[:150]}...)"
-                            
-                        news_candidates.append(entry)
-                    except: pass
-        except Exception as e:
-            logger.error(f"读取新闻文件出错: {e}")
+        for cluster in clusters:
+            item = cluster['item']
+            title = item['title'].strip()
+            content = item['content'].strip()
+            source = "/".join(cluster['sources'])
+            if cluster['count'] > 1: source += f" ×{cluster['count']}"
+            # 截取时间字符串，只要 MM-DD HH:MM
+            time_str = str(item['time'])
+            if len(time_str) > 16: time_str = time_str[5:16]
+
+            if len(title) < 2: continue
 
-        if not news_candidates:
-            return "本地新闻文件内容为空。"
+            # 格式化
+            entry = f"[{time_str}] [{source}] {title}"
+            # 如果有摘要且不重复，加上摘要
+            if len(content) > 30 and content != title:
+                entry += f"\n   (摘要: {content[:150]}...)"
 
-        # [修改点] 4. 倒序排列：确保最新的新闻在列表最前面
-        # 假设文件写入顺序是时间正序（旧->新），则 reverse 后为（新->旧）
-        news_candidates.reverse()
+            news_candidates.append(entry)
 
-        # [修改点] 5. 截断优化：扩大条数限制到 80 条
+        # [修改点] 5. 截断优化：条数上限 limit (默认 80 条)
         # 后续在 analyze_fund_v5 中会有 15000 字符的硬截断
         # 这样做的目的是优先保证最新新闻被包含，直到达到字符长度限制
-        return "\n".join(news_candidates[:80])
+        return "\n".join(news_candidates[:limit])
+
+    def _fetch_daemon_news(self, daemon_url, lookback_hours, limit, timeout=5):
+        """从常驻采集服务读取时间窗口内的新闻；服务不可用返回 None (调用方回退本地新闻库)"""
+        from news_store import fetch_daemon_latest
+        try:
+            items = fetch_daemon_latest(daemon_url, lookback_hours, limit, timeout)
+            logger.info(f"🛰️ 已从采集服务读取新闻: {len(items)} 条")
+            return items
+        except Exception as e:
+            logger.warning(f"⚠️ 采集服务不可用 ({e})，回退本地新闻库")
+            return None
 
     def _clean_json(self, text):
         try:
@@ -111,13 +148,22 @@ class NewsAnalyst:
             if div_type == "TOP_DIVERGENCE" and res.get('decision') == 'EXECUTE':
                 res['decision'] = 'HOLD'
                 res['adjustment'] = 0
+
+            # 3. 措辞校验：命中禁用模糊词只记录告警，不改变决策
+            vague = sorted({p for text in _iter_strings(res) for _, _, p in TREND_MATCHER.find_all(text)
+                            if "forbidden_vague" in TREND_MATCHER.groups.get(p, ())})
+            if vague:
+                res['vague_terms'] = vague
+                metrics.incr("ai_vague_terms", len(vague))
+                logger.warning(f"🗣️ [措辞校验] AI 输出含模糊词: {', '.join(vague)}")
         except: pass
         return res
 
     @retry(retries=1, delay=2)
-    def analyze_fund_v5(self, fund_name, tech, macro, news, risk, strategy_type="core"):
+    def analyze_fund_v5(self, fund_name, tech, macro, news, risk, strategy_type="core", sector_news=None):
         """
         [战术层] V3.2 生产版调用 - 全量指标投喂
+        [V19.22] sector_news: MarketScanner.get_sector_news 的板块相关新闻，放在单标的后缀 (共享前缀不变，不影响 Prompt Cache)
         """
         fuse_level, fuse_msg = risk['fuse_level'], risk['risk_msg']
         
@@ -135,12 +181,22 @@ class NewsAnalyst:
         2. MACD深度: 趋势={tech.get('macd', {}).get('trend', '-')}, 结构背离={tech.get('macd', {}).get('divergence', 'NONE')}
         3. 量价结构: 量比={tech.get('volume_analysis', {}).get('vol_ratio', 1.0)}
         """
+        if sector_news:
+            lines = "\n".join(f"        - [{n['time']}] [{n['source']}] {n['title']} (命中: {'/'.join(n['hits'])})" for n in sector_news)
+            extended_tech_context += f"4. 板块舆情 (命中本标的关键词，时间倒序):\n{lines}\n"
 
         # 确保 news 不为空，避免 AI 瞎编
         # 注意：这里 news 已经是按时间倒序排列的字符串了
         safe_news = news if news and len(news) > 10 else "【注意】今日无本地新闻数据，请严格基于技术指标分析。"
 
-        prompt = TACTICAL_IC_PROMPT.format(
+        # [V19.2] 三段式消息：静态系统前缀 -> 当日共享舆情 -> 单标的后缀
+        # 前两段在一次运行内逐字节一致，服务端可命中 Prompt Cache
+        # [关键点] 这里限制 15000 字符。
+        # 由于 news 已经是倒序（最新在前），所以这里 [:15000] 会保留最新的约 50-80 条新闻，截断旧的。
+        context_prompt = TACTICAL_IC_CONTEXT_PROMPT.format(
+            news_content=f"【本地新闻摘要】\n{str(safe_news)[:15000]}"
+        )
+        fund_prompt = TACTICAL_IC_FUND_PROMPT.format(
             fund_name=fund_name, strategy_type=strategy_type,
             trend_score=tech.get('quant_score', 50), fuse_level=fuse_level, fuse_msg=fuse_msg,
             rsi=rsi, macd_trend=f"{tech.get('macd', {}).get('trend', '-')} (背离:{tech.get('macd', {}).get('divergence', 'NONE')})", 
@@ -148,21 +204,29 @@ class NewsAnalyst:
             ma5_status=f"{ma_align} (ADX:{adx})",                
             ma20_status="N/A",
             ma60_status="N/A",
-            # [关键点] 这里限制 15000 字符。
-            # 由于 news 已经是倒序（最新在前），所以这里 [:15000] 会保留最新的约 50-80 条新闻，截断旧的。
-            news_content=f"{extended_tech_context}\n\n【本地新闻摘要】\n{str(safe_news)[:15000]}"
+            tech_context=extended_tech_context
         )
         
         payload = {
-            "model": self.model_tactical, "messages": [{"role": "user", "content": prompt}],
+            "model": self.model_tactical,
+            "messages": [
+                {"role": "system", "content": TACTICAL_IC_SYSTEM_PROMPT},
+                {"role": "user", "content": context_prompt},
+                {"role": "user", "content": fund_prompt}
+            ],
             "temperature": 0.1, "max_tokens": 1200, "response_format": {"type": "json_object"}
         }
         
+        import requests   # 延迟加载：闸门全部跳过时本次运行无需 requests
         try:
             resp = requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload, timeout=90)
+            metrics.incr("llm_calls")
+            metrics.incr("llm_bytes_in", len(resp.content))
             if resp.status_code != 200: return self._get_fallback_result()
             
-            result = json.loads(self._clean_json(resp.json()['choices'][0]['message']['content']))
+            data = resp.json()
+            self._record_cache_usage(fund_name, data.get('usage'))
+            result = json.loads(self._clean_json(data['choices'][0]['message']['content']))
             result = self._apply_logic_guardian(result, tech)
             if fuse_level >= 2:
                 result['decision'], result['adjustment'] = 'REJECT', -100
@@ -172,25 +236,97 @@ class NewsAnalyst:
             logger.error(f"AI Analysis Failed {fund_name}: {e}")
             return self._get_fallback_result()
 
+    def _record_cache_usage(self, fund_name, usage):
+        """记录 Prompt Cache 命中率 (兼容 OpenAI / DeepSeek 两种 usage 字段)"""
+        if not usage: return
+        prompt_tokens = usage.get('prompt_tokens', 0) or 0
+        metrics.incr("llm_prompt_tokens", prompt_tokens)
+        metrics.incr("llm_completion_tokens", usage.get('completion_tokens', 0) or 0)
+        details = usage.get('prompt_tokens_details') or {}
+        cached = details.get('cached_tokens') or usage.get('prompt_cache_hit_tokens') or 0
+        with self._stats_lock:
+            self.cache_stats['calls'] += 1
+            self.cache_stats['prompt_tokens'] += prompt_tokens
+            self.cache_stats['cached_tokens'] += cached
+        ratio = cached / prompt_tokens if prompt_tokens else 0
+        logger.info(f"🧊 [Cache] {fund_name} 命中 {cached}/{prompt_tokens} tokens ({ratio:.0%})")
+
+    def get_cache_summary(self):
+        """本次运行的 Prompt Cache 汇总"""
+        with self._stats_lock:
+            stats = dict(self.cache_stats)
+        total = stats['prompt_tokens']
+        stats['hit_ratio'] = round(stats['cached_tokens'] / total, 4) if total else 0.0
+        return stats
+
     def _get_fallback_result(self):
         return {"decision": "HOLD", "adjustment": 0, "trend_analysis": {"stage": "UNCLEAR"}}
 
-    @retry(retries=2, delay=5)
-    def review_report(self, report_text, macro_str):
+    def _strategic_messages(self, system_prompt, report_text, macro_str):
+        """[V19.2] 战略层三段式消息：静态系统前缀 -> 当日宏观环境 (CIO/Red Team 共享) -> 交易决策"""
         # 确保 macro_str 不为空
         safe_macro = macro_str if macro_str and len(macro_str) > 10 else "暂无新闻数据。"
-        prompt = STRATEGIC_CIO_REPORT_PROMPT.format(current_date=datetime.now().strftime("%Y年%m月%d日"), macro_str=safe_macro[:2500], report_text=report_text[:3000])
-        return self._call_r1(prompt)
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": STRATEGIC_CONTEXT_PROMPT.format(current_date=datetime.now().strftime("%Y年%m月%d日"), macro_str=safe_macro[:2500])},
+            {"role": "user", "content": STRATEGIC_REPORT_PROMPT.format(report_text=report_text[:3000])},
+        ]
+
+    @retry(retries=2, delay=5)
+    def review_report(self, report_text, macro_str):
+        return self._call_r1(self._strategic_messages(STRATEGIC_CIO_SYSTEM_PROMPT, report_text, macro_str))
 
     @retry(retries=2, delay=5)
     def advisor_review(self, report_text, macro_str):
-        safe_macro = macro_str if macro_str and len(macro_str) > 10 else "暂无新闻数据。"
-        prompt = RED_TEAM_AUDIT_PROMPT.format(current_date=datetime.now().strftime("%Y年%m月%d日"), macro_str=safe_macro[:2500], report_text=report_text[:3000])
-        return self._call_r1(prompt)
+        return self._call_r1(self._strategic_messages(RED_TEAM_SYSTEM_PROMPT, report_text, macro_str))
 
-    def _call_r1(self, prompt):
-        payload = {"model": self.model_strategic, "messages": [{"role": "user", "content": prompt}], "max_tokens": 4000, "temperature": 0.3}
+    def _call_r1(self, messages, total_timeout=180, idle_timeout=45):
+        """
+        [V19.4] 流式调用 R1 (SSE)
+        - 逐块累积正文，推理过程 (reasoning_content) 不计入输出
+        - idle_timeout: 两个数据块之间的最长静默，超时即判定流已卡死
+        - total_timeout: 整体截止时间
+        - 中途断流时保留已收到的部分并标注截断，而不是整段丢弃
+        """
+        payload = {"model": self.model_strategic, "messages": messages, "max_tokens": 4000, "temperature": 0.3, "stream": True}
+        chunks = []
+        finish_reason = None
+        deadline = time.time() + total_timeout
+        import requests
         try:
-            resp = requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload, timeout=180)
-            return resp.json()['choices'][0]['message']['content'].replace("```html", "").replace("```", "").strip()
-        except: return "<p>分析生成中...</p>"
+            with requests.post(f"{self.base_url}/chat/completions", headers=self.headers, json=payload, timeout=(10, idle_timeout), stream=True) as resp:
+                resp.encoding = "utf-8"
+                metrics.incr("llm_calls")
+                if resp.status_code != 200:
+                    logger.warning(f"R1 请求失败: HTTP {resp.status_code}")
+                    return "<p>分析生成中...</p>"
+                for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                    if time.time() > deadline:
+                        raise TimeoutError(f"超过总时限 {total_timeout}s")
+                    if not line or not line.startswith("data:"): continue
+                    metrics.incr("llm_bytes_in", len(line.encode("utf-8")))   # 与战术层 len(resp.content) 同为字节
+                    data = line[5:].strip()
+                    if data == "[DONE]": break
+                    try:
+                        event = json.loads(data)
+                        choice = event['choices'][0]
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    if event.get('usage'):
+                        metrics.incr("llm_prompt_tokens", event['usage'].get('prompt_tokens', 0) or 0)
+                        metrics.incr("llm_completion_tokens", event['usage'].get('completion_tokens', 0) or 0)
+                    piece = (choice.get('delta') or {}).get('content')
+                    if piece: chunks.append(piece)
+                    finish_reason = choice.get('finish_reason') or finish_reason
+        except Exception as e:
+            if not chunks:
+                logger.error(f"R1 调用失败: {e}")
+                return "<p>分析生成中...</p>"
+            logger.warning(f"R1 流中断 ({e})，保留已生成的 {sum(len(c) for c in chunks)} 字符")
+            finish_reason = 'interrupted'
+
+        text = "".join(chunks).replace("```html", "").replace("```", "").strip()
+        if not text: return "<p>分析生成中...</p>"
+        if finish_reason in ('length', 'interrupted'):
+            text += "<p style='color:#888'>[输出被截断]</p>"
+        return text
@@ -0,0 +1,277 @@
+"""
+news_daemon.py | 常驻新闻采集服务 (增量轮询 + 本地查询接口)
+
+news_loader.fetch_and_save_news 是一次性批量抓取：AI 只能看到抓取那一刻的新闻，且每次都重新下载整页 50 条。
+本服务常驻运行，每个源按各自间隔轮询:
+    - 条件请求: 记住每个 URL 的 ETag / Last-Modified，带 If-None-Match / If-Modified-Since，304 即零解析
+    - 游标: 记住已见最新一条 (东财 showtime / 财联社 ctime)，有游标时只取小页，早于游标的条目不解析、不入库；
+      小页全部不早于游标 (间隔内更新超过小页，可能有遗漏) 时再补取一次整页
+    - 新条目经 news_loader.save_items 写入 NewsStore 并追加当日归档，与一次性抓取口径一致
+    - 失败指数退避 (最多 8 倍间隔)，游标与校验头持久化到 data_news/daemon_state.json，重启后继续增量
+带宽与解析量随新条目数增长，而不是随轮询次数。
+
+HTTP 接口 (只读，供 get_market_context 等直接查询，不读文件):
+    GET /items?since=<seq>&limit=500    入库序号大于 since 的新条目 (增量消费，返回新游标)
+    GET /latest?hours=24&limit=160      最近 hours 小时内最新 limit 条 (按新闻时间倒序)
+    GET /healthz                        各源轮询统计
+
+用法:
+    python news_daemon.py --port 8766                    # 常驻
+    python news_daemon.py --once                         # 每个源轮询一次后退出 (cron / 调试)
+    config.yaml global.news_daemon_url: "http://127.0.0.1:8766"   # main 改为从服务读取舆情
+"""
+import abc
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from utils import logger, atomic_write_json
+from news_store import NewsStore, since_hours
+from news_loader import (
+    DATA_DIR, rate_limiter, save_items,
+    EM_LIST_URL, EM_HEADERS, parse_eastmoney_text,
+    CLS_API_URL, CLS_HEADERS, cls_query, parse_cls_json,
+)
+
+STATE_PATH = os.path.join(DATA_DIR, "daemon_state.json")
+MAX_BACKOFF = 8
+
+class SourcePoller(abc.ABC):
+    """单个新闻源的增量轮询：条件请求校验头按 URL 保存，游标由子类维护"""
+    name = ""
+    host = ""
+    page_size = (20, 50)     # (有游标时的小页, 首次/补取的整页)
+
+    def __init__(self, interval, timeout=15, state=None):
+        self.interval = interval
+        self.timeout = timeout
+        self.state = state or {}        # {"cursor": ..., "validators": {url: {"etag", "last_modified"}}}
+        self.failures = 0
+        self.stats = {"polls": 0, "not_modified": 0, "errors": 0, "bytes": 0, "parsed": 0, "new": 0,
+                      "last_poll": None, "last_error": None}
+
+    def _get(self, url, params=None, headers=None, conditional=True):
+        """GET；304 返回 None。响应体字节数计入 stats"""
+        import requests
+        validators = self.state.setdefault("validators", {})
+        key = url if not params else f"{url}?rn={params.get('rn')}"
+        cached = validators.get(key, {}) if conditional else {}
+        headers = dict(headers or {})
+        if cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+
+        rate_limiter.wait(self.host)
+        resp = requests.get(url, params=params, headers=headers, timeout=self.timeout)
+        self.stats["bytes"] += len(resp.content or b"")
+        if resp.status_code == 304:
+            self.stats["not_modified"] += 1
+            return None
+        resp.raise_for_status()
+        etag, modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if etag or modified:
+            validators[key] = {"etag": etag, "last_modified": modified}
+        return resp
+
+    @abc.abstractmethod
+    def fetch(self):
+        """-> 游标之后的新条目"""
+
+class EastMoneyPoller(SourcePoller):
+    name = "EastMoney"
+    host = "eastmoney.com"
+
+    def _page(self, size, cursor, conditional=True):
+        resp = self._get(EM_LIST_URL.format(size=size), headers=EM_HEADERS, conditional=conditional)
+        return None if resp is None else parse_eastmoney_text(resp.text, since=cursor)
+
+    def fetch(self):
+        cursor = self.state.get("cursor")
+        small, full = self.page_size
+        size = small if cursor else full
+        items = self._page(size, cursor)
+        if items is None:
+            return []
+        if cursor and len(items) >= size:
+            # 小页全部不早于游标：间隔内更新量超过小页，补取整页避免漏读
+            items = self._page(full, cursor, conditional=False) or items
+        self.stats["parsed"] += len(items)
+        if items:
+            self.state["cursor"] = max(i["time"] for i in items)
+        return items
+
+class ClsPoller(SourcePoller):
+    name = "CLS"
+    host = "cls.cn"
+
+    def _page(self, rn, cursor, conditional=True):
+        resp = self._get(CLS_API_URL, params=cls_query(rn), headers=CLS_HEADERS, conditional=conditional)
+        if resp is None:
+            return None
+        payload = resp.json()
+        if payload.get("error", 0) not in (0, None):
+            raise RuntimeError(f"接口返回错误: {payload.get('error')}")
+        roll = (payload.get("data") or {}).get("roll_data") or []
+        return [r for r in roll if int(r.get("ctime") or 0) >= cursor]
+
+    def fetch(self):
+        cursor = int(self.state.get("cursor") or 0)
+        small, full = self.page_size
+        rn = small if cursor else full
+        raw = self._page(rn, cursor)
+        if raw is None:
+            return []
+        if cursor and len(raw) >= rn:
+            raw = self._page(full, cursor, conditional=False) or raw
+        self.stats["parsed"] += len(raw)
+        if raw:
+            self.state["cursor"] = max(int(r["ctime"]) for r in raw)
+        return parse_cls_json({"data": {"roll_data": raw}})
+
+class NewsDaemon:
+    def __init__(self, pollers, store=None, state_path=STATE_PATH):
+        self.store = store or NewsStore(os.path.join(DATA_DIR, "news.db"))
+        self.state_path = state_path
+        self.pollers = pollers
+        self._state_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        saved = self._load_state()
+        for p in pollers:
+            p.state = saved.get(p.name, p.state)
+        # 已落盘状态的副本：每个源的 state 只由自己的轮询线程修改，线程只把自己的 state 复制进来，
+        # 写盘时序列化的是这份副本，不会遍历其他线程正在修改的字典
+        self._saved = {p.name: copy.deepcopy(p.state) for p in pollers}
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"采集状态读取失败 ({e})，游标从头开始")
+            return {}
+
+    def _save_state(self, poller):
+        """由 poller 自己的轮询线程调用：只复制它自己的 state，再整体写盘"""
+        with self._state_lock:
+            self._saved[poller.name] = copy.deepcopy(poller.state)
+            try:
+                atomic_write_json(self.state_path, self._saved, indent=2)
+            except Exception as e:
+                logger.error(f"采集状态写入失败: {e}")
+
+    def poll(self, poller):
+        """轮询一次。Returns: 新入库条数"""
+        poller.stats["polls"] += 1
+        poller.stats["last_poll"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            items = poller.fetch()
+            new_items = save_items(items, store=self.store) if items else []
+            poller.stats["new"] += len(new_items)
+            poller.failures = 0
+            if new_items:
+                logger.info(f"📰 [NewsDaemon] {poller.name}: 新增 {len(new_items)} 条")
+            return len(new_items)
+        except Exception as e:
+            poller.failures += 1
+            poller.stats["errors"] += 1
+            poller.stats["last_error"] = str(e)[:200]
+            logger.warning(f"⚠️ [NewsDaemon] {poller.name} 轮询失败 (连续 {poller.failures} 次): {e}")
+            return 0
+        finally:
+            self._save_state(poller)
+
+    def _loop(self, poller):
+        while not self._stop.is_set():
+            self.poll(poller)
+            self._stop.wait(poller.interval * min(2 ** poller.failures, MAX_BACKOFF))
+
+    def start(self):
+        for p in self.pollers:
+            t = threading.Thread(target=self._loop, args=(p,), name=f"poll-{p.name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info("🛰️ [NewsDaemon] 已启动: " + ", ".join(f"{p.name}/{p.interval}s" for p in self.pollers))
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=30)
+        self.store.close()
+
+    def health(self):
+        return {"sources": {p.name: dict(p.stats, interval=p.interval, failures=p.failures,
+                                         cursor=p.state.get("cursor")) for p in self.pollers},
+                "last_seq": self.store.last_seq(), "count": self.store.count()}
+
+class _Handler(BaseHTTPRequestHandler):
+    daemon = None   # NewsDaemon，由 serve() 注入
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        store = self.daemon.store
+        try:
+            if url.path == "/items":
+                items, cursor = store.items_since(int(q.get("since", 0)), int(q.get("limit", 500)))
+                return self._send_json(200, {"items": items, "cursor": cursor})
+            if url.path == "/latest":
+                since = since_hours(float(q.get("hours", 24)))
+                return self._send_json(200, {"items": store.latest(int(q.get("limit", 160)), since=since)})
+            if url.path == "/healthz":
+                return self._send_json(200, self.daemon.health())
+            return self._send_json(404, {"error": "not found"})
+        except ValueError as e:
+            return self._send_json(400, {"error": str(e)})
+
+def serve(daemon, host="127.0.0.1", port=8766):
+    handler = type("NewsDaemonHandler", (_Handler,), {"daemon": daemon})
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"🌐 [NewsDaemon] 查询接口: http://{host}:{port} (/items /latest /healthz)")
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻新闻采集服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--em-interval", type=float, default=60, help="东财轮询间隔 (秒)")
+    parser.add_argument("--cls-interval", type=float, default=30, help="财联社轮询间隔 (秒)")
+    parser.add_argument("--once", action="store_true", help="每个源轮询一次后退出")
+    args = parser.parse_args()
+
+    daemon = NewsDaemon([EastMoneyPoller(args.em_interval), ClsPoller(args.cls_interval)])
+    if args.once:
+        for p in daemon.pollers:
+            daemon.poll(p)
+        print(json.dumps(daemon.health(), ensure_ascii=False, indent=2))
+        daemon.store.close()
+        return
+
+    server = serve(daemon, args.host, args.port)
+    daemon.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("🛑 [NewsDaemon] 收到中断，正在退出...")
+    finally:
+        server.server_close()
+        daemon.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+news_dedup.py | 近似重复新闻折叠 (SimHash + LSH 分桶)
+
+东财与财联社常以略有差异的标题报道同一事件，generate_news_id 只对 time+title 精确去重，
+这类近似重复会挤占 prompt 的字符预算。本模块在组装 prompt 前做一次聚类:
+    1. 归一化 标题+正文 (NFKC、去空白/标点、去时间戳与 "财联社X月X日电" 等电头)；
+       正文已包含标题时只取正文 (财联社标题即正文前 40 字)，取导语前 100 字的字符 3-gram
+       (两家正文长度差异很大，只比导语才稳定；再长反而被各自的后文拉开距离)
+    2. 64 位 SimHash (numpy 按位投票)；归一化后为空的条目不参与去重 (签名全为 0，会被误并成一簇)
+    3. 多索引分桶 (multi-index hashing): 64 位切成 bands 段 (4 x 16 位)，每段按值建桶，查询时探测
+       与本段海明距离 <= max_distance // bands 的全部桶值 (1 位翻转，每段 17 个)。
+       按抽屉原理，海明距离 <= max_distance 的对至少有一段差异不超过该半径，必然成为候选；
+       16 位宽段下随机签名误入同桶的概率约 4 x 17 / 65536，候选数随条数近似线性增长
+    4. 候选对复核海明距离 <= max_distance，且合并后簇内最早与最晚发布时间相差不超过 max_gap_hours
+       才并查集合并 (按整簇时间跨度判断，链式合并也不会越出窗口；
+       跨日的例行播报如 "两市成交额突破1万亿" 文字几乎相同但不是同一事件)；
+       每簇保留正文最完整的一条，附带来源与条数
+
+    clusters = cluster_news(rows)            # rows: NewsStore.latest() 的结果 (时间倒序)
+    for c in clusters: c["item"], c["count"], c["sources"]
+"""
+import hashlib
+import re
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+from datetime import datetime
+import numpy as np
+
+SHINGLE = 3
+CONTENT_CHARS = 100          # 只取前 N 字参与签名 (电讯稿核心信息在开头)
+BANDS = 4                    # 4 x 16 位，每段探测 1 位翻转：海明距离 <= 7 必然成为候选
+MAX_DISTANCE = 7             # 存档实测 (778 条)：跨源同一事件 0~9，不同事件 >= 11
+MAX_GAP_HOURS = 12
+
+_PUNCT_RE = re.compile(r"[\W_]+", re.UNICODE)
+_CLOCK_RE = re.compile(r"^\d{1,2}:\d{2}(:\d{2})?")
+_DATELINE_RE = re.compile(r"(财联社|新华社|央视新闻|证券时报|上证报|中证报|南方财经)?\d{1,2}月\d{1,2}日(电|讯)")
+
+def normalize(text):
+    """NFKC + 小写 + 去时间戳/电头 + 去空白/标点"""
+    text = unicodedata.normalize("NFKC", str(text or "")).lower().strip()
+    text = _CLOCK_RE.sub("", text).strip()
+    text = _DATELINE_RE.sub("", text)   # 电头常跟在【标题】之后，不限于开头
+    return _PUNCT_RE.sub("", text)
+
+def _shingle_hashes(text, n=SHINGLE):
+    grams = {text[i:i + n] for i in range(max(1, len(text) - n + 1))} if text else set()
+    return [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams]
+
+def signature_text(title, content=""):
+    """参与签名的文本：正文已包含标题 (截断标题去掉 "...") 时只用正文，否则 标题 + 正文"""
+    title = str(title or "")
+    t = normalize(title[:-3] if title.endswith("...") else title)
+    c = normalize(content)
+    return (c if t and t in c else t + c)[:CONTENT_CHARS]
+
+def simhash(title, content=""):
+    """标题 + 正文 -> 64 位 SimHash (python int)"""
+    return _simhash_text(signature_text(title, content))
+
+def _simhash_text(text):
+    hashes = _shingle_hashes(text)
+    if not hashes:
+        return 0
+    hashes = np.array(hashes, dtype=np.uint64)
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")   # (k, 64)
+    votes = (2 * bits.astype(np.int64) - 1).sum(axis=0)
+    return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+def _bands(sig, bands=BANDS):
+    width = 64 // bands
+    mask = (1 << width) - 1
+    return [(i, (sig >> (i * width)) & mask) for i in range(bands)]
+
+def _probes(value, width, radius):
+    """段值本身及与其海明距离 <= radius 的全部段值"""
+    out = [value]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(width), r):
+            flipped = value
+            for b in bits: flipped ^= 1 << b
+            out.append(flipped)
+    return out
+
+def _timestamp(t):
+    try:
+        return datetime.strptime(str(t)[:19], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+
+def cluster_news(items, max_distance=MAX_DISTANCE, bands=BANDS, max_gap_hours=MAX_GAP_HOURS):
+    """
+    items: [{"time", "source", "title", "content"}, ...] (按重要性/时间排好序)
+    Returns: 簇列表 (保持首条出现的顺序) [{"item", "count", "sources", "members"}]
+        item: 簇代表 (正文最长的一条，时间取簇内最新)
+    """
+    n = len(items)
+    texts = [signature_text(it.get("title", ""), it.get("content", "")) for it in items]
+    sigs = [_simhash_text(t) if t else None for t in texts]
+    stamps = [_timestamp(it.get("time")) for it in items]
+    max_gap = max_gap_hours * 3600
+
+    parent = list(range(n))
+    # 每簇的 (最早, 最晚) 发布时间；缺时间 (网页抓取失败等) 的条目不约束跨度，只按文本判断
+    span = [(t, t) if t is not None else None for t in stamps]
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(ra, rb):
+        sa, sb = span[ra], span[rb]
+        merged = sa or sb
+        if sa and sb:
+            merged = (min(sa[0], sb[0]), max(sa[1], sb[1]))
+            if merged[1] - merged[0] > max_gap: return
+        root, child = min(ra, rb), max(ra, rb)   # 根取较早出现者，簇顺序稳定
+        parent[child] = root
+        span[root] = merged
+
+    width = 64 // bands
+    radius = max_distance // bands
+    buckets = defaultdict(list)
+    for i, sig in enumerate(sigs):
+        if sig is None: continue
+        keys = _bands(sig, bands)
+        candidates = set()
+        for band, value in keys:
+            for probe in _probes(value, width, radius):
+                candidates.update(buckets.get((band, probe), ()))
+        for j in sorted(candidates):
+            ri, rj = find(i), find(j)
+            if ri != rj and hamming(sig, sigs[j]) <= max_distance:
+                union(ri, rj)
+        for key in keys:
+            buckets[key].append(i)
+
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[find(i)].append(i)
+
+    clusters = []
+    for root in sorted(groups):
+        members = [items[i] for i in groups[root]]
+        # 正文最长者为代表，同长取先出现的
+        rep = dict(max(members, key=lambda it: len(str(it.get("content") or ""))))
+        rep["time"] = max(str(m.get("time") or "") for m in members)
+        sources = []
+        for m in members:
+            if m.get("source") not in sources: sources.append(m.get("source"))
+        clusters.append({"item": rep, "count": len(members), "sources": sources, "members": members})
+    return clusters
+
+def cluster_stats(clusters):
+    """-> {"items", "clusters", "merged", "largest"}"""
+    sizes = [c["count"] for c in clusters]
+    return {"items": sum(sizes), "clusters": len(sizes), "merged": sum(sizes) - len(sizes), "largest": max(sizes, default=0)}
@@ -1,39 +1,54 @@
-import akshare as ak
+import atexit
 import json
 import os
 import time
-import requests
+import threading
 import pandas as pd
 from datetime import datetime
 import hashlib
 import pytz
 import re
-from bs4 import BeautifulSoup
+from news_store import NewsStore, generate_news_id
 
-# --- Selenium 模块 (模拟浏览器专用) ---
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+# 网络依赖 (akshare / requests / bs4 / selenium / webdriver_manager) 均在各抓取函数内按需导入，
+# 导入本模块 (如只用 generate_news_id) 不触发浏览器栈加载
 
 # --- 配置 ---
 DATA_DIR = "data_news"
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# [V19.16] 各新闻源并发抓取：不同主机互不影响，按主机限速 (同一主机两次请求的最小间隔，秒)，
+# 替代原先两个源之间固定 sleep 50 秒；单源超时后放弃该源结果，不拖住整体
+HOST_MIN_INTERVAL = {
+    "eastmoney.com": 2.0,
+    "cls.cn": 5.0,
+}
+
+class HostRateLimiter:
+    """按主机限速：同一主机的请求之间至少间隔 min_interval 秒，不同主机互不阻塞 (线程安全)"""
+    def __init__(self, intervals=None, default=1.0):
+        self.intervals = dict(intervals or {})
+        self.default = default
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.intervals.get(host, self.default)
+        if slot > now:
+            time.sleep(slot - now)
+
+rate_limiter = HostRateLimiter(HOST_MIN_INTERVAL)
+
 def get_beijing_time():
     return datetime.now(pytz.timezone('Asia/Shanghai'))
 
 def get_today_str():
     return get_beijing_time().strftime("%Y-%m-%d")
 
-def generate_news_id(item):
-    raw = f"{item.get('time','')}{item.get('title','')}"
-    return hashlib.md5(raw.encode('utf-8')).hexdigest()
-
 def clean_time_str(t_str):
     if not t_str: return ""
     try:
@@ -48,54 +63,60 @@ def clean_time_str(t_str):
 # ==========================================
 # 1. 东财抓取 (双保险模式 - 修复解析)
 # ==========================================
-def fetch_eastmoney_direct():
+# 东财 7x24 快讯接口 (每页条数可调：_<page_size>_<page>_)
+EM_LIST_URL = "https://newsapi.eastmoney.com/kuaixun/v1/getlist_102_ajaxResult_{size}_1_.html"
+EM_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Referer": "https://kuaixun.eastmoney.com/"
+}
+
+def parse_eastmoney_text(text, since=None):
+    """
+    东财快讯接口响应 (JSONP 包裹) -> 条目列表；找不到 JSON 结构时抛 ValueError
+    since: 游标 (已见最新的 showtime)，早于游标的条目直接跳过 (同一秒可能有多条，等于游标的保留交给 id 去重)
+    """
+    # [核心修复] 不用正则，直接暴力截取第一个 { 和最后一个 } 之间的内容
+    start_idx = text.find('{')
+    end_idx = text.rfind('}')
+    if start_idx == -1 or end_idx == -1:
+        raise ValueError("未找到 JSON 结构 ({} 不匹配)")
+
+    data = json.loads(text[start_idx : end_idx + 1])
+    items = []
+    for news in data.get('LivesList', []) or []:
+        title = news.get('title', '').strip()
+        digest = news.get('digest', '').strip()
+        show_time = news.get('showtime', '') 
+        if since and show_time < since: continue
+        
+        # 内容处理
+        content = digest if len(digest) > len(title) else title
+        
+        if not title: continue
+        
+        items.append({
+            "time": show_time,
+            "title": title,
+            "content": content,
+            "source": "EastMoney"
+        })
+    return items
+
+def fetch_eastmoney_direct(timeout=15):
     """
     [Plan B] 直连东财接口，使用字符串截取法解析
     """
     items = []
     try:
         print("   - [Plan B] 启动东财直连模式 (Direct API)...")
-        # 东财 7x24 快讯接口
-        url = "https://newsapi.eastmoney.com/kuaixun/v1/getlist_102_ajaxResult_50_1_.html"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            "Referer": "https://kuaixun.eastmoney.com/"
-        }
-        # 增加超时时间
-        resp = requests.get(url, headers=headers, timeout=15)
+        import requests
+        rate_limiter.wait("eastmoney.com")
+        resp = requests.get(EM_LIST_URL.format(size=50), headers=EM_HEADERS, timeout=timeout)
         
         if resp.status_code == 200:
-            text = resp.text
-            
-            # [核心修复] 不用正则，直接暴力截取第一个 { 和最后一个 } 之间的内容
             try:
-                start_idx = text.find('{')
-                end_idx = text.rfind('}')
-                
-                if start_idx != -1 and end_idx != -1:
-                    json_str = text[start_idx : end_idx + 1]
-                    data = json.loads(json_str)
-                    news_list = data.get('LivesList', [])
-                    
-                    for news in news_list:
-                        title = news.get('title', '').strip()
-                        digest = news.get('digest', '').strip()
-                        show_time = news.get('showtime', '') 
-                        
-                        # 内容处理
-                        content = digest if len(digest) > len(title) else title
-                        
-                        if not title: continue
-                        
-                        items.append({
-                            "time": show_time,
-                            "title": title,
-                            "content": content,
-                            "source": "EastMoney"
-                        })
-                    print(f"   - [Plan B] 成功解析并获取 {len(items)} 条数据")
-                else:
-                    print("   - [Plan B] 未找到 JSON 结构 ({} 不匹配)")
+                items = parse_eastmoney_text(resp.text)
+                print(f"   - [Plan B] 成功解析并获取 {len(items)} 条数据")
             except Exception as parse_e:
                 print(f"   - [Plan B] JSON 解析异常: {parse_e}")
         else:
@@ -105,11 +126,13 @@ def fetch_eastmoney_direct():
         print(f"   ❌ [Plan B] 东财直连失败: {e}")
     return items
 
-def fetch_eastmoney():
+def fetch_eastmoney(timeout=15):
     items = []
     # --- 尝试 Plan A: Akshare ---
     try:
         print("   - [Plan A] 正在抓取: 东方财富 (Akshare)...")
+        import akshare as ak
+        rate_limiter.wait("eastmoney.com")
         df_em = ak.stock_telegraph_em()
         if df_em is not None and not df_em.empty:
             for _, row in df_em.iterrows():
@@ -131,31 +154,191 @@ def fetch_eastmoney():
     except Exception as e:
         print(f"   ⚠️ Akshare 调用出错，切换至 Plan B...")
 
-    # --- 失败则执行 Plan B ---
-    return fetch_eastmoney_direct()
+    # --- 失败则执行 Plan B (同主机，受限速约束) ---
+    return fetch_eastmoney_direct(timeout)
 
 # ==========================================
-# 2. 财联社抓取 (浏览器模式)
+# 2. 财联社抓取 (JSON 接口优先，浏览器兜底)
 # ==========================================
-def fetch_cls_selenium():
+# [V19.17] 电报页本身由 nodeapi/telegraphList 接口渲染，直接请求 JSON 即可拿到同一批快讯：
+# 单次 HTTP 往返、无需启动 Chrome。Selenium 仅在接口失败/改版时兜底，且复用常驻浏览器会话
+CLS_API_URL = "https://www.cls.cn/nodeapi/telegraphList"
+CLS_APP_PARAMS = {"app": "CailianpressWeb", "os": "web", "sv": "7.7.5"}
+CLS_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Referer": "https://www.cls.cn/telegraph",
+}
+FIXTURE_DIR = "fixtures"
+
+def cls_sign(params):
+    """财联社接口签名：按键排序的 query string -> sha1 -> md5"""
+    from urllib.parse import urlencode
+    query = urlencode(sorted(params.items()))
+    return hashlib.md5(hashlib.sha1(query.encode('utf-8')).hexdigest().encode('utf-8')).hexdigest()
+
+def cls_query(rn=50, last_time=""):
+    """带签名的电报列表请求参数；last_time 为游标 (已见最新一条的 ctime)"""
+    params = dict(CLS_APP_PARAMS, category="", lastTime=last_time, last_time=last_time, refresh_type=1, rn=rn)
+    params["sign"] = cls_sign(params)
+    return params
+
+def _cls_item(full_time, content_text):
+    """JSON / 网页两条路径统一的条目构造 (标题同口径截取，保证 generate_news_id 跨路径一致)"""
+    title = content_text[:40] + "..." if len(content_text) > 40 else content_text
+    return {"time": full_time, "title": title, "content": content_text, "source": "CLS"}
+
+def parse_cls_json(payload):
+    """telegraphList 接口响应 -> 条目列表"""
+    tz = pytz.timezone('Asia/Shanghai')
+    items = []
+    for news in (payload.get('data') or {}).get('roll_data') or []:
+        try:
+            content_text = str(news.get('content') or news.get('brief') or news.get('title') or '').strip()
+            if not content_text: continue
+            full_time = datetime.fromtimestamp(int(news['ctime']), tz).strftime("%Y-%m-%d %H:%M:%S")
+            items.append(_cls_item(full_time, content_text))
+        except Exception: continue
+    return items
+
+def parse_cls_html(html, current_date_prefix=None):
+    """电报网页 (浏览器渲染后的 page_source) -> 条目列表"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    nodes = soup.find_all("div", class_="telegraph-list-item")
+    if not nodes:
+        nodes = soup.select("div.telegraph-content-box")
+
+    current_date_prefix = current_date_prefix or get_beijing_time().strftime("%Y-%m-%d")
+    items = []
+    for node in nodes:
+        try:
+            time_span = node.find("span", class_="telegraph-time")
+            time_str = time_span.get_text().strip() if time_span else ""
+            
+            # [核心修复] 增强日期补全逻辑
+            # 只要是类似 HH:MM (5位) 或 HH:MM:SS (8位) 的短时间，都补全日期
+            if len(time_str) < 10 and ":" in time_str:
+                # 如果只有 5 位 (13:16)，补秒
+                if len(time_str) <= 5:
+                    full_time = f"{current_date_prefix} {time_str}:00"
+                else:
+                    # 否则直接拼日期 (13:16:49)
+                    full_time = f"{current_date_prefix} {time_str}"
+            else:
+                # 已经是完整时间或其他格式
+                full_time = time_str
+
+            content_div = node.find("div", class_="telegraph-content")
+            if not content_div:
+                content_div = node.find("div", class_="telegraph-detail")
+            
+            content_text = content_div.get_text().strip() if content_div else ""
+            if content_text:
+                items.append(_cls_item(full_time, content_text))
+        except: continue
+    return items
+
+def fetch_cls_api(timeout=15, rn=50):
+    """[Plan A] 直连电报 JSON 接口"""
     items = []
-    driver = None
     try:
-        print("   - [Browser] 正在启动 Chrome 抓取: 财联社 (CLS)...")
-        
-        chrome_options = Options()
-        chrome_options.add_argument("--headless") 
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36")
-
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        driver.set_page_load_timeout(60)
-        
-        url = "https://www.cls.cn/telegraph"
-        driver.get(url)
+        print("   - [Plan A] 正在抓取: 财联社 (JSON API)...")
+        import requests
+        rate_limiter.wait("cls.cn")
+        resp = requests.get(CLS_API_URL, params=cls_query(rn), headers=CLS_HEADERS, timeout=timeout)
+        if resp.status_code == 200:
+            payload = resp.json()
+            if payload.get('error', 0) not in (0, None):
+                print(f"   - [Plan A] 接口返回错误: {payload.get('error')}")
+            else:
+                items = parse_cls_json(payload)
+                print(f"   - [Plan A] 成功获取 {len(items)} 条数据")
+        else:
+            print(f"   - [Plan A] HTTP请求失败: {resp.status_code}")
+    except Exception as e:
+        print(f"   ⚠️ [Plan A] 财联社接口失败: {e}")
+    return items
+
+# --- 常驻浏览器 (兜底路径) ---
+# 驱动路径缓存到本地，避免每次 ChromeDriverManager().install() 联网查版本；
+# 浏览器会话进程内复用 (守护进程多轮抓取只启动一次 Chrome)，退出时统一关闭
+_browser = None
+_browser_lock = threading.Lock()
+_atexit_registered = False
+DRIVER_PATH_CACHE = os.path.join(DATA_DIR, ".chromedriver_path")
+
+def _chromedriver_path():
+    if os.path.exists(DRIVER_PATH_CACHE):
+        with open(DRIVER_PATH_CACHE, 'r', encoding='utf-8') as f:
+            path = f.read().strip()
+        if path and os.path.exists(path):
+            return path
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    with open(DRIVER_PATH_CACHE, 'w', encoding='utf-8') as f:
+        f.write(path)
+    return path
+
+def _get_browser(timeout):
+    """返回可用的常驻 headless Chrome；会话失效时重建 (调用方须持有 _browser_lock)"""
+    global _browser, _atexit_registered
+    if _browser is not None:
+        try:
+            _browser.current_url  # 探活
+            _browser.set_page_load_timeout(timeout)
+            return _browser
+        except Exception:
+            close_browser(locked=True)
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless") 
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36")
+
+    print("   - [Browser] 启动常驻 Chrome 会话...")
+    _browser = webdriver.Chrome(service=Service(_chromedriver_path()), options=chrome_options)
+    _browser.set_page_load_timeout(timeout)
+    if not _atexit_registered:
+        atexit.register(close_browser)
+        _atexit_registered = True
+    return _browser
+
+def close_browser(locked=False):
+    """关闭常驻浏览器 (进程退出时自动调用)"""
+    global _browser
+    if not locked and not _browser_lock.acquire(timeout=5):
+        return
+    try:
+        if _browser is not None:
+            try: _browser.quit()
+            except Exception: pass
+            _browser = None
+    finally:
+        if not locked:
+            _browser_lock.release()
+
+def fetch_cls_selenium(timeout=60):
+    """[Plan B] 浏览器渲染电报页后解析 (复用常驻会话)"""
+    items = []
+    if not _browser_lock.acquire(timeout=timeout):
+        print("   ⚠️ 浏览器会话被占用，跳过本轮 Selenium 抓取")
+        return items
+    try:
+        print("   - [Plan B] 正在用浏览器抓取: 财联社 (CLS)...")
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        driver = _get_browser(timeout)
+        driver.get("https://www.cls.cn/telegraph")
         
         # 等待加载
         try:
@@ -165,116 +348,168 @@ def fetch_cls_selenium():
         except:
             print("   ⚠️ 等待网页加载超时，尝试直接解析...")
 
-        # 模拟滚动
+        # 模拟滚动：等到新节点出现即返回，而不是固定休眠
+        loaded = len(driver.find_elements(By.CLASS_NAME, "telegraph-list-item"))
         driver.execute_script("window.scrollTo(0, 1000);")
-        time.sleep(3) 
-
-        html = driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        nodes = soup.find_all("div", class_="telegraph-list-item")
-        if not nodes:
-            nodes = soup.select("div.telegraph-content-box")
-
-        print(f"   - 捕获到 {len(nodes)} 个网页节点")
-
-        current_date_prefix = get_beijing_time().strftime("%Y-%m-%d")
-
-        for node in nodes:
-            try:
-                time_span = node.find("span", class_="telegraph-time")
-                time_str = time_span.get_text().strip() if time_span else ""
-                
-                # [核心修复] 增强日期补全逻辑
-                # 只要是类似 HH:MM (5位) 或 HH:MM:SS (8位) 的短时间，都补全日期
-                if len(time_str) < 10 and ":" in time_str:
-                    # 如果只有 5 位 (13:16)，补秒
-                    if len(time_str) <= 5:
-                        full_time = f"{current_date_prefix} {time_str}:00"
-                    else:
-                        # 否则直接拼日期 (13:16:49)
-                        full_time = f"{current_date_prefix} {time_str}"
-                else:
-                    # 已经是完整时间或其他格式
-                    full_time = time_str
+        try:
+            WebDriverWait(driver, 3, poll_frequency=0.2).until(
+                lambda d: len(d.find_elements(By.CLASS_NAME, "telegraph-list-item")) > loaded
+            )
+        except: pass
 
-                content_div = node.find("div", class_="telegraph-content")
-                if not content_div:
-                    content_div = node.find("div", class_="telegraph-detail")
-                
-                content_text = content_div.get_text().strip() if content_div else ""
-                
-                if content_text:
-                    title = content_text[:40] + "..." if len(content_text) > 40 else content_text
-                    
-                    items.append({
-                        "time": full_time,
-                        "title": title,
-                        "content": content_text,
-                        "source": "CLS"
-                    })
-            except: continue
+        items = parse_cls_html(driver.page_source)
+        print(f"   - [Plan B] 捕获到 {len(items)} 条数据")
 
     except Exception as e:
         print(f"   ❌ 财联社(Selenium)抓取失败: {e}")
+        close_browser(locked=True)  # 会话可能已损坏，下次重建
     finally:
-        if driver:
-            driver.quit()
+        _browser_lock.release()
     
     return items
 
+def fetch_cls(timeout=60):
+    items = fetch_cls_api(timeout=min(timeout, 15))
+    if items:
+        return items
+    # --- 接口失败则执行 Plan B ---
+    return fetch_cls_selenium(timeout)
+
+def check_fixture(fixture_dir=FIXTURE_DIR):
+    """
+    离线校验解析逻辑：fixtures/ 下录制的接口响应 (cls_telegraph.json) 与渲染后网页 (cls_telegraph.html)
+    为同一批快讯，两条路径解析结果须字段完整、时间格式一致，且新闻 ID 相同 (跨路径去重有效)
+    Returns: 问题列表 (空列表表示通过)
+    """
+    with open(os.path.join(fixture_dir, "cls_telegraph.json"), 'r', encoding='utf-8') as f:
+        api_items = parse_cls_json(json.load(f))
+    with open(os.path.join(fixture_dir, "cls_telegraph.html"), 'r', encoding='utf-8') as f:
+        html = f.read()
+    problems = []
+    if not api_items:
+        return ["JSON fixture 未解析出任何条目"]
+    html_items = parse_cls_html(html, api_items[0]['time'][:10])
+
+    for label, items in (("json", api_items), ("html", html_items)):
+        for item in items:
+            try:
+                datetime.strptime(item['time'], "%Y-%m-%d %H:%M:%S")
+            except (ValueError, KeyError):
+                problems.append(f"{label}: 时间格式错误 {item.get('time')!r}")
+            if not item.get('title') or not item.get('content') or item.get('source') != "CLS":
+                problems.append(f"{label}: 字段缺失 {item}")
+    api_ids = [generate_news_id(i) for i in api_items]
+    html_ids = [generate_news_id(i) for i in html_items]
+    if api_ids != html_ids:
+        problems.append(f"json/html 解析结果不一致: {len(api_ids)} vs {len(html_ids)} 条，ID 不同")
+    print(f"🧪 [Fixture] json {len(api_items)} 条 / html {len(html_items)} 条，问题 {len(problems)} 个")
+    return problems
+
+# ==========================================
+# 3. 并发调度
+# ==========================================
+# (名称, 抓取函数, 单源超时秒数)；抓取函数接受 timeout 参数，返回条目列表
+NEWS_SOURCES = [
+    ("EastMoney", fetch_eastmoney, 45),
+    ("CLS", fetch_cls, 120),
+]
+
+def fetch_all_sources(sources=None):
+    """
+    并发抓取全部新闻源，总耗时约为 max(单源耗时) 而非各源之和
+    每个源在独立的守护线程中运行：超时的源记为空结果并继续入库其它源，
+    不会因 Selenium 卡死而阻塞主流程或进程退出
+    Returns: {源名称: 条目列表}
+    """
+    sources = NEWS_SOURCES if sources is None else sources
+    results = {name: [] for name, _, _ in sources}
+    threads = []
+
+    def _run(name, func, timeout):
+        t0 = time.monotonic()
+        try:
+            results[name] = func(timeout=timeout) or []
+            print(f"   ⏱️ {name} 完成: {len(results[name])} 条, 耗时 {time.monotonic() - t0:.1f}s")
+        except Exception as e:
+            print(f"   ❌ {name} 抓取异常: {e}")
+
+    start = time.monotonic()
+    for name, func, timeout in sources:
+        t = threading.Thread(target=_run, args=(name, func, timeout), name=f"news-{name}", daemon=True)
+        t.start()
+        threads.append((name, t, start + timeout))
+
+    collected = {}
+    for name, t, deadline in threads:
+        t.join(max(0.0, deadline - time.monotonic()))
+        if t.is_alive():
+            # 超时线程之后即便返回也只写入 results，不影响本轮已收集的结果
+            print(f"   ⚠️ {name} 超时 (>{deadline - start:.0f}s)，放弃该源本轮结果")
+            collected[name] = []
+        else:
+            collected[name] = results[name]
+
+    print(f"   ⏱️ 全部新闻源抓取耗时 {time.monotonic() - start:.1f}s")
+    return collected
+
 # ==========================================
 # 主程序
 # ==========================================
-def fetch_and_save_news():
-    today_date = get_today_str()
-    print(f"📡 [NewsLoader] 启动混合抓取 (Smart Mode) - {today_date}...")
-    
-    all_news_items = []
+def save_items(items, store=None, today_date=None):
+    """
+    条目入库并追加到当日归档 data_news/news_<date>.jsonl (一次性抓取与常驻服务共用)
+    store: 复用已打开的 NewsStore (常驻服务)；None 时临时打开
+    Returns: 本次新增的条目 (已补 id)
+    """
+    today_date = today_date or get_today_str()
+    today_file = os.path.join(DATA_DIR, f"news_{today_date}.jsonl")
+    own_store = store is None
+    store = store or NewsStore(os.path.join(DATA_DIR, "news.db"))
+    try:
+        # [V19.18] 去重交给新闻库 id 主键 (单条 O(1))，不再整份重读当日文件；
+        # 先补齐归档中尚未入库的部分 (首次建库/手工改动)，再入库本轮条目
+        store.sync_file(today_file)
 
-    # 1. 东财 (API + 直连备份)
-    em_items = fetch_eastmoney()
-    all_news_items.extend(em_items)
+        # 重新排序：确保有时间的排前面
+        items = sorted(items, key=lambda x: x['time'], reverse=True)
+        new_items = store.add(items)
 
-    print(f"⏳ 东财抓取完毕，正在休眠 50 秒 (避免请求过快)...")
-    time.sleep(50)
+        if new_items:
+            with open(today_file, 'a', encoding='utf-8') as f:
+                for item in new_items:
+                    f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            store.sync_file(today_file)  # 推进归档读取偏移 (刚追加的行均已入库)
+        return new_items
+    finally:
+        if own_store: store.close()
 
-    # 2. 财联社 (Selenium)
-    cls_items = fetch_cls_selenium()
-    all_news_items.extend(cls_items)
+def fetch_and_save_news(sources=None):
+    today_date = get_today_str()
+    print(f"📡 [NewsLoader] 启动混合抓取 (Smart Mode) - {today_date}...")
+    
+    # 1. 东财 (Akshare + 直连备份) / 财联社 (JSON 接口 + 浏览器备份) 并发抓取
+    results = fetch_all_sources(sources)
+    all_news_items = [item for items in results.values() for item in items]
 
-    # 3. 入库
+    # 2. 入库 (generate_news_id 去重，跨源/跨轮次重复条目只写一次)
     if not all_news_items:
         print("⚠️ 未获取到任何新闻数据")
         return
 
-    today_file = os.path.join(DATA_DIR, f"news_{today_date}.jsonl")
-    existing_ids = set()
-    
-    if os.path.exists(today_file):
-        with open(today_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    saved_item = json.loads(line)
-                    if 'id' in saved_item:
-                        existing_ids.add(saved_item['id'])
-                except: pass
-
-    new_count = 0
-    # 重新排序：确保有时间的排前面
-    all_news_items.sort(key=lambda x: x['time'], reverse=True)
-
-    with open(today_file, 'a', encoding='utf-8') as f:
-        for item in all_news_items:
-            item_id = generate_news_id(item)
-            item['id'] = item_id
-            
-            if item_id not in existing_ids:
-                f.write(json.dumps(item, ensure_ascii=False) + "\n")
-                existing_ids.add(item_id)
-                new_count += 1
+    new_count = len(save_items(all_news_items, today_date=today_date))
     
-    print(f"✅ 入库完成: 新增 {new_count} 条 (EM:{len(em_items)} | CLS:{len(cls_items)})")
+    counts = " | ".join(f"{name}:{len(items)}" for name, items in results.items())
+    print(f"✅ 入库完成: 新增 {new_count} 条 ({counts})")
 
 if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="新闻抓取 (东财 + 财联社)")
+    parser.add_argument("--check-fixture", nargs="?", const=FIXTURE_DIR, metavar="DIR",
+                        help="离线校验财联社解析逻辑 (默认 fixtures/)，不联网")
+    args = parser.parse_args()
+    if args.check_fixture:
+        issues = check_fixture(args.check_fixture)
+        for issue in issues: print(f"   ❌ {issue}")
+        sys.exit(1 if issues else 0)
     fetch_and_save_news()
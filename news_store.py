@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import timedelta
+from utils import logger, get_beijing_time
+
+DATA_DIR = "data_news"
+DEFAULT_DB = os.path.join(DATA_DIR, "news.db")
+_ARCHIVE_DATE_RE = re.compile(r"news_(\d{4}-\d{2}-\d{2})\.jsonl$")
+# 时间窗口按 "有效时间" 过滤与排序：新闻时间缺失 (财联社网页兜底未取到时间等) 时取入库时间
+EFFECTIVE_TIME = "COALESCE(NULLIF(n.time, ''), n.ingested_at)"
+
+def generate_news_id(item):
+    raw = f"{item.get('time','')}{item.get('title','')}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+def _time_str(t):
+    """datetime / 字符串 -> 'YYYY-MM-DD HH:MM:SS' (与入库口径一致，字符串可直接比较大小)"""
+    if t is None or isinstance(t, str): return t
+    return t.strftime("%Y-%m-%d %H:%M:%S")
+
+class NewsStore:
+    """
+    [V19.18] 新闻索引库 (SQLite，data_news/news.db)
+
+    data_news/news_<date>.jsonl 仍是按抓取日期归档的原始记录 (入 git，可随时重建索引)；
+    本库在其之上提供:
+        - id 主键去重：入库 INSERT OR IGNORE，单条 O(1)，不再每次重读当日文件重建 existing_ids
+        - time / (source, time) 索引：任意时间窗口内最新 N 条，可跨日
+        - ingested_at：入库时间 (归档导入取归档日期)，新闻时间为空的条目按它落入时间窗口，不会被窗口查询漏掉
+        - FTS5 全文索引 (trigram 分词，适配中文)：关键词检索；3 字以下关键词或 SQLite 不支持 FTS5 时回退 LIKE
+    sync_dir 按文件记录已读偏移，只解析 JSONL 新追加的部分。
+
+        store = NewsStore()
+        store.sync_dir()
+        store.latest(80, since=datetime.now() - timedelta(hours=24))
+        store.search(["降准", "北向资金"], n=20)
+    """
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.fts = False
+        self._init_schema()
+
+    def _init_schema(self):
+        with self.lock, self.conn:
+            if self.path != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")   # 读写并发：抓取写入时分析端可同时查询
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS news (
+                    id TEXT PRIMARY KEY,
+                    time TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    content TEXT NOT NULL DEFAULT '',
+                    ingested_at TEXT NOT NULL DEFAULT ''
+                );
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    path TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL
+                );
+            """)
+            self._migrate()
+            self.conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_news_time ON news(time);
+                CREATE INDEX IF NOT EXISTS idx_news_source_time ON news(source, time);
+                CREATE INDEX IF NOT EXISTS idx_news_effective_time ON news(COALESCE(NULLIF(time, ''), ingested_at));
+            """)
+            try:
+                self.conn.executescript("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                        title, content, content='news', content_rowid='rowid', tokenize='trigram'
+                    );
+                    CREATE TRIGGER IF NOT EXISTS news_ai AFTER INSERT ON news BEGIN
+                        INSERT INTO news_fts(rowid, title, content) VALUES (new.rowid, new.title, new.content);
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS news_ad AFTER DELETE ON news BEGIN
+                        INSERT INTO news_fts(news_fts, rowid, title, content) VALUES ('delete', old.rowid, old.title, old.content);
+                    END;
+                """)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"⚠️ [NewsStore] SQLite 不支持 FTS5 trigram ({e})，关键词检索回退 LIKE")
+
+    def _migrate(self):
+        """旧库补 ingested_at 列 (调用方持有 lock)；新闻时间为空的旧条目删除并重置归档偏移，下次 sync 按归档日期重新入库"""
+        columns = {r['name'] for r in self.conn.execute("PRAGMA table_info(news)")}
+        if 'ingested_at' in columns: return
+        self.conn.execute("ALTER TABLE news ADD COLUMN ingested_at TEXT NOT NULL DEFAULT ''")
+        self.conn.execute("DELETE FROM news WHERE time = ''")
+        self.conn.execute("DELETE FROM sync_state")
+
+    # --- 写入 ---
+    def add(self, items, ingested_at=None):
+        """
+        批量入库 (单事务)，已存在的 id 忽略
+        ingested_at: 入库时间，默认当前北京时间 (归档导入时传入归档日期)
+        Returns: 本次新增的条目列表 (已补 id 字段)
+        """
+        added = []
+        ingested_at = _time_str(ingested_at) or _time_str(get_beijing_time())
+        with self.lock, self.conn:
+            for item in items:
+                title = str(item.get('title') or '').strip()
+                if not title: continue
+                item['id'] = item.get('id') or generate_news_id(item)
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO news(id, time, source, title, content, ingested_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (item['id'], str(item.get('time') or ''), str(item.get('source') or 'Local'),
+                     title, str(item.get('content') or '').strip(), ingested_at))
+                if cur.rowcount: added.append(item)
+        return added
+
+    def has(self, news_id):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM news WHERE id = ?", (news_id,)).fetchone() is not None
+
+    def sync_file(self, path):
+        """增量导入单个 JSONL：从上次偏移继续读取完整行 (文件变短视为重写，从头导入)。Returns: 新增条数"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        key = os.path.abspath(path)
+        with self.lock:
+            row = self.conn.execute("SELECT offset FROM sync_state WHERE path = ?", (key,)).fetchone()
+        offset = row['offset'] if row and row['offset'] <= size else 0
+        if offset == size:
+            return 0
+
+        items = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1   # 只消费完整行，写了一半的末行留给下次
+        for line in data[:end].splitlines():
+            try:
+                items.append(json.loads(line))
+            except Exception: continue
+        # 归档 news_<date>.jsonl 的入库时间取归档日期 (补建索引时不会把旧归档算作 "刚刚入库")
+        archive = _ARCHIVE_DATE_RE.search(os.path.basename(path))
+        added = self.add(items, ingested_at=f"{archive.group(1)} 00:00:00" if archive else None)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sync_state(path, offset) VALUES (?, ?)", (key, offset + end))
+        return len(added)
+
+    def sync_dir(self, data_dir=DATA_DIR):
+        """导入目录下全部 news_*.jsonl 的新增部分。Returns: 新增条数"""
+        if not os.path.isdir(data_dir):
+            return 0
+        total = 0
+        for name in sorted(os.listdir(data_dir)):
+            if name.startswith("news_") and name.endswith(".jsonl"):
+                total += self.sync_file(os.path.join(data_dir, name))
+        if total:
+            logger.info(f"🗂️ [NewsStore] 同步新闻归档: 新增 {total} 条")
+        return total
+
+    # --- 查询 ---
+    def _window(self, since, until, sources):
+        clauses, args = [], []
+        if since is not None:
+            clauses.append(f"{EFFECTIVE_TIME} >= ?"); args.append(_time_str(since))
+        if until is not None:
+            clauses.append(f"{EFFECTIVE_TIME} < ?"); args.append(_time_str(until))
+        if sources:
+            clauses.append(f"n.source IN ({','.join('?' * len(sources))})"); args.extend(sources)
+        return clauses, args
+
+    def _query(self, clauses, args, n):
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT n.id, n.time, n.source, n.title, n.content FROM news n {where} ORDER BY {EFFECTIVE_TIME} DESC LIMIT ?"
+        with self.lock:
+            return [dict(r) for r in self.conn.execute(sql, (*args, int(n))).fetchall()]
+
+    def latest(self, n=80, since=None, until=None, sources=None):
+        """时间窗口 [since, until) 内最新 n 条 (按有效时间倒序：新闻时间，缺失时取入库时间)"""
+        clauses, args = self._window(since, until, sources)
+        return self._query(clauses, args, n)
+
+    def search(self, keywords, n=50, since=None, until=None, sources=None, match_all=False):
+        """
+        标题/正文命中关键词的最新 n 条
+        match_all=False 为 OR (任一命中)，True 为 AND (全部命中)
+        """
+        if isinstance(keywords, str): keywords = keywords.split()
+        keywords = [k.strip() for k in keywords if k and k.strip()]
+        if not keywords:
+            return []
+        clauses, args = self._window(since, until, sources)
+
+        # trigram 分词只能匹配 >= 3 字的片段；更短的关键词走 LIKE
+        long_terms = [k for k in keywords if self.fts and len(k) >= 3]
+        short_terms = [k for k in keywords if k not in long_terms]
+        joiner = " AND " if match_all else " OR "
+        conds = []
+        if long_terms:
+            expr = joiner.join('"' + k.replace('"', '""') + '"' for k in long_terms)
+            conds.append("n.rowid IN (SELECT rowid FROM news_fts WHERE news_fts MATCH ?)"); args.append(expr)
+        for k in short_terms:
+            pattern = "%" + k.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conds.append("(n.title LIKE ? ESCAPE '\\' OR n.content LIKE ? ESCAPE '\\')"); args.extend([pattern, pattern])
+        clauses.append("(" + joiner.join(conds) + ")")
+        return self._query(clauses, args, n)
+
+    def items_since(self, cursor=0, limit=500):
+        """
+        增量读取：入库序号 (rowid) 大于 cursor 的条目，按入库顺序
+        新闻时间可能乱序到达，按入库序号做游标不会漏读。Returns: (条目列表 (含 seq), 新游标)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT rowid AS seq, id, time, source, title, content FROM news WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (int(cursor), int(limit))).fetchall()
+        items = [dict(r) for r in rows]
+        return items, (items[-1]['seq'] if items else int(cursor))
+
+    def last_seq(self):
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM news").fetchone()[0]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def fetch_daemon_latest(daemon_url, hours, limit, timeout=5):
+    """查询常驻采集服务 (news_daemon.py) 的 /latest 接口；服务不可用时抛出异常，由调用方决定回退"""
+    from urllib.parse import urlencode
+    from urllib.request import urlopen
+    url = f"{daemon_url.rstrip('/')}/latest?{urlencode({'hours': hours, 'limit': limit})}"
+    with urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode('utf-8'))['items']
+
+def since_hours(hours, now=None):
+    """最近 hours 小时的窗口起点 (北京时间字符串)"""
+    now = now or get_beijing_time()
+    return _time_str(now - timedelta(hours=hours))
@@ -0,0 +1,281 @@
+"""
+param_sweep.py | 仓位阈值 / 评分阈值 / 估值切点的参数扫描 (网格或随机搜索，多进程)
+
+指标面板 (Backtester.panel) 只在主进程计算一次，放入一块 multiprocessing.shared_memory，
+各工作进程按名字映射为 numpy 视图，不再逐任务 pickle 行情；每个任务只传一份参数字典，
+在面板上合成信号并跑 run_ledger，返回收益 / 回撤 / 换手等汇总。任务之间无共享写入，
+吞吐随进程数近似线性扩展。
+
+用法:
+    python param_sweep.py --grid score_up=65,70,75 --grid val_brake=0.4,0.5,0.6
+    python param_sweep.py --random 200 --range score_strong=80:95 --range pct_high=0.8:0.95 --seed 7
+    python param_sweep.py --grid adx_trend_threshold=20,25,30 --start 2022-01-01 --workers 8 --out sweep.csv
+可扫描参数见 backtester.PARAM_SPACE (python param_sweep.py --list-params)。
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from backtester import Backtester, PARAM_SPACE, date_mask, equity_arrays, run_ledger, split_params
+from utils import logger
+
+RANK_KEYS = {"return": False, "max_drawdown": False, "turnover": True}   # 列名: 是否升序为优
+
+
+class SharedPanel:
+    """把 {字段: ndarray(日期 × 标的)} 打包进一块共享内存，子进程按 meta 映射回零拷贝视图"""
+    def __init__(self, shm, fields, shape, owner):
+        self.shm = shm
+        self.fields = fields
+        self.shape = shape
+        self.owner = owner
+        block = np.ndarray((len(fields),) + shape, dtype=np.float64, buffer=shm.buf)
+        self.arrays = {f: block[i] for i, f in enumerate(fields)}
+
+    @classmethod
+    def create(cls, arrays):
+        fields = list(arrays)
+        shape = arrays[fields[0]].shape
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(fields) * int(np.prod(shape)) * 8))
+        panel = cls(shm, fields, shape, owner=True)
+        for f in fields:
+            panel.arrays[f][:] = arrays[f]
+        return panel
+
+    @classmethod
+    def attach(cls, meta):
+        # 进程池子进程与主进程共用 resource_tracker，内存块只由主进程 unlink
+        shm = shared_memory.SharedMemory(name=meta['name'])
+        return cls(shm, meta['fields'], tuple(meta['shape']), owner=False)
+
+    @property
+    def meta(self):
+        return {"name": self.shm.name, "fields": self.fields, "shape": self.shape}
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+        if self.owner: self.shm.unlink()
+
+
+# --- 工作进程 ---
+_worker = {}
+
+
+def _init_worker(meta, context):
+    _worker['panel'] = SharedPanel.attach(meta)
+    _worker.update(context)
+
+
+def evaluate(params, panel=None, context=None, window=None):
+    """
+    单组参数的回测汇总 (在工作进程内执行；panel/context 缺省时取进程内共享面板)
+    window: (起, 止) 行号切片，缺省为 context['window']；面板是全历史的，切片前的 K 线天然充当指标预热
+    """
+    arrays = (panel or _worker['panel']).arrays
+    ctx = context or _worker
+    lo, hi = window or ctx['window']
+    sig = Backtester.signal_arrays(arrays, ctx['left_side'], params)
+    sizing, _, _ = split_params(params)
+    lock_days = sizing.get('lock_days', PARAM_SPACE['lock_days'])
+    shares, flows, _ = run_ledger(arrays['close'][lo:hi], sig['mult'][lo:hi], ctx['base_amt'], ctx['max_daily'], lock_days)
+
+    eq = equity_arrays(shares * arrays['px'][lo:hi], flows)
+    mv = eq['market_value']
+    traded = eq['invested'][-1] + eq['withdrawn'][-1]
+    avg_mv = mv[mv > 0].mean() if (mv > 0).any() else 0.0
+    return {
+        **params,
+        "return": float(eq['nav'][-1] - 1),
+        "max_drawdown": float(eq['drawdown'].min()),
+        "turnover": float(traded / avg_mv) if avg_mv > 0 else 0.0,
+        "pnl": float(eq['pnl'][-1]),
+        "invested": float(eq['invested'][-1]),
+        "trades": int(np.count_nonzero(flows)),
+        "sells": int(np.count_nonzero(flows < 0)),
+        "days": hi - lo,
+    }
+
+
+def _evaluate_task(task):
+    params, window = task
+    return evaluate(params, window=window)
+
+
+# --- 搜索空间 ---
+def parse_grid(pairs):
+    """['score_up=65,70,75', ...] -> {'score_up': [65, 70, 75]}"""
+    grid = {}
+    for pair in pairs or []:
+        key, sep, raw = pair.partition("=")
+        key = key.strip()
+        if not sep or key not in PARAM_SPACE:
+            raise ValueError(f"未知参数: {pair} (可选: {', '.join(PARAM_SPACE)})")
+        grid[key] = [yaml.safe_load(v) for v in raw.split(",") if v.strip()]
+    return grid
+
+
+def parse_ranges(pairs):
+    """['pct_high=0.8:0.95', ...] -> {'pct_high': (0.8, 0.95)}；两端均为整数时按整数抽样"""
+    ranges = {}
+    for pair in pairs or []:
+        key, sep, raw = pair.partition("=")
+        key = key.strip()
+        lo, colon, hi = raw.partition(":")
+        if not sep or not colon or key not in PARAM_SPACE:
+            raise ValueError(f"无效范围: {pair} (格式 KEY=LO:HI，可选: {', '.join(PARAM_SPACE)})")
+        ranges[key] = (yaml.safe_load(lo), yaml.safe_load(hi))
+    return ranges
+
+
+def grid_candidates(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def random_candidates(ranges, n, seed=None):
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        cand = {}
+        for key, (lo, hi) in ranges.items():
+            cand[key] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else round(rng.uniform(lo, hi), 4)
+        out.append(cand)
+    return out
+
+
+def rank_results(rows, sort="composite"):
+    """按收益 (高)、最大回撤 (浅)、换手 (低) 分别排名，composite 为三者平均名次"""
+    df = pd.DataFrame(rows)
+    for col, ascending in RANK_KEYS.items():
+        df[f"rank_{col}"] = df[col].rank(ascending=ascending, method="min")
+    df["rank_composite"] = df[[f"rank_{c}" for c in RANK_KEYS]].mean(axis=1)
+    if sort == "composite":
+        return df.sort_values(["rank_composite", "rank_return"]).reset_index(drop=True)
+    return df.sort_values(sort, ascending=RANK_KEYS[sort]).reset_index(drop=True)
+
+
+def prepare(bt, start=None, end=None, cache_path=None):
+    """
+    计算 (或从缓存读取) 全历史面板，附加前向填充价格，确定回测区间
+    Returns: (arrays, dates, codes, context)
+    """
+    panel = bt.panel(cache_path)
+    if panel is None: raise RuntimeError("无可用行情 (data_cache 为空?)")
+    arrays, dates, codes = panel
+    arrays['px'] = pd.DataFrame(arrays['close']).ffill().fillna(0.0).values
+    mask = np.flatnonzero(date_mask(dates, start, end))
+    if not len(mask): raise RuntimeError(f"回测区间内无交易日: {start} ~ {end}")
+    context = {"left_side": bt.left_side_mask(codes), "window": (int(mask[0]), int(mask[-1]) + 1),
+               "base_amt": bt.base_amt, "max_daily": bt.max_daily}
+    return arrays, dates, codes, context
+
+
+def run_tasks(arrays, context, tasks, workers=None, chunksize=None):
+    """
+    在共享面板上并行执行 [(params, window), ...]，结果按任务顺序返回
+    workers=1 时在当前进程内顺序执行 (同样经过共享内存，便于核对)
+    """
+    workers = workers or os.cpu_count() or 1
+    shared = SharedPanel.create(arrays)
+    try:
+        if workers == 1:
+            return [evaluate(params, shared, context, window) for params, window in tasks]
+        chunksize = chunksize or max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.meta, context)) as pool:
+            return list(pool.map(_evaluate_task, tasks, chunksize=chunksize))
+    finally:
+        shared.close()
+
+
+def sweep(bt, candidates, workers=None, start=None, end=None, cache_path=None):
+    """
+    在共享面板上并行评估全部候选参数 (首行固定为当前默认参数，便于对照)
+    Returns: (结果行列表, 面板计算耗时, 扫描耗时)
+    """
+    t0 = time.perf_counter()
+    arrays, dates, codes, context = prepare(bt, start, end, cache_path)
+    t_panel = time.perf_counter() - t0
+
+    candidates = [{}] + [c for c in candidates if c]
+    t1 = time.perf_counter()
+    rows = run_tasks(arrays, context, [(c, None) for c in candidates], workers)
+    fill_defaults(rows, candidates)
+    for i, row in enumerate(rows):
+        row["baseline"] = i == 0
+    return rows, t_panel, time.perf_counter() - t1
+
+
+def fill_defaults(rows, candidates):
+    """结果行补齐未覆盖参数的默认值，便于对照"""
+    keys = {k for c in candidates for k in c}
+    for row in rows:
+        for k in keys: row.setdefault(k, PARAM_SPACE[k])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="参数扫描 (网格 / 随机搜索，多进程共享面板)")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--grid", action="append", metavar="KEY=V1,V2,...", help="网格取值，可重复 (笛卡尔积)")
+    parser.add_argument("--random", type=int, metavar="N", help="随机搜索 N 组 (配合 --range)")
+    parser.add_argument("--range", action="append", metavar="KEY=LO:HI", help="随机搜索范围，可重复")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--funds", action="append", metavar="CODE", help="只扫描指定标的，可重复")
+    parser.add_argument("--start", help="回测起始日 YYYY-MM-DD")
+    parser.add_argument("--end", help="回测结束日 YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, help="进程数 (默认 CPU 核数)")
+    parser.add_argument("--panel-cache", help="指标面板缓存文件 (.npz)，行情未变时跳过指标计算")
+    parser.add_argument("--sort", default="composite", choices=["composite"] + list(RANK_KEYS))
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", help="完整结果输出 CSV")
+    parser.add_argument("--list-params", action="store_true")
+    args = parser.parse_args()
+
+    if args.list_params:
+        for k, v in PARAM_SPACE.items(): print(f"{k} = {v}")
+        sys.exit(0)
+    try:
+        candidates = grid_candidates(parse_grid(args.grid)) if args.grid else []
+        if args.random:
+            candidates += random_candidates(parse_ranges(args.range), args.random, args.seed)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if not candidates:
+        print("❌ 未指定搜索空间 (--grid 或 --random + --range)")
+        sys.exit(2)
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    g = config.get('global', {})
+    funds = [f for f in config.get('funds', []) if not args.funds or f['code'] in args.funds]
+    bt = Backtester(funds, base_amt=g.get('base_invest_amount', 1000), max_daily=g.get('max_daily_invest', 5000),
+                    valuation_method=g.get('valuation_method', 'minmax'))
+
+    try:
+        rows, t_panel, t_sweep = sweep(bt, candidates, args.workers, args.start, args.end, args.panel_cache)
+    except RuntimeError as e:
+        logger.error(f"参数扫描失败: {e}")
+        sys.exit(1)
+    ranked = rank_results(rows, args.sort)
+
+    keys = sorted({k for c in candidates for k in c}, key=list(PARAM_SPACE).index)
+    cols = keys + ["return", "max_drawdown", "turnover", "pnl", "trades", "rank_composite"]
+    view = ranked[cols].copy()
+    view.insert(0, "", np.where(ranked["baseline"], "★", ""))
+    print(f"🔬 参数扫描: {len(rows)} 组 (含默认参数 ★) | 面板 {t_panel:.2f}s | 扫描 {t_sweep:.2f}s "
+          f"({len(rows) / t_sweep:.1f} 组/s, {args.workers or os.cpu_count()} 进程)")
+    print(view.head(args.top).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if args.out:
+        ranked.to_csv(args.out, index=False)
+        print(f"📝 完整结果已写入 {args.out}")
@@ -0,0 +1,173 @@
+"""
+portfolio_nav.py | 组合逐日盯市：净值 / 暴露 / 回撤 / 个基贡献 (一次向量化计算)
+
+输入:
+    - trade_history.csv (TradeHistoryStore)：每笔成交前后份额，按日期前向填充得到逐日持仓矩阵；
+      首笔记录之前的持仓取其 shares_before (即从当前持仓倒推的历史份额)
+    - data_cache/<code>.csv 的收盘价：对齐成 日期 × 标的 的价格矩阵
+    - strategy_map {code: strategy_type}：暴露分组
+净值按时间加权计算，申赎现金流不影响收益率：
+    r_t = (MV_t - MV_{t-1} - Flow_t) / MV_{t-1}
+
+增量: 结果缓存到 nav_cache.json，成交历史未变时只对新增交易日做同样的矩阵运算并续接。
+"""
+import json
+import os
+
+import pandas as pd
+
+from utils import logger, atomic_write_json
+
+
+class PortfolioNav:
+    def __init__(self, history, strategy_map=None, price_dir="data_cache", cache_path="nav_cache.json", lookback_days=250):
+        self.history = history
+        self.strategy_map = strategy_map or {}
+        self.price_dir = price_dir
+        self.cache_path = cache_path
+        self.lookback_days = lookback_days
+
+    # --- 数据对齐 ---
+    def load_closes(self, codes):
+        """日期 × 标的 收盘价矩阵 (缺失缓存的标的跳过)"""
+        series = {}
+        for code in codes:
+            path = os.path.join(self.price_dir, f"{code}.csv")
+            if not os.path.exists(path): continue
+            try:
+                df = pd.read_csv(path, index_col=0, parse_dates=True)
+                series[code] = df['close'].astype(float)
+            except Exception as e:
+                logger.error(f"净值计算读取行情失败 {code}: {e}")
+        if not series: return pd.DataFrame()
+        closes = pd.DataFrame(series).sort_index()
+        closes = closes[~closes.index.duplicated(keep='last')]
+        return closes.ffill()
+
+    def shares_matrix(self, trades, index):
+        """成交表 -> 逐日收盘后持仓 (日期 × 标的)"""
+        trades = trades.sort_values('seq')
+        after = trades.groupby(['date', 'code'])['shares_after'].last().unstack('code')
+        first_before = trades.groupby('code')['shares_before'].first()
+        # 非交易日的成交归到之后最近的交易日
+        full = after.reindex(after.index.union(index)).ffill()
+        shares = full.reindex(index, method='ffill')
+        return shares.fillna(first_before).fillna(0.0)
+
+    def flows(self, trades, index):
+        """每日净申购额 (买入为正、卖出为负)，非交易日成交顺延到下一个交易日"""
+        f = trades.groupby('date')['amount'].sum()
+        pos = index.searchsorted(f.index)
+        valid = pos < len(index)
+        return pd.Series(f.values[valid], index=index[pos[valid]]).groupby(level=0).sum().reindex(index, fill_value=0.0)
+
+    # --- 核心计算 ---
+    def compute(self, start=None):
+        trades = self.history.frame().reset_index()
+        if trades.empty: return None
+        closes = self.load_closes(sorted(trades['code'].unique()))
+        if closes.empty: return None
+        if start is not None:
+            closes = closes[closes.index >= pd.Timestamp(start)]
+        closes = closes.tail(self.lookback_days + 1) if start is None else closes
+
+        shares = self.shares_matrix(trades, closes.index).reindex(columns=closes.columns, fill_value=0.0)
+        mv_by_code = shares * closes
+        mv = mv_by_code.sum(axis=1)
+        flow = self.flows(trades, closes.index)
+
+        prev_mv = mv.shift(1)
+        ret = ((mv - prev_mv - flow) / prev_mv).where(prev_mv > 0, 0.0).fillna(0.0)
+        # 个基贡献：昨日持仓 × 今日价格变动 / 昨日组合市值
+        pnl_by_code = shares.shift(1) * closes.diff()
+        contrib = pnl_by_code.div(prev_mv.where(prev_mv > 0), axis=0).fillna(0.0)
+        return {"mv": mv, "mv_by_code": mv_by_code, "ret": ret, "pnl_by_code": pnl_by_code.fillna(0.0), "contrib": contrib}
+
+    def _signature(self):
+        df = self.history.frame()
+        return f"{len(df)}:{df['trade_id'].iloc[-1] if len(df) else ''}"
+
+    def nav_series(self, window=20):
+        """
+        净值序列 (起点为 1)
+        命中缓存 (成交历史未变) 时只对缓存末日之后的交易日续算，另多取 window 日供贡献统计
+        """
+        sig = self._signature()
+        cache = self._load_cache()
+        if cache and cache.get('signature') == sig and cache.get('nav'):
+            cached = pd.Series(cache['nav'], dtype=float)
+            cached.index = pd.to_datetime(cached.index)
+            res = self.compute(start=cached.index[max(0, len(cached) - window - 1)])
+            if res is not None:
+                new_ret = res['ret'][res['ret'].index > cached.index[-1]]
+                nav = pd.concat([cached, (1 + new_ret).cumprod() * cached.iloc[-1]]).tail(self.lookback_days + 1)
+                if len(new_ret): self._save_cache(sig, nav)
+                return nav, res
+
+        res = self.compute()
+        if res is None: return None, None
+        nav = (1 + res['ret']).cumprod()
+        self._save_cache(sig, nav)
+        return nav, res
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path): return None
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _save_cache(self, signature, nav):
+        if not self.cache_path: return
+        try:
+            atomic_write_json(self.cache_path, {"signature": signature, "nav": {d.strftime("%Y-%m-%d"): round(float(v), 8) for d, v in nav.items()}})
+        except Exception as e:
+            logger.error(f"净值缓存写入失败: {e}")
+
+    def summary(self, window=20):
+        """报告用汇总：市值、收益、回撤、策略暴露、近 window 日个基贡献"""
+        nav, res = self.nav_series(window)
+        if nav is None or res is None: return None
+        drawdown = nav / nav.cummax() - 1
+
+        mv_today = res['mv_by_code'].iloc[-1]
+        total_mv = float(mv_today.sum())
+        groups = pd.Series({c: self.strategy_map.get(c, 'other') for c in mv_today.index})
+        exposure = (mv_today.groupby(groups).sum() / total_mv).sort_values(ascending=False) if total_mv > 0 else pd.Series(dtype=float)
+
+        contrib = res['contrib'].tail(window).sum().sort_values()
+        return {
+            "date": nav.index[-1].strftime("%Y-%m-%d"),
+            "market_value": total_mv,
+            "day_return": float(res['ret'].iloc[-1]),
+            "nav": float(nav.iloc[-1]),
+            "period_return": float(nav.iloc[-1] / nav.iloc[0] - 1),
+            "max_drawdown": float(drawdown.min()),
+            "current_drawdown": float(drawdown.iloc[-1]),
+            "exposure": {k: round(float(v), 4) for k, v in exposure.items()},
+            "top_contrib": {k: float(v) for k, v in contrib[contrib > 0].tail(3).iloc[::-1].items()},
+            "worst_contrib": {k: float(v) for k, v in contrib[contrib < 0].head(3).items()},
+            "window": window,
+            "days": len(nav)
+        }
+
+    @staticmethod
+    def render_html(s, names=None):
+        """邮件报告用的组合净值摘要"""
+        if not s: return ""
+        names = names or {}
+        pct = lambda v: f"<span style='color:{'#ff4d4f' if v >= 0 else '#52c41a'}'>{v:+.2%}</span>"
+        exposure = " | ".join(f"{k} {v:.0%}" for k, v in s['exposure'].items())
+        top = " ".join(f"{names.get(c, c)} {pct(v)}" for c, v in s['top_contrib'].items()) or "-"
+        worst = " ".join(f"{names.get(c, c)} {pct(v)}" for c, v in s['worst_contrib'].items()) or "-"
+        return (
+            "<table>"
+            f"<tr><td>市值</td><td>¥{s['market_value']:,.0f}</td><td>当日</td><td>{pct(s['day_return'])}</td></tr>"
+            f"<tr><td>净值</td><td>{s['nav']:.4f}</td><td>区间({s['days']}日)</td><td>{pct(s['period_return'])}</td></tr>"
+            f"<tr><td>最大回撤</td><td>{s['max_drawdown']:.2%}</td><td>当前回撤</td><td>{s['current_drawdown']:.2%}</td></tr>"
+            "</table>"
+            f"<div style='margin-top:4px; font-size:11px; color:#999;'>暴露: {exposure}</div>"
+            f"<div style='font-size:11px; color:#999;'>近{s['window']}日贡献 ▲ {top}</div>"
+            f"<div style='font-size:11px; color:#999;'>近{s['window']}日拖累 ▼ {worst}</div>"
+        )
@@ -1,24 +1,148 @@
+import copy
+import hashlib
 import json
 import os
+import shutil
 import threading
+import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
-from utils import logger
+from types import MappingProxyType
+from utils import logger, atomic_write_json, json_default
+from metrics import metrics
+from trade_history import TradeHistoryStore
+from portfolio_nav import PortfolioNav
 
 class PortfolioTracker:
-    def __init__(self, filepath='portfolio.json'):
+    """
+    [V19.8] 账本 = 快照 (portfolio.json) + 追加日志 (portfolio.journal.jsonl)
+
+    - add_trade / confirm_trades 只向日志追加一行并 fsync，写入 O(1)，不再整文件重写
+    - 日志首行记录其基准快照的 sha1；加载时快照 + 日志重放即为精确的崩溃前状态
+    - compact() 原子写出新快照并重置日志 (每 compact_every 条自动触发，main 在运行结束时调用)
+    - 若 compact 在写完快照、重置日志前崩溃，旧日志的基准 sha1 与新快照不符；portfolio.json.lineage
+      记录了 "当前快照 sha1 <- 被它取代的快照 sha1"，只有日志基准正是被取代的那份快照时才判定为已合并而丢弃，
+      其余无法证明已合并的日志 (首行损坏、快照从 .bak 恢复、手工改动...) 一律改名留存为 *.orphan-<时间>，不截断
+    portfolio.json 的格式保持不变，外部工具照常读取。
+
+    [V19.9] 完整成交历史另存 trade_history.csv (见 trade_history.py)，portfolio.json 的 history 仍只留最近 10 笔
+
+    [V19.11] 批量写回 (write-behind)：begin_batch() 后的成交只改内存，commit() 一次原子落盘，
+    rollback() 恢复到 begin_batch 时的状态。每次写快照前把上一份完好的快照留作 portfolio.json.bak；
+    快照损坏时保留损坏副本并从 .bak 恢复，两者都不可用则拒绝启动，不再静默清空账本。
+
+    [V19.12] 并发：账本自带同步，调用方无需外部加锁
+    - 单标的读写 (get_position / add_trade / has_trade) 只锁该代码所在的条带，不同标的互不阻塞
+    - 全局操作 (confirm_trades / compact / commit / rollback) 按序获取全部条带
+    - 日志与批次缓冲由 io_lock 保护，获取顺序固定为 条带 -> io_lock，不会死锁
+    - get_position 返回只读快照；锁竞争次数与等待时长见 lock_stats() 及 metrics
+    """
+    def __init__(self, filepath='portfolio.json', compact_every=200, history_path=None, stripes=16):
         self.filepath = filepath
-        self.lock = threading.Lock()
+        self.journal_path = os.path.splitext(filepath)[0] + '.journal.jsonl'
+        self.compact_every = compact_every
+        self.journal_count = 0
+        self.backup_path = filepath + '.bak'
+        self.lineage_path = filepath + '.lineage'   # {"digest": 当前快照 sha1, "previous": 被取代快照 sha1}
+        self._snapshot_digest = None   # 最近一次确认完好的快照 sha1，只有它才会被备份
+        self._batch = None
+        self._compact_due = False
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._io_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._lock_stats = {"acquired": 0, "contended": 0, "wait_seconds": 0.0}
+        self.history = TradeHistoryStore(history_path or os.path.join(os.path.dirname(filepath), 'trade_history.csv'))
+        need_backfill = not os.path.exists(self.history.path)
         self._load_portfolio()
+        if need_backfill:
+            self.history.backfill_from_portfolio(self.portfolio)
+
+    # --- 同步 ---
+    def _stripe(self, code):
+        return self._stripes[hash(code) % len(self._stripes)]
+
+    def _acquire(self, lock):
+        if lock.acquire(blocking=False):
+            waited = 0.0
+        else:
+            t0 = time.perf_counter()
+            lock.acquire()
+            waited = time.perf_counter() - t0
+        with self._stats_lock:
+            self._lock_stats['acquired'] += 1
+            if waited:
+                self._lock_stats['contended'] += 1
+                self._lock_stats['wait_seconds'] += waited
+        if waited:
+            metrics.incr("ledger_lock_contended")
+            metrics.incr("ledger_lock_wait_seconds", waited)
+
+    @contextmanager
+    def _locked(self, code=None):
+        """code 为 None 时按固定顺序锁住全部条带"""
+        locks = [self._stripe(code)] if code is not None else self._stripes
+        for lock in locks:
+            self._acquire(lock)
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def lock_stats(self):
+        with self._stats_lock:
+            return dict(self._lock_stats)
+
+    @staticmethod
+    def _file_digest(path):
+        if not os.path.exists(path): return None
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @staticmethod
+    def _read_snapshot(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"账本顶层应为对象，实际为 {type(data).__name__}")
+        return data
+
+    def _recover_from_backup(self, error):
+        """快照损坏：保留损坏副本，尝试 .bak；都不可用时抛出异常中止运行"""
+        corrupt_path = f"{self.filepath}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        try:
+            shutil.copy2(self.filepath, corrupt_path)
+        except Exception as e:
+            logger.error(f"损坏账本副本保存失败: {e}")
+        logger.error(f"❌ 账本损坏: {error}，已保留副本 {corrupt_path}")
+        try:
+            portfolio = self._read_snapshot(self.backup_path)
+        except Exception as e:
+            raise RuntimeError(f"账本 {self.filepath} 损坏且备份 {self.backup_path} 不可用 ({e})，拒绝以空账本继续运行") from error
+        logger.warning(f"♻️ 已从备份恢复账本: {self.backup_path} (备份之后的成交需人工核对)")
+        return portfolio
 
     def _load_portfolio(self):
-        if not os.path.exists(self.filepath):
+        if not os.path.exists(self.filepath) and os.path.exists(self.backup_path):
+            logger.warning(f"⚠️ 账本 {self.filepath} 缺失，从备份 {self.backup_path} 恢复")
+            self.portfolio = self._read_snapshot(self.backup_path)
+            self._replay_journal()   # 基准不可能与缺失的快照一致：日志改名留存
+            self._save_portfolio()
+        elif not os.path.exists(self.filepath):
             self.portfolio = {}
+            self._replay_journal()
             self._save_portfolio()
         else:
+            recovered = False
+            try:
+                self.portfolio = self._read_snapshot(self.filepath)
+                self._snapshot_digest = self._file_digest(self.filepath)
+            except Exception as e:
+                self.portfolio = self._recover_from_backup(e)
+                recovered = True
+
             try:
-                with open(self.filepath, 'r', encoding='utf-8') as f:
-                    self.portfolio = json.load(f)
-                
                 # [V14.12 修复] 数据自愈：自动补全旧版数据的缺失字段
                 dirty = False
                 for code, pos in self.portfolio.items():
@@ -35,35 +159,175 @@ class PortfolioTracker:
                         pos['history'] = []
                         dirty = True
                 
-                if dirty:
+                journal_ok, replayed = self._replay_journal()
+                if dirty or replayed or recovered:
                     self._save_portfolio()
+                elif not journal_ok:
+                    self._reset_journal()
+                if dirty:
                     logger.info("🔧 检测到旧版账本数据，已自动补全缺失字段 (Self-Healing).")
 
             except Exception as e:
-                logger.error(f"账本加载失败: {e}, 重置为空账本")
-                self.portfolio = {}
+                # 半途重放的内存状态不可信，宁可中止也不带着错账继续交易
+                raise RuntimeError(f"账本日志重放失败: {e}，请检查 {self.journal_path}") from e
+
+    def _compacted_digest(self):
+        """当前快照取代的上一份快照 sha1 (lineage 与当前快照一致时才可信)"""
+        try:
+            with open(self.lineage_path, 'r', encoding='utf-8') as f:
+                lineage = json.load(f)
+        except Exception:
+            return None
+        if lineage.get('digest') != self._file_digest(self.filepath): return None
+        return lineage.get('previous')
 
-    def _save_portfolio(self):
+    def _set_aside_journal(self, reason, records):
+        """无法证明已合并的日志：改名留存供人工核对，绝不截断"""
+        orphan = f"{self.journal_path}.orphan-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        trades = sum(1 for r in records if r.get('op') == 'trade')
         try:
-            with open(self.filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.portfolio, f, indent=2, ensure_ascii=False)
+            os.replace(self.journal_path, orphan)
+        except Exception as e:
+            raise RuntimeError(f"账本日志 {self.journal_path} 无法重放 ({reason}) 且留存失败: {e}") from e
+        logger.error(f"❌ 账本日志无法重放 ({reason})，已改名留存 {orphan} (可解析 {trades} 笔成交)，请人工核对")
+
+    def _replay_journal(self):
+        """把基准与当前快照一致的日志重放到内存，返回 (日志可续写, 重放条数)"""
+        if not os.path.exists(self.journal_path): return False, 0
+        records = []
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line: continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break   # 崩溃时写了一半的末行：之后的内容不可信
+        if not records or records[0].get('op') != 'base':
+            if records or os.path.getsize(self.journal_path):
+                self._set_aside_journal("首行不是完整的 base 记录", records)
+            return False, 0
+        base_digest = records[0].get('digest')
+        if base_digest != self._file_digest(self.filepath):
+            if base_digest and base_digest == self._compacted_digest():
+                logger.info("🧾 账本日志已合并进快照 (合并后、重置日志前中断)，忽略")
+            else:
+                self._set_aside_journal("基准与当前快照不一致，且不是已合并的上一份快照", records)
+            return False, 0
+
+        rows = []
+        for rec in records[1:]:
+            if rec.get('op') == 'trade':
+                rows.append(self._apply_trade(rec))
+            elif rec.get('op') == 'roll':
+                self._apply_roll()
+        # 崩溃发生在日志落盘之后、历史追加之前时补齐 (按 trade_id 去重)
+        self.history.append(rows)
+        if len(records) > 1:
+            logger.info(f"🧾 账本日志重放 {len(records) - 1} 条 (上次运行未合并)")
+        return True, len(records) - 1
+
+    def _append_journal(self, rec):
+        """调用方持有 io_lock；达到阈值只做标记，由调用方释放条带后再 compact"""
+        try:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(rec, ensure_ascii=False, default=json_default) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_count += 1
+        except Exception as e:
+            logger.error(f"账本日志写入失败: {e}")
+        if self.compact_every and self.journal_count >= self.compact_every:
+            self._compact_due = True
+
+    def _save_portfolio(self, strict=False):
+        """写出快照并以其为基准重置日志；strict=True 时快照写入失败向上抛出 (批量提交需据此保留批次)"""
+        try:
+            previous = self._file_digest(self.filepath)
+            if self._snapshot_digest and previous == self._snapshot_digest:
+                shutil.copy2(self.filepath, self.backup_path)
+            atomic_write_json(self.filepath, self.portfolio, indent=2)
+            self._snapshot_digest = self._file_digest(self.filepath)
         except Exception as e:
             logger.error(f"账本保存失败: {e}")
+            if strict: raise
+            return
+        try:
+            # 先记谱系再重置日志：两步之间中断时，旧日志可据此被证明已合并
+            atomic_write_json(self.lineage_path, {"digest": self._snapshot_digest, "previous": previous})
+        except Exception as e:
+            logger.error(f"账本谱系写入失败: {e}")
+        self._reset_journal()
 
-    def get_position(self, code):
-        if code not in self.portfolio:
-            return {'shares': 0, 'cost': 0.0, 'held_days': 0}
-        pos = self.portfolio[code]
+    def _reset_journal(self):
+        """以当前 portfolio.json 为基准，原子地换上一份空日志"""
+        try:
+            base = {"op": "base", "digest": self._file_digest(self.filepath), "ts": datetime.now().isoformat(timespec='seconds')}
+            tmp = self.journal_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(base) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_path)
+            self.journal_count = 0
+        except Exception as e:
+            logger.error(f"账本日志重置失败: {e}")
+
+    def compact(self):
+        """日志合并为快照 (portfolio.json 对外导出即为最新状态)"""
+        with self._locked(), self._io_lock:
+            self._compact_due = False
+            if self.journal_count == 0 or self._batch is not None: return
+            self._save_portfolio()
+        logger.info(f"🧾 账本已合并为快照: {self.filepath}")
+
+    @staticmethod
+    def _position_view(pos):
         # 双重保险
-        return {
+        return MappingProxyType({
             'shares': pos.get('shares', 0),
             'cost': pos.get('cost', 0.0),
             'held_days': pos.get('held_days', 0)
-        }
+        })
+
+    def get_position(self, code):
+        """只读持仓快照 (MappingProxyType)，之后的成交不会改变已取得的快照"""
+        with self._locked(code):
+            return self._position_view(self.portfolio.get(code, {}))
+
+    def positions_snapshot(self):
+        """全部持仓的一致性只读快照 {code: 只读持仓}"""
+        with self._locked():
+            return MappingProxyType({code: self._position_view(pos) for code, pos in self.portfolio.items()})
 
-    def add_trade(self, code, name, amount_or_value, price, is_sell=False):
+    def add_trade(self, code, name, amount_or_value, price, is_sell=False, trade_id=None):
+        """trade_id: 可选的幂等标识 (断点续跑时用于核对是否已记账)"""
         if price <= 0: return
+        rec = {"op": "trade", "code": code, "name": name, "amount": amount_or_value, "price": price,
+               "is_sell": bool(is_sell), "date": datetime.now().strftime("%Y-%m-%d")}
+        if trade_id: rec['tid'] = trade_id
+        rec['hid'] = trade_id or f"{rec['date']}:{code}:{uuid.uuid4().hex[:8]}"
+        with self._locked(code):
+            row = self._apply_trade(rec)
+            cost = self.portfolio[code].get('cost', 0)
+            with self._io_lock:
+                batched = self._batch is not None
+                if batched:
+                    self._batch['rows'].append(row)
+                    self._batch['records'] += 1
+                else:
+                    self._append_journal(rec)
+        if not batched:
+            self.history.append([row])
+        if self._compact_due: self.compact()
+        logger.info(f"⚖️ 账本更新 {name}: {'卖出' if is_sell else '买入'} | 最新成本: {cost:.3f}")
 
+    def _apply_trade(self, rec):
+        """
+        把一条成交记录作用到内存持仓 (新成交与日志重放共用)
+        Returns: 成交历史行 (trade_history.COLUMNS)；旧日志记录无 hid 时返回 None
+        """
+        code, name, amount_or_value, price, is_sell = rec['code'], rec['name'], rec['amount'], rec['price'], rec['is_sell']
         if code not in self.portfolio:
             self.portfolio[code] = {
                 "name": name,
@@ -81,17 +345,21 @@ class PortfolioTracker:
         if 'history' not in pos: pos['history'] = []
 
         shares_change = amount_or_value / price
+        shares_before, cost_before = pos['shares'], pos['cost']
+        realized = 0.0
         
         record = {
-            "date": datetime.now().strftime("%Y-%m-%d"),
+            "date": rec['date'],
             "price": round(price, 3),
             "s": "S" if is_sell else "B"
         }
+        if rec.get('tid'): record['tid'] = rec['tid']
 
         if is_sell:
             real_sell_shares = min(pos['shares'], shares_change)
             pos['shares'] = max(0, pos['shares'] - real_sell_shares)
             record['amt'] = -int(real_sell_shares * price)
+            realized = real_sell_shares * (price - cost_before)
             
             if pos['shares'] == 0:
                 pos['cost'] = 0.0 
@@ -114,20 +382,92 @@ class PortfolioTracker:
         if len(pos['history']) > 10:
             pos['history'] = pos['history'][-10:]
 
-        self._save_portfolio()
-        logger.info(f"⚖️ 账本更新 {name}: {'卖出' if is_sell else '买入'} | 最新成本: {pos.get('cost',0):.3f}")
+        if not rec.get('hid'): return None
+        return {
+            "trade_id": rec['hid'], "date": rec['date'], "code": code, "name": name, "side": record['s'],
+            "price": price, "amount": round((pos['shares'] - shares_before) * price, 2),
+            "shares": pos['shares'] - shares_before,
+            "shares_before": shares_before, "cost_before": cost_before,
+            "shares_after": pos['shares'], "cost_after": pos['cost'],
+            "realized_pnl": round(realized, 2), "source": "live"
+        }
+
+    def valuation(self, strategy_map=None, price_dir='data_cache'):
+        """[V19.10] 组合盯市视图：净值/暴露/回撤/贡献 (见 portfolio_nav.py)"""
+        cache_path = os.path.join(os.path.dirname(self.filepath), 'nav_cache.json')
+        return PortfolioNav(self.history, strategy_map, price_dir=price_dir, cache_path=cache_path)
 
     def record_signal(self, code, signal):
         pass 
 
+    def has_trade(self, code, trade_id):
+        """账本中是否已存在该 trade_id 的成交"""
+        with self._locked(code):
+            history = self.portfolio.get(code, {}).get('history', [])
+            if any(r.get('tid') == trade_id for r in history): return True
+            with self._io_lock:
+                if self._batch is not None and any(r['trade_id'] == trade_id for r in self._batch['rows']): return True
+        return self.history.contains(trade_id)
+
     def get_signal_history(self, code):
-        if code in self.portfolio:
-            return self.portfolio[code].get('history', [])
+        with self._locked(code):
+            if code in self.portfolio:
+                return [dict(r) for r in self.portfolio[code].get('history', [])]
         return []
         
     def confirm_trades(self):
+        with self._locked():
+            self._apply_roll()
+            with self._io_lock:
+                if self._batch is not None:
+                    self._batch['records'] += 1
+                else:
+                    self._append_journal({"op": "roll", "date": datetime.now().strftime("%Y-%m-%d")})
+        if self._compact_due: self.compact()
+
+    # --- 批量写回 ---
+    def begin_batch(self):
+        with self._locked(), self._io_lock:
+            if self._batch is not None: return
+            self._batch = {"portfolio": copy.deepcopy(self.portfolio), "rows": [], "records": 0}
+
+    def commit(self):
+        """
+        批次内全部变更一次落盘：先原子替换快照，成功后再追加成交历史
+        快照写入失败时异常向上抛出、批次保留 (可再次 commit 重试，或 rollback)；
+        不能先写历史：否则 has_trade 经 trade_history 判定已记账，断点续跑不会补记，成交被静默丢失
+        """
+        with self._locked(), self._io_lock:
+            if self._batch is None: return
+            batch = self._batch
+            if batch['records']:
+                self._save_portfolio(strict=True)
+            self._batch = None
+            self.history.append(batch['rows'])
+        if batch['records']:
+            logger.info(f"💾 账本批量提交: {batch['records']} 条变更，单次原子落盘")
+
+    def rollback(self):
+        with self._locked(), self._io_lock:
+            if self._batch is None: return
+            self.portfolio = self._batch['portfolio']
+            dropped = self._batch['records']
+            self._batch = None
+        logger.warning(f"↩️ 账本批次回滚: 丢弃 {dropped} 条未提交变更")
+
+    @contextmanager
+    def batch(self):
+        """with tracker.batch(): ... 正常退出提交，异常 (含 KeyboardInterrupt) 回滚"""
+        self.begin_batch()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def _apply_roll(self):
         # [V14.12 修复] 使用 .get() 安全访问
         for code, pos in self.portfolio.items():
             if pos.get('shares', 0) > 0:
                 pos['held_days'] = pos.get('held_days', 0) + 1
-        self._save_portfolio()
@@ -0,0 +1,153 @@
+"""
+profiler.py | 按需性能剖析 (cProfile + 采样栈 + tracemalloc)
+
+启用方式 (二选一)，关闭时 main() 不加载本模块、零开销:
+    FUND_PROFILE=1 python main.py          # cProfile + 采样 + tracemalloc
+    FUND_PROFILE=cprofile python main.py   # 仅 cProfile + tracemalloc (不启动采样线程)
+    python main.py --profile
+
+输出 (run_stats/profile/):
+    cprofile.pstats        - 可用 snakeviz / pstats 打开
+    collapsed_stacks.txt   - 折叠栈格式，可直接喂给 flamegraph.pl / speedscope
+    profile_summary.txt    - Top-N 热点函数 + 每个标的的内存分配 Top-N 差异 (可作为邮件附件)
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+
+from utils import logger
+
+PROFILE_ENV = "FUND_PROFILE"
+
+
+def profiling_requested(argv=None):
+    argv = sys.argv if argv is None else argv
+    return "--profile" in argv or os.getenv(PROFILE_ENV, "").lower() in ("1", "true", "yes", "cprofile", "sample")
+
+
+class StackSampler:
+    """后台线程定时抓取所有线程的调用栈，输出折叠栈计数"""
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="StackSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join(timeout=1)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.is_set():
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == own_id: continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(tid, f"thread-{tid}"))
+                self.counts[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.counts.most_common()) + "\n"
+
+
+class ProfileSession:
+    def __init__(self, out_dir="run_stats/profile", sample=True, interval=0.005, top_n=25):
+        self.out_dir = out_dir
+        self.top_n = top_n
+        self.sampler = StackSampler(interval) if sample else None
+        self.profile = cProfile.Profile()
+        self.fund_stats = []          # 各工作线程的 cProfile 结果 (cProfile 只覆盖调用线程)
+        self.alloc_diffs = {}         # fund_code -> [tracemalloc 差异行]
+        self.lock = threading.Lock()
+        self.summary_path = None
+        self._baseline = None
+        self._finished = False
+
+    @classmethod
+    def from_env(cls):
+        return cls(sample=os.getenv(PROFILE_ENV, "1").lower() != "cprofile")
+
+    def start(self):
+        tracemalloc.start(25)
+        self._baseline = tracemalloc.take_snapshot()
+        if self.sampler: self.sampler.start()
+        self.profile.enable()
+        logger.info(f"🔬 [Profiler] 剖析模式已开启 (采样: {'开' if self.sampler else '关'})")
+
+    def wrap_fund(self, func):
+        """包装 process_single_fund：工作线程内单独 cProfile + 前后 tracemalloc 快照"""
+        @wraps(func)
+        def wrapper(fund, *args, **kwargs):
+            before = tracemalloc.take_snapshot()
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                prof = None   # Python 3.12+ 同一时刻只允许一个 profiler
+            try:
+                return func(fund, *args, **kwargs)
+            finally:
+                if prof: prof.disable()
+                after = tracemalloc.take_snapshot()
+                diff = after.compare_to(before, "lineno")[:self.top_n]
+                with self.lock:
+                    if prof: self.fund_stats.append(prof)
+                    self.alloc_diffs[fund.get('code', '?')] = [str(d) for d in diff]
+        return wrapper
+
+    def finish(self):
+        """停止剖析并写出报告，返回 profile_summary.txt 路径 (可重复调用)"""
+        if self._finished: return self.summary_path
+        self._finished = True
+        self.profile.disable()
+        if self.sampler: self.sampler.stop()
+        final = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            stats = pstats.Stats(self.profile)
+            for prof in self.fund_stats:
+                stats.add(prof)
+            stats.dump_stats(os.path.join(self.out_dir, "cprofile.pstats"))
+
+            buf = io.StringIO()
+            stats.stream = buf
+            stats.sort_stats("cumulative").print_stats(self.top_n)
+
+            lines = ["=== cProfile Top-%d (cumulative) ===" % self.top_n, buf.getvalue()]
+            lines.append(f"=== tracemalloc: 峰值 {peak / 1048576:.1f}MB | 全程分配 Top-{self.top_n} ===")
+            lines += [str(d) for d in final.compare_to(self._baseline, "lineno")[:self.top_n]]
+            for code, diff in self.alloc_diffs.items():
+                lines.append(f"\n--- {code} 分配差异 Top-{self.top_n} ---")
+                lines += diff
+
+            if self.sampler:
+                with open(os.path.join(self.out_dir, "collapsed_stacks.txt"), "w", encoding="utf-8") as f:
+                    f.write(self.sampler.collapsed())
+
+            self.summary_path = os.path.join(self.out_dir, "profile_summary.txt")
+            with open(self.summary_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines))
+            logger.info(f"🔬 [Profiler] 报告已写入 {self.out_dir}")
+        except Exception as e:
+            logger.error(f"剖析报告写出失败: {e}")
+        return self.summary_path
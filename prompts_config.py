@@ -42,21 +42,15 @@ QUANT_THRESHOLDS = {
 }
 
 # ============================================
-# 战术层投委会 (IC) Prompt 模板 - v3.2 生产版
+# 战术层投委会 (IC) Prompt 模板 - v3.3 前缀缓存版
 # ============================================
+# [v3.3] 按 "静态系统前缀 -> 当日共享舆情 -> 单标的后缀" 三段式组装，
+# 25 次调用共享同一前缀，服务端 Prompt Cache 可复用前两段，降低首 token 延迟与成本。
+# 注意：静态前缀不经过 .format()，JSON 花括号无需转义；任何改动都会使全部缓存失效。
 
-TACTICAL_IC_PROMPT = """
+TACTICAL_IC_SYSTEM_PROMPT = """
 【系统架构】鹊知风投委会 (IC) | 趋势精准判断协议 v3.2
 
-【标的信息】
-标的: {fund_name} (属性: {strategy_type})
-趋势强度: {trend_score}/100 | 熔断状态: Level{fuse_level} | 硬约束: {fuse_msg}
-技术指标: RSI={rsi} | MACD={macd_trend} | 量价状态: {volume_status}
-多周期状态: 5日线={ma5_status} | 20日线={ma20_status} | 60日线={ma60_status}
-
-【实时舆情 (权重预筛选)】
-{news_content}
-
 【核心趋势判定算法 - 强制逻辑 v3.2】
 
 1. 🔍 多周期趋势对齐 (Multi-Timeframe Alignment):
@@ -157,31 +151,31 @@ Step 5: 若趋势阶段为"衰竭"或"反转"，强制输出"HOLD"或"REJECT"，
 【输出格式 - 严格JSON v3.2】
 (注意：本回复严禁包含任何URL链接；)
 
-{{
-    "trend_analysis": {{
+{
+    "trend_analysis": {
         "direction": "UP|DOWN|RANGE|UNCLEAR",
         "stage": "START|ACCELERATING|EXHAUSTION|REVERSAL",
         "confidence": "HIGH|MEDIUM|LOW",
         "ma_alignment": "BULLISH|BEARISH|MIXED",
-        "key_levels": {{
+        "key_levels": {
             "support_1": "第一支撑位",
             "support_2": "第二支撑位", 
             "resistance_1": "第一阻力位",
             "stop_loss": "止损位",
             "invalidation": "趋势失效位(跌破即认错)"
-        }},
-        "divergence": {{
+        },
+        "divergence": {
             "type": "NONE|BEARISH_TOP|BULLISH_BOTTOM",
             "severity": "LOW|MEDIUM|HIGH",
             "triggered": false
-        }},
-        "expectation_gap": {{
+        },
+        "expectation_gap": {
             "type": "NONE|BULLISH_UNFULFILLED|BEARISH_UNFULFILLED",
             "description": "具体描述"
-        }},
+        },
         "volume_status": "CONFIRMED|WARNING|INVALID"
-    }},
-    "cro_audit": {{
+    },
+    "cro_audit": {
         "max_drawdown_scenario": "最坏情景描述",
         "drawdown_estimate": "-X%",
         "bias_rate": "乖离率%",
@@ -189,34 +183,51 @@ Step 5: 若趋势阶段为"衰竭"或"反转"，强制输出"HOLD"或"REJECT"，
         "liquidity_stress": "PASS|WARNING|FAIL",
         "divergence_veto": false,
         "hedge_proposal": "若同意交易，需配置的对冲工具及成本"
-    }},
-    "cgo_proposal": {{
+    },
+    "cgo_proposal": {
         "catalyst": "核心催化剂(48小时内)",
         "catalyst_strength": "STRONG|MEDIUM|WEAK",
         "stage_assessment": "趋势阶段判断依据",
         "expectation_analysis": "预期差验证结果",
         "price_in_status": "REFLECTED|PARTIAL|UNREFLECTED"
-    }},
+    },
     "debate_summary": "三方辩论核心分歧点(如有)",
     "chairman_conclusion": "CIO最终裁决：基于趋势阶段、背离状态、预期差的综合判断",
     "decision": "EXECUTE|REJECT|HOLD",
     "adjustment": -100到100的整数,
     "position_size": "建议仓位百分比(如25%)",
     "execution_notes": "具体入场条件、止损执行方式"
-}}
+}
+"""
+
+# 当日共享上下文 (同一次运行内所有标的一致)
+TACTICAL_IC_CONTEXT_PROMPT = """
+【实时舆情 (权重预筛选)】
+{news_content}
+"""
+
+# 单标的后缀 (每次调用唯一，放在最后)
+TACTICAL_IC_FUND_PROMPT = """
+【标的信息】
+标的: {fund_name} (属性: {strategy_type})
+趋势强度: {trend_score}/100 | 熔断状态: Level{fuse_level} | 硬约束: {fuse_msg}
+技术指标: RSI={rsi} | MACD={macd_trend} | 量价状态: {volume_status}
+多周期状态: 5日线={ma5_status} | 20日线={ma20_status} | 60日线={ma60_status}
+{tech_context}
+请严格按照系统协议对该标的进行趋势辩论，并输出严格JSON。
 """
 
 # ============================================
 # 战略层 CIO 复盘 Prompt - v3.2 趋势一致性审计
 # ============================================
 
-STRATEGIC_CIO_REPORT_PROMPT = """
+# [v3.3] 与战术层相同的三段式：静态系统前缀 (不经 .format()) -> 当日共享输入 (CIO 与 Red Team 一致) -> 交易决策
+STRATEGIC_CIO_SYSTEM_PROMPT = """
 【系统角色】鹊知风 CIO (Chief Investment Officer) | 趋势一致性审计 v3.2
-日期: {current_date}
 
 【输入数据】
-1. 宏观趋势环境: {macro_str}
-2. 全市场交易决策: {report_text}
+1. 宏观趋势环境: 见 "宏观趋势环境" 段
+2. 全市场交易决策: 见 "全市场交易决策" 段
 
 【战略任务 - 趋势一致性审计 v3.2】
 
@@ -265,12 +276,11 @@ STRATEGIC_CIO_REPORT_PROMPT = """
 # 审计层 Red Team Prompt - v3.2 趋势逻辑黑客
 # ============================================
 
-RED_TEAM_AUDIT_PROMPT = """
+RED_TEAM_SYSTEM_PROMPT = """
 【系统角色】鹊知风 Red Team | 趋势逻辑黑客 (Trend Logic Hacker) v3.2
-日期: {current_date}
 
 【输入数据】
-宏观趋势: {macro_str} | 交易决策: {report_text}
+宏观趋势: 见 "宏观趋势环境" 段 | 交易决策: 见 "全市场交易决策" 段
 
 【审计任务 - 趋势判断漏洞挖掘 v3.2】
 
@@ -307,7 +317,7 @@ Q7: 流动性-趋势错配审计
     - 趋势策略是否考虑了变现能力？(特别是小盘ETF)
 
 【关键漏洞输出格式】
-{{
+{
     "vulnerability_type": "趋势阶段误判/背离忽视/预期差失败/多周期矛盾/...",
     "severity": "CRITICAL|HIGH|MEDIUM|LOW",
     "description": "具体漏洞描述",
@@ -315,7 +325,7 @@ Q7: 流动性-趋势错配审计
     "impact": "对组合的具体潜在影响",
     "recommendation": "修正建议",
     "prevention": "如何防止再次发生"
-}}
+}
 
 【输出】HTML格式审计报告，必须包含:
 - 发现的趋势判断漏洞清单(按严重性排序)
@@ -324,6 +334,20 @@ Q7: 流动性-趋势错配审计
 - 系统改进建议(针对重复出现的漏洞类型)
 """
 
+# 战略层当日共享输入 (CIO 复盘与 Red Team 审计同一次运行内一致)
+STRATEGIC_CONTEXT_PROMPT = """
+日期: {current_date}
+【宏观趋势环境】
+{macro_str}
+"""
+
+# 战略层后缀：全市场交易决策 (放在最后)
+STRATEGIC_REPORT_PROMPT = """
+【全市场交易决策】
+{report_text}
+请严格按照系统协议完成审计，输出HTML。
+"""
+
 # ============================================
 # 后处理校验配置 (用于代码层强制执行)
 # ============================================
@@ -0,0 +1,139 @@
+"""
+replay.py | 决策回放：从 snapshots/ 快照重跑仓位计算与报告渲染 (无网络、无 LLM)
+
+用法:
+    python replay.py                                   # 回放最近一次快照，核对决策可复现
+    python replay.py --date 2026-10-19 --set score_up=65 --set val_brake=0.6
+    python replay.py --base-amt 2000 --html replay.html  # what-if 资金参数 + 输出报告
+    python replay.py --list-params                     # 查看可覆盖的仓位参数
+
+输出每个标的 "原决策 -> 回放决策" 的对比，只列出发生变化的标的 (--all 列出全部)。
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import sys
+import time
+
+import yaml
+
+from main import calculate_position_v13, SIZING_PARAMS
+from snapshot import RunSnapshot
+from ui_renderer import render_html_report_v19
+
+
+def find_snapshot(date=None, directory="snapshots"):
+    if date:
+        return os.path.join(directory, f"run_{date}.json.gz")
+    files = sorted(glob.glob(os.path.join(directory, "run_*.json.gz")))
+    return files[-1] if files else None
+
+
+def parse_overrides(pairs):
+    """['score_up=65', ...] -> {'score_up': 65}；未知参数直接报错，避免拼写错误静默失效"""
+    params = {}
+    for pair in pairs or []:
+        key, sep, raw = pair.partition("=")
+        key = key.strip()
+        if not sep or key not in SIZING_PARAMS:
+            raise ValueError(f"未知仓位参数: {pair} (可选: {', '.join(SIZING_PARAMS)})")
+        params[key] = yaml.safe_load(raw)
+    return params
+
+
+def replay_snapshot(snap, params=None, base_amt=None, max_daily=None):
+    """
+    按快照输入重跑 calculate_position_v13
+    Returns: (results, diffs) - results 结构与 main.process_single_fund 一致，可直接渲染
+    """
+    results, diffs = [], []
+    for rec in snap.get("funds", []):
+        tech = copy.deepcopy(rec["tech"])
+        ai_res = rec.get("ai_res") or {}
+        amt, lbl, is_sell, s_val = calculate_position_v13(
+            tech, ai_res.get("adjustment", 0), ai_res.get("decision", "PASS"),
+            rec["val_mult"], rec["val_desc"],
+            rec["base_amt"] if base_amt is None else base_amt,
+            rec["max_daily"] if max_daily is None else max_daily,
+            rec["pos"], rec.get("strategy_type"), rec["name"], params
+        )
+        if ai_res.get("ai_gated"): tech.setdefault("quant_reasons", []).append("闸门:免AI")
+        results.append({
+            "name": rec["name"], "code": rec["code"], "index_name": rec.get("index_name"),
+            "amount": amt, "sell_value": s_val, "is_sell": is_sell,
+            "tech": tech, "ai_analysis": ai_res
+        })
+
+        old = rec.get("decision", {})
+        new = {"amount": amt, "label": lbl, "is_sell": is_sell, "sell_value": s_val}
+        changed = (old.get("label") != lbl or old.get("amount") != amt
+                   or abs(float(old.get("sell_value") or 0) - float(s_val or 0)) > 0.01)
+        diffs.append({"code": rec["code"], "name": rec["name"], "score": tech.get("final_score"),
+                      "reasons": tech.get("quant_reasons", []), "old": old, "new": new, "changed": changed})
+    results.sort(key=lambda x: -x["tech"].get("final_score", 0))
+    return results, diffs
+
+
+def _fmt_decision(d):
+    if not d: return "-"
+    if d.get("is_sell"): return f"{d.get('label')} ¥{float(d.get('sell_value') or 0):,.0f}"
+    if d.get("amount"): return f"{d.get('label')} ¥{d.get('amount'):,}"
+    return d.get("label", "-")
+
+
+def print_diffs(diffs, show_all=False):
+    changed = [d for d in diffs if d["changed"]]
+    for d in (diffs if show_all else changed):
+        flag = "🔁" if d["changed"] else "  "
+        print(f"{flag} {d['code']} {d['name']:<12} 分:{d['score']:<3} {_fmt_decision(d['old'])} -> {_fmt_decision(d['new'])}  [{' '.join(d['reasons'])}]")
+    print(f"📊 共 {len(diffs)} 个标的，决策变化 {len(changed)} 个")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从快照回放仓位计算与报告渲染")
+    parser.add_argument("snapshot", nargs="?", help="快照路径 (默认 snapshots/ 下最新一份)")
+    parser.add_argument("--date", help="按日期选择快照 YYYY-MM-DD")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="覆盖仓位参数，可重复")
+    parser.add_argument("--base-amt", type=float, help="覆盖单笔基准金额")
+    parser.add_argument("--max-daily", type=float, help="覆盖单日上限")
+    parser.add_argument("--html", help="回放报告输出路径")
+    parser.add_argument("--json", help="对比结果输出路径")
+    parser.add_argument("--all", action="store_true", help="列出全部标的 (默认只列变化)")
+    parser.add_argument("--list-params", action="store_true")
+    args = parser.parse_args()
+
+    if args.list_params:
+        for k, v in SIZING_PARAMS.items(): print(f"{k} = {v}")
+        sys.exit(0)
+
+    path = args.snapshot or find_snapshot(args.date)
+    if not path or not os.path.exists(path):
+        print(f"❌ 找不到快照: {path or 'snapshots/'}")
+        sys.exit(1)
+    try:
+        overrides = parse_overrides(args.set)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    snap = RunSnapshot.load(path)
+    t0 = time.perf_counter()
+    results, diffs = replay_snapshot(snap, overrides, args.base_amt, args.max_daily)
+    t_sizing = time.perf_counter() - t0
+    html = render_html_report_v19(snap.get("news", []), results, snap.get("reviews", {}).get("cio", ""), snap.get("reviews", {}).get("advisor", "")) if args.html else None
+    elapsed = time.perf_counter() - t0
+
+    print(f"🎞️ 回放 {path} | 覆盖参数: {overrides or '无'}")
+    print_diffs(diffs, args.all)
+    print(f"⏱️ 仓位计算 {t_sizing * 1000:.1f}ms | 含渲染合计 {elapsed * 1000:.1f}ms")
+
+    if html:
+        with open(args.html, "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"📝 报告已写入 {args.html}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"snapshot": path, "overrides": overrides, "diffs": diffs}, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,43 @@
+"""
+rolling_valuation.py | 全历史滚动估值分位 (全部标的一次计算)
+
+get_valuation_status 只算当天: 取最近 window 根收盘价的 min/max 定位。逐日朴素重算整段历史为 O(n·w)，
+回测 / 图表需要整条序列时改用本模块:
+    minmax: (close - 窗口最低) / (窗口最高 - 窗口最低)，与实盘同口径。
+            pandas rolling min/max 即单调双端队列 (ascending minima) 算法，每个元素只进出队列一次，O(n)
+    rank:   窗口内真实分位名次 (rank pct)，不受单个极端高/低点拉伸区间的影响。
+            pandas rolling rank 维护有序跳表，窗口滑动时增量插入/删除，O(n log w)
+输入为 Series (单个标的) 或 DataFrame (日期 × 标的)，列之间互不影响；缺失值 (未上市/停牌) 跳过。
+历史不足 min_len 根有效收盘价的日期返回 NaN，由 ValuationEngine 视为 "数据不足"。
+
+    pct = rolling_position(closes, method="rank")       # closes: 日期 × 标的
+    mult = ValuationEngine.multiplier_from_percentile(pct.values)
+"""
+import numpy as np
+
+METHODS = ("minmax", "rank")
+
+
+def rolling_position(closes, window=1250, min_len=120, method="minmax"):
+    """逐日估值分位 [0, 1]，形状与输入相同"""
+    if method not in METHODS:
+        raise ValueError(f"未知估值分位算法: {method} (可选: {', '.join(METHODS)})")
+    closes = closes.astype(float)
+    if method == "rank":
+        pct = closes.rolling(window, min_periods=1).rank(pct=True)
+    else:
+        low = closes.rolling(window, min_periods=1).min()
+        high = closes.rolling(window, min_periods=1).max()
+        pct = ((closes - low) / (high - low)).where(high > low, 0.5)
+    # 有效历史不足 / 当日无行情 -> NaN
+    return pct.where((closes.notna().cumsum() >= min_len) & closes.notna(), np.nan)
+
+
+def window_position(window_data, method="minmax"):
+    """单日版本：window_data 为截至当日的最近 window 根收盘价，返回当日分位"""
+    if method not in METHODS:
+        raise ValueError(f"未知估值分位算法: {method} (可选: {', '.join(METHODS)})")
+    if method == "rank":
+        return float(window_data.rank(pct=True).iloc[-1])
+    current, low, high = window_data.iloc[-1], window_data.min(), window_data.max()
+    return 0.5 if high <= low else float((current - low) / (high - low))
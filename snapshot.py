@@ -0,0 +1,65 @@
+import copy
+import gzip
+import json
+import os
+import threading
+from utils import logger, atomic_write_json
+
+SNAPSHOT_VERSION = 1
+
+class RunSnapshot:
+    """
+    [V19.7] 决策输入快照 (snapshots/run_YYYY-MM-DD.json.gz)
+
+    记录每个标的进入仓位计算前的全部输入：技术面 tech (计算前的副本)、AI 结果、
+    估值 (val_mult, val_desc)、持仓快照与资金参数，以及当日新闻列表与复盘 HTML。
+    replay.py 据此只重跑 calculate_position_v13 + render_html_report_v19，
+    无网络、无 LLM，毫秒级完成，用于调参 what-if 与报告样式迭代。
+    """
+    def __init__(self, run_date, directory='snapshots'):
+        self.run_date = run_date
+        self.path = os.path.join(directory, f"run_{run_date}.json.gz")
+        self.lock = threading.Lock()
+        self.state = {"version": SNAPSHOT_VERSION, "run_date": run_date, "news": [], "reviews": {}, "funds": []}
+
+    @staticmethod
+    def fund_inputs(fund, tech, ai_res, val_mult, val_desc, pos, base_amt, max_daily):
+        """在 calculate_position_v13 之前调用 (它会就地改写 tech)"""
+        return {
+            "code": fund['code'], "name": fund['name'], "index_name": fund.get('index_name'),
+            "strategy_type": fund.get('strategy_type'),
+            "tech": copy.deepcopy(tech), "ai_res": copy.deepcopy(ai_res),
+            "val_mult": val_mult, "val_desc": val_desc, "pos": dict(pos),
+            "base_amt": base_amt, "max_daily": max_daily
+        }
+
+    @staticmethod
+    def fund_record(inputs, amount, label, is_sell, sell_value):
+        """输入 + 原始运行的决策结果，供 replay 对比"""
+        return {**inputs, "decision": {"amount": amount, "label": label, "is_sell": is_sell, "sell_value": sell_value}}
+
+    def add_fund(self, record):
+        with self.lock:
+            self.state['funds'] = [f for f in self.state['funds'] if f['code'] != record['code']]
+            self.state['funds'].append(record)
+
+    def set_news(self, news):
+        self.state['news'] = list(news)
+
+    def set_reviews(self, cio_html, advisor_html):
+        self.state['reviews'] = {"cio": cio_html, "advisor": advisor_html}
+
+    def save(self):
+        try:
+            with self.lock:
+                atomic_write_json(self.path, self.state)
+            logger.info(f"📸 [快照] 已保存 {self.path} ({len(self.state['funds'])} 个标的)")
+        except Exception as e:
+            logger.error(f"快照写入失败: {e}")
+        return self.path
+
+    @staticmethod
+    def load(path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
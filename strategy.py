@@ -1,3 +1,5 @@
+from keyword_matcher import matcher_for
+
 class StrategyEngine:
     def __init__(self, config):
         self.cfg = config
@@ -17,9 +19,10 @@ class StrategyEngine:
         # --- 风口捕捉 (Opportunity Hunter) ---
         # 检查该基金所属板块，是否在今日全市场主力流入 Top5 中
         sector_hot = False
+        # sector_keyword 为空格分隔的关键词组，任一关键词出现在板块名中即命中 (匹配器按关键词组缓存)
+        sector_matcher = matcher_for(fund_info['sector_keyword'])
         for top_sec in market_ctx['top_sectors']:
-            # 简单的关键词匹配，比如 "白酒" in "食品饮料"
-            if fund_info['sector_keyword'] in top_sec:
+            if sector_matcher.contains_any(top_sec):
                 sector_hot = True
                 break
         
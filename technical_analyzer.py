@@ -3,11 +3,6 @@ import numpy as np
 from datetime import datetime, time as dt_time
 from utils import logger, get_beijing_time
 
-from ta.momentum import RSIIndicator
-from ta.trend import MACD, EMAIndicator, SMAIndicator, ADXIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
-from ta.volume import OnBalanceVolumeIndicator, VolumeWeightedAveragePrice
-
 class TechnicalAnalyzer:
     """
     技术分析器 - V17.0 完整版
@@ -40,6 +35,12 @@ class TechnicalAnalyzer:
         if df is None or df.empty or len(df) < 60:  # 需要更多数据计算长期均线
             return self._get_safe_default_indicators("K线数据不足(<60)")
 
+        # ta 延迟到首次计算时加载，回放/单测等不算指标的入口无需承担导入开销
+        from ta.momentum import RSIIndicator
+        from ta.trend import MACD, EMAIndicator, SMAIndicator, ADXIndicator
+        from ta.volatility import BollingerBands, AverageTrueRange
+        from ta.volume import OnBalanceVolumeIndicator, VolumeWeightedAveragePrice
+
         try:
             # 数据预处理
             df = self._preprocess_data(df)
@@ -242,6 +243,133 @@ class TechnicalAnalyzer:
             logger.error(f"❌ 指标计算失败: {e}", exc_info=True)
             return self._get_safe_default_indicators(f"计算异常: {str(e)[:30]}")
 
+    def score_series(self, df):
+        """
+        [V19.13] 全历史向量化版本：逐日重现 calculate_indicators 的 quant_score / CRO 信号
+        每个交易日的值只依赖当日及之前的 K 线，等价于每天截断历史调用一次 calculate_indicators
+        (含其对 rsi / hist / vol_ratio / adx 的四舍五入口径)，供 backtester 一次性计算整段历史。
+        前 59 根 K 线对应实盘的 "K线数据不足(<60)"，quant_score=0 且 VETO。
+
+        Returns: DataFrame(index=日期) 列: close, quant_score, cro_signal, veto, rsi, adx, ma_alignment
+        """
+        comp = self.score_components(df)
+        out = self.combine_scores(comp, self.params['adx_trend_threshold'])
+        return pd.DataFrame({
+            'close': comp['close'], 'quant_score': out['score'], 'cro_signal': out['cro'], 'veto': out['veto'],
+            'rsi': comp['rsi'], 'adx': comp['adx'].round(2), 'ma_alignment': comp['ma_alignment']
+        }, index=comp.index)
+
+    @staticmethod
+    def combine_scores(comp, adx_trend_threshold=25):
+        """
+        由 score_components 合成评分与 CRO 信号；comp 可为 DataFrame 或同名数组字典
+        只有趋势强度一项依赖 adx_trend_threshold，调参时无需重算指标
+        Returns: {'score': int 数组, 'veto': bool 数组, 'cro': 信号数组}
+        """
+        adx = np.asarray(comp['adx'], dtype=float)
+        trend_dir = np.asarray(comp['trend_dir'])
+        is_trending = adx > adx_trend_threshold
+        trend_bear = is_trending & (trend_dir < 0)
+        score = np.asarray(comp['base_score'], dtype=float) + np.where(is_trending, 10 * trend_dir, 0)
+        score = np.clip(score, 0, 100)
+
+        warmup = np.asarray(comp['warmup'], dtype=bool)
+        veto = np.asarray(comp['veto'], dtype=bool) | warmup
+        warn = trend_bear | np.asarray(comp['warn'], dtype=bool)
+        caution = np.asarray(comp['caution'], dtype=bool)
+        cro = np.select([veto, warn, caution], ["VETO", "WARN", "CAUTION"], "PASS")
+        score[warmup] = 0
+        return {'score': score.astype(int), 'veto': veto, 'cro': cro}
+
+    def score_components(self, df):
+        """
+        score_series 的指标部分：除趋势强度外的评分之和 (未截断) 与各信号分量
+        Returns: DataFrame(index=日期) 列: close, base_score, trend_dir(+1多/-1空/0震荡), adx, rsi,
+                 veto, warn, caution, warmup, ma_alignment
+        """
+        from numpy.lib.stride_tricks import sliding_window_view
+        from ta.momentum import RSIIndicator
+        from ta.trend import MACD, EMAIndicator, SMAIndicator, ADXIndicator
+        from ta.volume import VolumeWeightedAveragePrice
+
+        df = self._preprocess_data(df.copy())
+        if df is None or df.empty:
+            return pd.DataFrame(columns=['close', 'base_score', 'trend_dir', 'adx', 'rsi', 'veto', 'warn', 'caution', 'warmup', 'ma_alignment'])
+        df = df.ffill()
+        close, high, low, volume = df['close'], df['high'], df['low'], df['volume']
+
+        # 1. 均线排列 / 关键位置
+        mas = np.column_stack([
+            EMAIndicator(close=close, window=5).ema_indicator(),
+            EMAIndicator(close=close, window=10).ema_indicator(),
+            EMAIndicator(close=close, window=20).ema_indicator(),
+            SMAIndicator(close=close, window=30).sma_indicator(),
+            SMAIndicator(close=close, window=60).sma_indicator(),
+        ])
+        bullish = (mas[:, :-1] > mas[:, 1:]).all(axis=1)
+        bearish = (mas[:, :-1] < mas[:, 1:]).all(axis=1)
+        above_ma20 = close.values > mas[:, 2]
+        above_ma60 = close.values > mas[:, 4]
+
+        # 2. 趋势强度
+        adx_ind = ADXIndicator(high=high, low=low, close=close, window=14)
+        adx = adx_ind.adx().values
+        bull = adx_ind.adx_pos().values > adx_ind.adx_neg().values
+        trend_dir = np.where(adx < 20, 0, np.where(bull, 1, -1))
+
+        # 3. RSI / MACD
+        rsi = RSIIndicator(close=close, window=14).rsi().round(2).values
+        macd_ind = MACD(close=close, window_slow=26, window_fast=12, window_sign=9)
+        macd = macd_ind.macd().values
+        hist = macd_ind.macd_diff().values
+        hist_up = (hist > 0) & (hist > np.roll(hist, 1))
+        hist_pos = np.round(hist, 3) > 0
+
+        # MACD 背离: 20 日窗口内价格/MACD 极值位置不同步 (与 _detect_macd_divergence 相同口径)
+        top_div = np.zeros(len(df), dtype=bool)
+        bottom_div = np.zeros(len(df), dtype=bool)
+        if len(df) >= 20:
+            c_win = sliding_window_view(close.values, 20)
+            m_win = sliding_window_view(np.nan_to_num(macd, nan=-np.inf), 20)
+            m_win_lo = sliding_window_view(np.nan_to_num(macd, nan=np.inf), 20)
+            c_max, m_max = c_win.max(axis=1), m_win.max(axis=1)
+            c_min, m_min = c_win.min(axis=1), m_win_lo.min(axis=1)
+            last_c, last_m = close.values[19:], macd[19:]
+            top = (c_win.argmax(axis=1) != m_win.argmax(axis=1)) & (last_c >= c_max * 0.98) & (last_m < m_max * 0.95)
+            bottom = (c_win.argmin(axis=1) != m_win_lo.argmin(axis=1)) & (last_c <= c_min * 1.02) & (last_m > m_min * 1.05)
+            top_div[19:] = top
+            bottom_div[19:] = bottom & ~top
+
+        # 4. 成交量
+        vwap = VolumeWeightedAveragePrice(high=high, low=low, close=close, volume=volume, window=14).volume_weighted_average_price().values
+        vol_ma5 = volume.rolling(window=5).mean()
+        vol_ratio = (volume / vol_ma5).where(vol_ma5 > 0, 1.0).round(2).values
+        price_change = (close / close.shift(9) - 1).values
+        vol_change = (volume / volume.shift(9) - 1).values
+        pv_up_vol_down = (price_change > 0.05) & (vol_change < -0.20)
+        pv_up_vol_up = (price_change > 0.05) & (vol_change > 0.30)
+
+        # 5. 综合评分 (同 _calculate_comprehensive_score，趋势强度项在 combine_scores 中计入)
+        score = np.full(len(df), 50.0)
+        score += np.where(bullish, 15, np.where(bearish, -15, 0))
+        score += np.where(above_ma20, 10, 0) + np.where(above_ma60, 10, 0)
+        score += np.select([rsi < 20, rsi < 30, rsi > 80, rsi > 70], [15, 10, -15, -10], 0)
+        score += np.where(hist_pos, 10 + np.where(hist_up, 5, 0), -10)
+        score += np.where(top_div, -15, np.where(bottom_div, 15, 0))
+        score += np.select([vol_ratio > 1.5, vol_ratio < 0.5], [10, -10], 0)
+        score += np.where(close.values > vwap, 5, 0)
+        score += np.where(pv_up_vol_down, -10, np.where(pv_up_vol_up, 5, 0))
+
+        # 6. CRO 信号分量 (同 _generate_cro_signal，流动性检查恒为通过；趋势下行的 WARN 依赖阈值，留给 combine_scores)
+        return pd.DataFrame({
+            'close': close.values, 'base_score': score, 'trend_dir': trend_dir, 'adx': adx, 'rsi': rsi,
+            'veto': (rsi > 90) | (rsi < 10) | (top_div & (rsi > 70)),
+            'warn': bearish | pv_up_vol_down,
+            'caution': (np.round(adx, 2) < 20) | ~above_ma20,
+            'warmup': np.arange(len(df)) < 59,
+            'ma_alignment': np.select([bullish, bearish], ["BULLISH", "BEARISH"], "MIXED")
+        }, index=df.index)
+
     # ==================== 辅助方法 ====================
     
     def _preprocess_data(self, df):
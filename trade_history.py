@@ -0,0 +1,188 @@
+"""
+trade_history.py | 全量成交历史 (追加写 CSV + pandas 向量化查询)
+
+portfolio.json 只保留每个标的最近 10 笔成交用于展示；完整历史落在 trade_history.csv，
+与热路径的持仓状态分离。每行记录成交前后的份额与成本，盈亏/换手/持有期均可直接向量化计算。
+
+    store = TradeHistoryStore("trade_history.csv")
+    store.realized_pnl()                       # 各标的已实现盈亏
+    store.unrealized_pnl({"510300": 4.1})      # 按给定价格计算浮动盈亏
+    store.cost_basis("510300")                 # 成本随时间变化
+    store.turnover(freq="MS")                  # 月度换手 (买入额/卖出额)
+    store.holding_periods()                    # 每段 建仓 -> 清仓 的持有天数
+"""
+import csv
+import os
+import threading
+
+import pandas as pd
+
+from utils import logger
+
+COLUMNS = [
+    "trade_id", "date", "code", "name", "side", "price", "amount", "shares",
+    "shares_before", "cost_before", "shares_after", "cost_after", "realized_pnl", "source"
+]
+
+
+class TradeHistoryStore:
+    def __init__(self, path="trade_history.csv"):
+        self.path = path
+        self.lock = threading.Lock()
+        self._df = None
+        self._ids = None
+
+    # --- 写入 ---
+    def append(self, rows):
+        """追加成交行 (dict 列表)，逐批 fsync；已存在的 trade_id 自动跳过"""
+        rows = [r for r in rows if r]
+        if not rows: return 0
+        with self.lock:
+            ids = self._known_ids()
+            rows = [r for r in rows if r["trade_id"] not in ids]
+            if not rows: return 0
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            try:
+                with open(self.path, "a", encoding="utf-8", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+                    if new_file: writer.writeheader()
+                    writer.writerows(rows)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except Exception as e:
+                logger.error(f"成交历史写入失败: {e}")
+                return 0
+            ids.update(r["trade_id"] for r in rows)
+            self._df = None
+        return len(rows)
+
+    def contains(self, trade_id):
+        with self.lock:
+            return trade_id in self._known_ids()
+
+    def _known_ids(self):
+        if self._ids is None:
+            self._ids = set(self._load()["trade_id"]) if os.path.exists(self.path) else set()
+        return self._ids
+
+    # --- 读取 ---
+    def _load(self):
+        if self._df is None:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                df = pd.read_csv(self.path, dtype={"trade_id": str, "code": str, "name": str, "side": str, "source": str})
+                df["date"] = pd.to_datetime(df["date"])
+            else:
+                df = pd.DataFrame(columns=COLUMNS)
+                df["date"] = pd.to_datetime(df["date"])
+            # 追加顺序即成交顺序：同一天多笔成交靠 seq 保序
+            df["seq"] = range(len(df))
+            self._df = df
+        return self._df
+
+    def frame(self, code=None, start=None, end=None):
+        """按 (code, date) 建索引的成交表"""
+        with self.lock:
+            df = self._load()
+        if code is not None: df = df[df["code"] == str(code)]
+        if start is not None: df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None: df = df[df["date"] <= pd.Timestamp(end)]
+        return df.set_index(["code", "date"]).sort_index(kind="stable")
+
+    def is_empty(self):
+        return len(self.frame()) == 0
+
+    # --- 查询 ---
+    def realized_pnl(self, start=None, end=None):
+        """各标的已实现盈亏 = Σ 卖出份额 × (成交价 - 卖出前成本)"""
+        df = self.frame(start=start, end=end)
+        return df["realized_pnl"].groupby(level="code").sum()
+
+    def positions(self):
+        """按成交历史得到的最新持仓 (shares, cost)"""
+        df = self.frame().reset_index().sort_values("seq")
+        last = df.groupby("code").tail(1).set_index("code")
+        return last[["name", "shares_after", "cost_after"]].rename(columns={"shares_after": "shares", "cost_after": "cost"})
+
+    def unrealized_pnl(self, prices):
+        """prices: {code: 最新价} 或 Series；返回 DataFrame(shares, cost, price, market_value, unrealized_pnl)"""
+        pos = self.positions()
+        pos["price"] = pd.Series(prices, dtype=float).reindex(pos.index)
+        pos["market_value"] = pos["shares"] * pos["price"]
+        pos["unrealized_pnl"] = pos["shares"] * (pos["price"] - pos["cost"])
+        return pos[pos["shares"] > 0]
+
+    def cost_basis(self, code):
+        """单个标的成本与份额随时间变化 (同日多笔取最后一笔)"""
+        df = self.frame(code=code).reset_index().sort_values("seq")
+        return df.groupby("date")[["shares_after", "cost_after"]].last()
+
+    def turnover(self, freq="MS", by_code=False):
+        """按周期汇总 买入额 / 卖出额 / 总成交额"""
+        df = self.frame().reset_index()
+        if df.empty: return pd.DataFrame(columns=["buy", "sell", "total"])
+        df["buy"] = df["amount"].where(df["side"] == "B", 0.0)
+        df["sell"] = (-df["amount"]).where(df["side"] == "S", 0.0)
+        keys = [pd.Grouper(key="date", freq=freq)] + (["code"] if by_code else [])
+        out = df.groupby(keys)[["buy", "sell"]].sum()
+        out["total"] = out["buy"] + out["sell"]
+        return out
+
+    def holding_periods(self, as_of=None):
+        """
+        每段持仓 (空仓 -> 建仓 -> 清仓) 的起止日期与天数；未清仓的段以 as_of (默认今天) 截止
+        """
+        df = self.frame().reset_index().sort_values(["code", "seq"])
+        if df.empty: return pd.DataFrame(columns=["code", "start", "end", "days", "open"])
+        opened = (df["shares_before"] <= 1e-9) & (df["shares_after"] > 1e-9)
+        df["episode"] = opened.astype(int).groupby(df["code"]).cumsum()
+        df = df[df["episode"] > 0]
+        grp = df.groupby(["code", "episode"])
+        out = grp.agg(start=("date", "first"), end=("date", "last"), last_shares=("shares_after", "last")).reset_index()
+        out["open"] = out["last_shares"] > 1e-9
+        as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now().normalize()
+        out.loc[out["open"], "end"] = as_of
+        out["days"] = (out["end"] - out["start"]).dt.days
+        return out.drop(columns=["last_shares"])
+
+    # --- 旧账本迁移 ---
+    def backfill_from_portfolio(self, portfolio):
+        """
+        从 portfolio.json 的 history (每标的最多 10 笔) 反推历史行：
+        以当前 shares/cost 为终点倒推每笔成交前的状态，标记 source=legacy。
+        已有历史的标的跳过。
+        """
+        existing = set(self.frame().index.get_level_values("code"))
+        rows = []
+        for code, pos in portfolio.items():
+            if code in existing or not pos.get("history"): continue
+            shares, cost = float(pos.get("shares", 0)), float(pos.get("cost", 0.0))
+            back = []
+            for i, h in reversed(list(enumerate(pos["history"]))):
+                price, amt = float(h.get("price", 0)), float(h.get("amt", 0))
+                if price <= 0: continue
+                delta = amt / price          # 买入为正，卖出为负 (amt 带符号)
+                before = max(0.0, shares - delta)
+                if h.get("s") == "B":
+                    cost_before = (cost * shares - amt) / before if before > 1e-9 else 0.0
+                    realized = 0.0
+                else:
+                    cost_before = cost if shares > 1e-9 else self._cost_before_close(pos["history"], i)
+                    realized = -delta * (price - cost_before)
+                back.append({
+                    "trade_id": h.get("tid") or f"legacy:{code}:{i}", "date": h.get("date"), "code": code,
+                    "name": pos.get("name", code), "side": h.get("s"), "price": price, "amount": amt,
+                    "shares": delta, "shares_before": before, "cost_before": round(cost_before, 4),
+                    "shares_after": shares, "cost_after": cost, "realized_pnl": round(realized, 2), "source": "legacy"
+                })
+                shares, cost = before, cost_before
+            rows += reversed(back)
+        n = self.append(rows)
+        if n: logger.info(f"📚 成交历史迁移: 从旧账本回填 {n} 笔")
+        return n
+
+    @staticmethod
+    def _cost_before_close(history, idx):
+        """清仓卖出后成本归零，清仓前成本取此前最近一次买入价近似"""
+        for h in reversed(history[:idx]):
+            if h.get("s") == "B": return float(h.get("price", 0))
+        return float(history[idx].get("price", 0))
@@ -53,9 +53,11 @@ def format_markdown_to_html(text):
 
     return text.strip()
 
-def render_html_report_v19(all_news, results, cio_html, advisor_html):
+def render_html_report_v19(all_news, results, cio_html, advisor_html, timing_html="", nav_html=""):
     """
     [V19.1 UI 引擎] 零留白沉浸式布局
+    timing_html: [V19.5] 可选的运行耗时摘要 (metrics.render_html)，为空则不渲染
+    nav_html: [V19.10] 可选的组合净值摘要 (PortfolioNav.render_html)，为空则不渲染
     """
     cio_content = format_markdown_to_html(cio_html)
     advisor_content = format_markdown_to_html(advisor_html)
@@ -146,6 +148,32 @@ def render_html_report_v19(all_news, results, cio_html, advisor_html):
             </div>
         </div>"""
 
+    # 运行耗时摘要 (可选)
+    timing_box = ""
+    if timing_html:
+        timing_box = f"""
+            <div class="box">
+                <div class="box-header">
+                    <span style="margin-right:6px;">⏱️</span> 运行耗时
+                </div>
+                <div class="box-body" style="padding: 6px 10px;">
+                    {timing_html}
+                </div>
+            </div>"""
+
+    # 组合净值摘要 (可选)
+    nav_box = ""
+    if nav_html:
+        nav_box = f"""
+            <div class="box">
+                <div class="box-header">
+                    <span style="margin-right:6px;">📈</span> 组合净值
+                </div>
+                <div class="box-body" style="padding: 6px 10px;">
+                    {nav_html}
+                </div>
+            </div>"""
+
     # Logo 读取 (即使读取失败也不使用网络图片)
     logo_src = "" 
     if os.path.exists("logo.png"):
@@ -340,7 +368,9 @@ def render_html_report_v19(all_news, results, cio_html, advisor_html):
                 </div>
             </div>
             
+            {nav_box}
             {cards_html}
+            {timing_box}
             
             <div class="footer">
                 POWERED BY DEEPSEEK-V3.2 & GEMINI PRO
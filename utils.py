@@ -1,7 +1,10 @@
 import logging
 import smtplib
 import os
+import gzip
+import json
 import time
+import tempfile
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
@@ -53,6 +56,42 @@ def retry(retries=3, delay=2):
         return wrapper
     return decorator
 
+def json_default(obj):
+    """json.dump 兜底：numpy 标量 (np.bool_/np.float64/...) 转原生类型"""
+    if hasattr(obj, 'item'): return obj.item()
+    return str(obj)
+
+# 进程 umask 只能 "设置并返回旧值" 读取：导入时读一次 (此时尚无工作线程)，
+# 不在每次写入时切换，避免并发线程在切换窗口内创建出 0666/0777 的文件
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def atomic_write_json(path, data, indent=None):
+    """
+    原子写 JSON：同目录临时文件 -> fsync -> os.replace
+    进程在任意时刻崩溃，目标文件要么是旧版本、要么是新版本，不会被截断
+    路径以 .gz 结尾时写 gzip 压缩的 JSON
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            payload = json.dumps(data, indent=indent, ensure_ascii=False, default=json_default).encode('utf-8')
+            if path.endswith('.gz'):
+                with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as gz:
+                    gz.write(payload)
+            else:
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp 默认 0600：沿用原文件权限，新文件按导入时读取的 umask 给默认权限
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
 def send_email(subject, html_content, attachment_path=None):
     """
     发送带附件的邮件 (修复 QQ 邮箱 550 Error)
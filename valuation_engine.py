@@ -1,10 +1,29 @@
 import pandas as pd
 import numpy as np
 from utils import logger
+from rolling_valuation import rolling_position, window_position
+
+# [V19.15] 估值档位表：分位落在 [上一档上界, 本档上界) 即命中本档，档位互不重叠，不会再出现
+# 旧 if 链中 "> 0.85" 先于 "> 0.95" 判断、泡沫档永远无法命中的问题
+# (上界参数名, 分位上界, 估值乘数, 标签)；上界参数名可由回测/参数扫描覆盖
+VALUATION_BANDS = [
+    ("pct_very_low", 0.10, 1.6, "极低估"),
+    ("pct_low",      0.25, 1.3, "低估"),
+    ("pct_fair_low", 0.40, 1.1, "偏低"),
+    ("pct_high",     0.85, 1.0, "适中"),
+    ("pct_bubble",   0.95, 0.5, "高估"),
+    (None,           np.inf, 0.0, "泡沫"),
+]
 
 class ValuationEngine:
-    def __init__(self):
-        pass
+    # 估值分位切点 (回测/参数扫描可覆盖)
+    PERCENTILE_CUTS = {key: upper for key, upper, _, _ in VALUATION_BANDS if key}
+
+    def __init__(self, method="minmax", window=1250, min_len=120):
+        """method: minmax (区间位置，默认) / rank (窗口内真实分位名次)，见 rolling_valuation.py"""
+        self.method = method
+        self.window = window
+        self.min_len = min_len
 
     def get_valuation_status(self, fund_code, current_data):
         """
@@ -31,38 +50,56 @@ class ValuationEngine:
                 return 1.0, "数据列错误"
 
             # 2. 确保数据长度足够
-            if len(history_series) < 120:
+            if len(history_series) < self.min_len:
                 return 1.0, "数据不足"
 
             # 3. 计算分位点 (Percentile)
-            window_len = min(1250, len(history_series))
-            window_data = history_series.tail(window_len)
+            window_data = history_series.tail(min(self.window, len(history_series)))
+            percentile = window_position(window_data, self.method)
             
-            current_price = window_data.iloc[-1]
-            low_val = window_data.min()
-            high_val = window_data.max()
-            
-            if high_val <= low_val:
-                percentile = 0.5
-            else:
-                percentile = (current_price - low_val) / (high_val - low_val)
-            
-            p_str = f"{int(percentile*100)}%"
-            
-            # 4. 通用估值策略矩阵
-            if percentile < 0.10: 
-                return 1.6, f"极低估(P:{p_str})"
-            elif percentile < 0.25: 
-                return 1.3, f"低估(P:{p_str})"
-            elif percentile < 0.40: 
-                return 1.1, f"偏低(P:{p_str})"
-            elif percentile > 0.85: 
-                return 0.5, f"高估(P:{p_str})"
-            elif percentile > 0.95: 
-                return 0.0, f"泡沫(P:{p_str})"
-            else:
-                return 1.0, f"适中(P:{p_str})"
+            # 4. 通用估值策略矩阵 (档位表)
+            mult, label = self.classify(percentile)
+            return mult, f"{label}(P:{int(percentile*100)}%)"
 
         except Exception as e:
             logger.error(f"估值计算异常 {fund_code}: {e}")
             return 1.0, "计算错误"
+
+    @staticmethod
+    def band_table(cuts=None):
+        """-> (上界数组, 乘数数组, 标签列表)；覆盖后的上界强制单调不减 (逆序的档位变为空档，而不是遮蔽后续档位)"""
+        cuts = cuts or {}
+        uppers = np.maximum.accumulate([cuts.get(key, upper) if key else upper for key, upper, _, _ in VALUATION_BANDS])
+        return uppers, np.array([m for _, _, m, _ in VALUATION_BANDS]), [lbl for _, _, _, lbl in VALUATION_BANDS]
+
+    @classmethod
+    def classify(cls, percentile, cuts=None):
+        """单个分位 -> (估值乘数, 标签)"""
+        uppers, mults, labels = cls.band_table(cuts)
+        i = int(np.searchsorted(uppers, percentile, side='right'))
+        return float(mults[i]), labels[i]
+
+    @classmethod
+    def multiplier_from_percentile(cls, percentile, cuts=None):
+        """分位 -> 估值乘数 (与 get_valuation_status 同一张档位表)，分位缺失时为 1.0；支持任意形状数组"""
+        uppers, mults, _ = cls.band_table(cuts)
+        percentile = np.asarray(percentile, dtype=float)
+        idx = np.searchsorted(uppers, np.nan_to_num(percentile), side='right')
+        return np.where(np.isnan(percentile), 1.0, mults[np.minimum(idx, len(mults) - 1)])
+
+    @staticmethod
+    def percentile_series(close, window=1250, min_len=120, method="minmax"):
+        """逐日估值分位 (全历史，O(n))；历史不足 min_len 时为 NaN。close 可为 Series 或 日期 × 标的 DataFrame"""
+        return rolling_position(close, window, min_len, method)
+
+    @classmethod
+    def multiplier_series(cls, close, window=1250, min_len=120, cuts=None, method="minmax"):
+        """
+        [V19.13] get_valuation_status 的全历史向量化版本 (回测用)
+        Returns: 与 close 同形状的估值乘数
+        """
+        percentile = cls.percentile_series(close, window, min_len, method)
+        mult = cls.multiplier_from_percentile(percentile.values, cuts)
+        if isinstance(close, pd.DataFrame):
+            return pd.DataFrame(mult, index=close.index, columns=close.columns)
+        return pd.Series(mult, index=close.index)
@@ -0,0 +1,233 @@
+"""
+walk_forward.py | 滚动前推 (walk-forward) 样本外评估
+
+全区间调参必然过拟合。本工具把回测区间切成滚动的 训练/测试 窗口:
+    每个 fold 在训练窗口上评估全部候选参数 -> 按 --select 选出最优 -> 在紧随其后的测试窗口上样本外打分
+测试窗口首尾相接 (步长 = test_days)，各 fold 选中的参数按段拼接成一条连续的样本外权益曲线，
+与默认参数的同区间曲线对照。
+
+指标面板只计算一次 (可用 --panel-cache 跨运行复用)，各 fold 只是对面板做行切片；
+全部 fold × 候选 × (训练, 测试) 任务一次性提交到共享面板进程池并行执行 (见 param_sweep.run_tasks)。
+
+用法:
+    python walk_forward.py --grid score_up=60,65,70,75 --grid val_brake=0.4,0.5,0.6
+    python walk_forward.py --random 100 --range score_strong=80:95 --range pct_high=0.8:0.95 \\
+        --train-days 500 --test-days 120 --anchored --equity wf_equity.csv --json wf_report.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from backtester import Backtester, PARAM_SPACE, equity_arrays, run_ledger
+from param_sweep import (RANK_KEYS, fill_defaults, grid_candidates, parse_grid, parse_ranges, prepare,
+                         random_candidates, rank_results, run_tasks)
+from utils import logger
+
+TRADING_DAYS = 252
+
+
+def make_folds(lo, hi, train_days, test_days, anchored=False):
+    """
+    [lo, hi) 行号区间内的滚动窗口；anchored=True 时训练窗口起点固定为 lo (扩张窗口)
+    最后一个测试窗口可短于 test_days
+    """
+    folds = []
+    start = lo
+    while start + train_days < hi:
+        train = (lo if anchored else start, start + train_days)
+        test = (train[1], min(train[1] + test_days, hi))
+        folds.append({"train": train, "test": test})
+        start += test_days
+    return folds
+
+
+def annualize(ret, days):
+    return (1 + ret) ** (TRADING_DAYS / days) - 1 if days > 0 and ret > -1 else float("nan")
+
+
+def _rank_corr(a, b):
+    a, b = pd.Series(a).rank(), pd.Series(b).rank()
+    return float(a.corr(b)) if a.nunique() > 1 and b.nunique() > 1 else float("nan")
+
+
+def oos_curve(arrays, context, folds, chosen):
+    """按 fold 拼接各测试段的目标倍数，在整段样本外区间上连续跑一次账本 (持仓跨 fold 延续)"""
+    lo, hi = folds[0]['test'][0], folds[-1]['test'][1]
+    mults = np.concatenate([
+        Backtester.signal_arrays(arrays, context['left_side'], params)['mult'][f['test'][0]:f['test'][1]]
+        for f, params in zip(folds, chosen)
+    ])
+    lock_days = [params.get('lock_days', PARAM_SPACE['lock_days']) for params in chosen]
+    if len(set(lock_days)) > 1:
+        # 锁仓天数是账本状态规则，无法逐段切换：连续曲线统一用各 fold 选中值的众数
+        logger.info(f"ℹ️ 各 fold 选中的 lock_days 不同 {sorted(set(lock_days))}，连续曲线取众数")
+    lock = Counter(lock_days).most_common(1)[0][0]
+    shares, flows, _ = run_ledger(arrays['close'][lo:hi], mults, context['base_amt'], context['max_daily'], lock)
+    return equity_arrays(shares * arrays['px'][lo:hi], flows)
+
+
+def walk_forward(bt, candidates, train_days=500, test_days=125, anchored=False, select="composite",
+                 workers=None, start=None, end=None, cache_path=None):
+    t0 = time.perf_counter()
+    arrays, dates, codes, context = prepare(bt, start, end, cache_path)
+    folds = make_folds(*context['window'], train_days, test_days, anchored)
+    if not folds:
+        raise RuntimeError(f"区间过短: {context['window'][1] - context['window'][0]} 个交易日 < 训练窗口 {train_days}")
+    t_panel = time.perf_counter() - t0
+
+    candidates = [{}] + [c for c in candidates if c]
+    tasks = [(c, f[phase]) for f in folds for phase in ("train", "test") for c in candidates]
+    t1 = time.perf_counter()
+    rows = fill_defaults(run_tasks(arrays, context, tasks, workers), candidates)
+    t_eval = time.perf_counter() - t1
+
+    n = len(candidates)
+    fold_rows, chosen = [], []
+    for k, f in enumerate(folds):
+        base = 2 * k * n
+        train, test = rows[base:base + n], rows[base + n:base + 2 * n]
+        for i, r in enumerate(train): r["candidate"] = i
+        best = int(rank_results(train, select).iloc[0]["candidate"])
+        chosen.append(candidates[best])
+        test_ret = [r["return"] for r in test]
+        fold_rows.append({
+            "fold": k + 1,
+            "train_start": dates[f['train'][0]].strftime("%Y-%m-%d"), "train_end": dates[f['train'][1] - 1].strftime("%Y-%m-%d"),
+            "test_start": dates[f['test'][0]].strftime("%Y-%m-%d"), "test_end": dates[f['test'][1] - 1].strftime("%Y-%m-%d"),
+            "params": {k2: train[best][k2] for k2 in sorted({k for c in candidates for k in c}, key=list(PARAM_SPACE).index)},
+            "is_default": best == 0,
+            "is_return": annualize(train[best]["return"], train[best]["days"]),
+            "oos_return": annualize(test[best]["return"], test[best]["days"]),
+            "oos_drawdown": test[best]["max_drawdown"],
+            "oos_baseline": annualize(test[0]["return"], test[0]["days"]),
+            # 选中参数在测试窗口全部候选中的收益名次 (1 为最好)
+            "oos_rank": int(pd.Series(test_ret).rank(ascending=False, method="min")[best]),
+            "is_oos_rank_corr": _rank_corr([r["return"] for r in train], test_ret),
+        })
+
+    lo, hi = folds[0]['test'][0], folds[-1]['test'][1]
+    oos = oos_curve(arrays, context, folds, chosen)
+    base = oos_curve(arrays, context, folds, [{}] * len(folds))
+    equity = pd.DataFrame({
+        "nav": oos['nav'], "drawdown": oos['drawdown'], "market_value": oos['market_value'], "pnl": oos['pnl'],
+        "baseline_nav": base['nav'], "baseline_drawdown": base['drawdown'],
+    }, index=dates[lo:hi])
+    report = stability_report(fold_rows, equity, len(candidates))
+    report["timing"] = {"panel": t_panel, "evaluate": t_eval, "tasks": len(tasks)}
+    return fold_rows, equity, report
+
+
+def stability_report(fold_rows, equity, n_candidates):
+    """参数稳定性 + 样本内外衰减"""
+    folds = pd.DataFrame(fold_rows)
+    params = {}
+    for key in (fold_rows[0]["params"] if fold_rows else {}):
+        values = [r["params"][key] for r in fold_rows]
+        mode, count = Counter(values).most_common(1)[0]
+        entry = {"values": values, "mode": mode, "mode_share": count / len(values), "distinct": len(set(values))}
+        if all(isinstance(v, (int, float)) for v in values):
+            arr = np.asarray(values, dtype=float)
+            entry["std"] = float(arr.std())
+            entry["cv"] = float(arr.std() / abs(arr.mean())) if arr.mean() else float("nan")
+        params[key] = entry
+
+    is_mean, oos_mean = folds["is_return"].mean(), folds["oos_return"].mean()
+    days = len(equity)
+    return {
+        "folds": len(folds), "candidates": n_candidates, "params": params,
+        "is_return_mean": float(is_mean), "oos_return_mean": float(oos_mean),
+        # walk-forward 效率: 样本外 / 样本内 年化收益，越接近 1 越不依赖过拟合
+        "wf_efficiency": float(oos_mean / is_mean) if is_mean > 0 else float("nan"),
+        "oos_positive_share": float((folds["oos_return"] > 0).mean()),
+        "beat_baseline_share": float((folds["oos_return"] > folds["oos_baseline"]).mean()),
+        "default_chosen_share": float(folds["is_default"].mean()),
+        "oos_rank_mean": float(folds["oos_rank"].mean()),
+        "is_oos_rank_corr_mean": float(folds["is_oos_rank_corr"].mean()),
+        "oos_total": {"return": float(equity["nav"].iloc[-1] - 1), "annualized": annualize(float(equity["nav"].iloc[-1] - 1), days),
+                      "max_drawdown": float(equity["drawdown"].min())},
+        "baseline_total": {"return": float(equity["baseline_nav"].iloc[-1] - 1),
+                           "annualized": annualize(float(equity["baseline_nav"].iloc[-1] - 1), days),
+                           "max_drawdown": float(equity["baseline_drawdown"].min())},
+        "oos_start": equity.index[0].strftime("%Y-%m-%d"), "oos_end": equity.index[-1].strftime("%Y-%m-%d"),
+    }
+
+
+def print_report(fold_rows, report):
+    print(f"🧪 Walk-forward: {report['folds']} 个 fold × {report['candidates']} 组候选 (含默认参数) | "
+          f"面板 {report['timing']['panel']:.2f}s | 评估 {report['timing']['tasks']} 个任务 {report['timing']['evaluate']:.2f}s")
+    for r in fold_rows:
+        params = " ".join(f"{k}={v}" for k, v in r["params"].items()) + (" (默认)" if r["is_default"] else "")
+        print(f"  #{r['fold']:<2} 训练 {r['train_start']}~{r['train_end']} | 测试 {r['test_start']}~{r['test_end']} | {params}")
+        print(f"      样本内 {r['is_return']:+.1%} -> 样本外 {r['oos_return']:+.1%} (默认 {r['oos_baseline']:+.1%}, "
+              f"名次 {r['oos_rank']}/{report['candidates']}, 内外秩相关 {r['is_oos_rank_corr']:+.2f})")
+    print("📐 参数稳定性:")
+    for key, p in report["params"].items():
+        extra = f" | 变异系数 {p['cv']:.2f}" if "cv" in p else ""
+        print(f"    {key:<20} 众数 {p['mode']} ({p['mode_share']:.0%}) | 取值 {p['distinct']} 种{extra}")
+    o, b = report["oos_total"], report["baseline_total"]
+    print(f"📊 样本内年化均值 {report['is_return_mean']:+.1%} | 样本外 {report['oos_return_mean']:+.1%} | WF 效率 {report['wf_efficiency']:.2f}")
+    print(f"   样本外为正 {report['oos_positive_share']:.0%} | 跑赢默认 {report['beat_baseline_share']:.0%} | "
+          f"选中默认 {report['default_chosen_share']:.0%} | 内外秩相关均值 {report['is_oos_rank_corr_mean']:+.2f}")
+    print(f"📈 连续样本外 {report['oos_start']}~{report['oos_end']}: 收益 {o['return']:+.1%} (年化 {o['annualized']:+.1%}, 回撤 {o['max_drawdown']:.1%}) "
+          f"| 默认参数 {b['return']:+.1%} (年化 {b['annualized']:+.1%}, 回撤 {b['max_drawdown']:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="滚动前推样本外评估")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--grid", action="append", metavar="KEY=V1,V2,...", help="网格取值，可重复 (笛卡尔积)")
+    parser.add_argument("--random", type=int, metavar="N", help="随机搜索 N 组 (配合 --range)")
+    parser.add_argument("--range", action="append", metavar="KEY=LO:HI", help="随机搜索范围，可重复")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--train-days", type=int, default=500, help="训练窗口交易日数")
+    parser.add_argument("--test-days", type=int, default=125, help="测试窗口交易日数 (即滚动步长)")
+    parser.add_argument("--anchored", action="store_true", help="扩张窗口：训练起点固定在区间开头")
+    parser.add_argument("--select", default="composite", choices=["composite"] + list(RANK_KEYS), help="训练窗口选参依据")
+    parser.add_argument("--funds", action="append", metavar="CODE", help="只评估指定标的，可重复")
+    parser.add_argument("--start", help="区间起始日 YYYY-MM-DD")
+    parser.add_argument("--end", help="区间结束日 YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, help="进程数 (默认 CPU 核数)")
+    parser.add_argument("--panel-cache", help="指标面板缓存文件 (.npz)")
+    parser.add_argument("--equity", help="连续样本外权益曲线输出 CSV")
+    parser.add_argument("--json", help="fold 明细与稳定性报告输出 JSON")
+    args = parser.parse_args()
+
+    try:
+        candidates = grid_candidates(parse_grid(args.grid)) if args.grid else []
+        if args.random:
+            candidates += random_candidates(parse_ranges(args.range), args.random, args.seed)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if not candidates:
+        print("❌ 未指定搜索空间 (--grid 或 --random + --range)")
+        sys.exit(2)
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    g = config.get('global', {})
+    funds = [f for f in config.get('funds', []) if not args.funds or f['code'] in args.funds]
+    bt = Backtester(funds, base_amt=g.get('base_invest_amount', 1000), max_daily=g.get('max_daily_invest', 5000),
+                    valuation_method=g.get('valuation_method', 'minmax'))
+
+    try:
+        fold_rows, equity, report = walk_forward(bt, candidates, args.train_days, args.test_days, args.anchored, args.select,
+                                                 args.workers, args.start, args.end, args.panel_cache)
+    except RuntimeError as e:
+        logger.error(f"Walk-forward 失败: {e}")
+        sys.exit(1)
+    print_report(fold_rows, report)
+
+    if args.equity:
+        equity.to_csv(args.equity)
+        print(f"📝 样本外权益曲线已写入 {args.equity}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"folds": fold_rows, "report": report}, f, indent=2, ensure_ascii=False, default=str)
+        print(f"📝 报告已写入 {args.json}")